@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+WINDOWS = range(5, 61)  # the Anomaly Detection slider range
+
+
+def zscore_cube(x, windows=WINDOWS, dtype=np.float32):
+    """Rolling z-scores of `x` for every window, shape (len(windows), len(x)).
+
+    One cumulative-sum pass gives every window's sum and sum of squares by
+    differencing, so the cost no longer scales with the window size. Row i
+    matches (x - x.rolling(w).mean()) / x.rolling(w).std() for w = windows[i],
+    NaN included (window not yet full, or a NaN inside it).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    windows = np.asarray(list(windows), dtype=np.int64)
+    nan = np.isnan(x)
+    ref = np.nanmean(x) if (~nan).any() else 0.0
+    centered = np.where(nan, 0.0, x - ref)  # centering keeps the sum of squares well conditioned
+
+    c1 = np.concatenate([[0.0], np.cumsum(centered)])
+    c2 = np.concatenate([[0.0], np.cumsum(centered * centered)])
+    cn = np.concatenate([[0], np.cumsum(nan, dtype=np.int64)])
+
+    cube = np.full((len(windows), len(x)), np.nan, dtype=dtype)
+    for i, w in enumerate(windows):
+        if w > len(x):
+            continue
+        s1 = c1[w:] - c1[:-w]
+        s2 = c2[w:] - c2[:-w]
+        mean = s1 / w
+        std = np.sqrt(np.maximum((s2 - s1 * s1 / w) / (w - 1), 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (centered[w - 1:] - mean) / std
+        z[(cn[w:] - cn[:-w]) > 0] = np.nan
+        cube[i, w - 1:] = z
+    return cube
+
+
+class AnomalyIndex:
+    """Z-scores of one series for every slider window, computed once.
+
+    Changing the window is a row lookup and changing the threshold is a
+    mask over that row, so neither recomputes rolling statistics.
+    """
+
+    def __init__(self, dates, values, windows=WINDOWS, name='log_return'):
+        self.dates = pd.Series(dates).reset_index(drop=True)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.windows = list(windows)
+        self.name = name
+        self.cube = zscore_cube(self.values, self.windows)
+        self._row = {w: i for i, w in enumerate(self.windows)}
+
+    @classmethod
+    def from_frame(cls, df, column='log_return', windows=WINDOWS):
+        return cls(df['date'], df[column].to_numpy(), windows, name=column)
+
+    def zscores(self, window):
+        return self.cube[self._row[window]]
+
+    def mask(self, window, threshold):
+        # NaN compares False, so incomplete windows are never flagged
+        return np.abs(self.zscores(window)) > threshold
+
+    def frame(self, window, threshold):
+        """New DataFrame of date, value, z_score and anomaly for rows with a valid z-score."""
+        z = self.zscores(window)
+        valid = ~np.isnan(z)
+        return pd.DataFrame({
+            'date': self.dates[valid].to_numpy(),
+            self.name: self.values[valid],
+            'z_score': z[valid],
+            'anomaly': np.abs(z[valid]) > threshold,
+        })
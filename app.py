@@ -4,44 +4,108 @@ import streamlit as st
 import pandas as pd
 import os
 import plotly.graph_objects as go
-import requests
+import plotly.express as px
+
+import dashboard_data
+import instrumentation
+from downsample import DEFAULT_POINTS, downsample_frame
+from vol_selection import load_selection
 
 # ----------- PAGE SETUP -----------
 st.set_page_config(page_title="Crypto Dashboard", layout="wide")
 
 # ----------- PAGE SELECTOR -----------
 st.sidebar.title("Navigation")
-page = st.sidebar.selectbox("Go to", ["Home", "Forecasting", "Volatility Analysis", "Correlation Insights", "Anomaly Detection", "Financial Tools"])
+page = st.sidebar.selectbox("Go to", ["Home", "Forecasting", "Volatility Analysis", "Correlation Insights", "Anomaly Detection", "Financial Tools", "Diagnostics"])
 
 # ----------- LOAD DATA -----------
-DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'btc_sentimentn.csv')
-df = pd.read_csv(DATA_PATH, parse_dates=['date'])
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+DATA_PATH = os.path.join(DATA_DIR, 'btc_sentimentn')
+FORECAST_PATH = os.path.join(DATA_DIR, 'prophet_forecast')
+FORECAST_STORE_PATH = os.path.join(DATA_DIR, 'forecasts.sqlite')
+PIPELINE_METRICS_PATH = os.path.join(DATA_DIR, 'pipeline_metrics.jsonl')
+APP_METRICS_PATH = os.path.join(DATA_DIR, 'app_metrics.jsonl')
+
+# Time, memory and I/O of this page render; finished at the bottom of the script and shown on Diagnostics
+render = instrumentation.Span(page, kind='page').start()
+
+# Each page loads only the columns it plots; reads are cached until the file changes,
+# so widget interactions rerun from memory
+def load_data(columns):
+    return dashboard_data.load_dataset(DATA_PATH, columns)
+
+# Forecasts come from the batch forecast store (any coin, indexed lookup) when it exists,
+# otherwise from the single prophet_forecast table
+def load_forecast():
+    tickers = dashboard_data.forecast_tickers(FORECAST_STORE_PATH)
+    if tickers:
+        ticker = st.sidebar.selectbox("Coin", tickers, index=tickers.index('btc') if 'btc' in tickers else 0)
+        return dashboard_data.load_store_forecast(FORECAST_STORE_PATH, ticker)
+    return dashboard_data.load_dataset(FORECAST_PATH)
+
+# Long series are thinned to PLOT_POINTS per trace before they reach the browser.
+# The range slider picks the visible window and the trace is resampled within it,
+# so zooming in brings detail back at the same payload size
+PLOT_POINTS = DEFAULT_POINTS
+
+def visible_range(dates, key):
+    if len(dates) <= PLOT_POINTS:
+        return None, None
+    lo, hi = dates.iloc[0].to_pydatetime(), dates.iloc[-1].to_pydatetime()
+    return st.slider("Visible range", min_value=lo, max_value=hi, value=(lo, hi), key=key)
 
 # ----------- LIVE PRICE FUNCTION -----------
+# Last close from the trade stream when one is configured, otherwise the CoinGecko quote
+# polled in the background; reading either never waits on the network
+LIVE_BAR_SECONDS = 60
+
 def get_live_btc_price():
-    try:
-        response = requests.get(
-            "https://api.coingecko.com/api/v3/simple/price",
-            params={"ids": "bitcoin", "vs_currencies": "usd"}
-        )
-        response.raise_for_status()
-        return response.json()["bitcoin"]["usd"]
-    except:
-        return None
+    bars = dashboard_data.live_bars("BTCUSDT", LIVE_BAR_SECONDS)
+    if bars is not None and not bars.empty:
+        return float(bars['close'].iloc[-1])
+    return dashboard_data.live_price("bitcoin", "usd")
+
+# Bars and features from the trade stream, redrawn every few seconds without rerunning the page
+@st.fragment(run_every=5)
+def live_bars_panel():
+    bars = dashboard_data.live_bars("BTCUSDT", LIVE_BAR_SECONDS)
+    if bars is None:
+        return
+    st.subheader("Live 1-Minute Bars")
+    error = dashboard_data.live_stream_error("BTCUSDT", LIVE_BAR_SECONDS)
+    if error:
+        st.warning(f"Trade stream stopped ({error}); restarting. Bars below may be stale.")
+    if bars.empty:
+        st.info("Waiting for the first bar to close on the trade stream...")
+        return
+
+    fig = go.Figure(go.Candlestick(x=bars['date'], open=bars['open'], high=bars['high'],
+                                   low=bars['low'], close=bars['close'], name='BTCUSDT'))
+    fig.update_layout(xaxis_rangeslider_visible=False)
+    st.plotly_chart(fig, use_container_width=True)
 
-live_price = get_live_btc_price()
+    latest = bars.iloc[-1]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Last Close", f"${latest['close']:,.2f}", f"{latest['return']:.3%}" if pd.notna(latest['return']) else None)
+    col2.metric("RSI (14)", f"{latest['rsi_14']:.1f}" if pd.notna(latest['rsi_14']) else "n/a")
+    col3.metric("ATR (14)", f"{latest['atr_14']:,.2f}" if pd.notna(latest['atr_14']) else "n/a")
+    col4.metric("EGARCH Vol (next bar)", f"{latest['next_egarch_vol']:.4f}" if pd.notna(latest['next_egarch_vol']) else "fitting...")
 
 # ----------- HOME PAGE -----------
 if page == "Home":
     st.title("Welcome to the Crypto Forecasting Dashboard")
+    df = load_data(['date', 'close'])
+    live_price = get_live_btc_price()
 
     st.subheader("Bitcoin Historical Price Chart")
+    start, end = visible_range(df['date'], "home_range")
+    price_df = downsample_frame(df, 'date', 'close', PLOT_POINTS, start, end)
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df['date'], y=df['close'], name='Historical Close'))
+    fig.add_trace(go.Scatter(x=price_df['date'], y=price_df['close'], name='Historical Close'))
 
     if live_price:
         fig.add_trace(go.Scatter(
-            x=[df['date'].min(), df['date'].max()],
+            x=[price_df['date'].min(), price_df['date'].max()],
             y=[live_price, live_price],
             mode='lines',
             name='Live Price',
@@ -55,13 +119,14 @@ if page == "Home":
     else:
         st.warning("Unable to fetch live Bitcoin price.")
 
+    live_bars_panel()
+
 # ----------- FORECASTING PAGE -----------
 elif page == "Forecasting":
     st.title("Price Forecasting")
 
     try:
-        forecast_df = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'data', 'prophet_forecast.csv'))
-        forecast_df['ds'] = pd.to_datetime(forecast_df['ds'])
+        forecast_df = load_forecast()
 
         forecast_days = st.slider("Select forecast horizon (days)", min_value=1, max_value=len(forecast_df), value=30)
 
@@ -93,18 +158,34 @@ elif page == "Forecasting":
         st.plotly_chart(fig)
 
     except FileNotFoundError:
-        st.error("Forecast data not found. Please make sure 'prophet_forecast.csv' exists in the data folder.")
+        st.error("Forecast data not found. Please make sure 'prophet_forecast' exists in the data folder.")
 
 # ----------- VOLATILITY PAGE -----------
 elif page == "Volatility Analysis":
-    st.title("Volatility Analysis (EGARCH)")
+    st.title("Volatility Analysis")
 
-    st.markdown("This page visualizes the volatility of Bitcoin using the more accurate EGARCH model.")
+    st.markdown("This page visualizes the volatility of Bitcoin. The charts use the EGARCH(1,1) reference series "
+                "the pipeline saves; the specification that fits best is named below.")
+
+    # Show which specification actually won the information-criterion comparison
+    try:
+        best = load_selection(os.path.join(DATA_DIR, 'vol_selection.json')).get('BTC-USD')
+    except FileNotFoundError:
+        best = None
+    if best:
+        spec = f"{best['vol']}({best['p']},{best['o']},{best['q']}) with {best['dist']} errors"
+        reference = best['vol'] == 'EGARCH' and (best['p'], best['o'], best['q']) == (1, 0, 1) and best['dist'] == 'normal'
+        st.caption(f"Best fitting model by BIC: {spec} (BIC {best['bic']:.1f}, AIC {best['aic']:.1f}). "
+                   + ("The reference series below uses this specification." if reference
+                      else "The reference series below is EGARCH(1,1) with normal errors."))
+    df = load_data(['date', 'egarch_vol'])
 
     # Plot EGARCH Volatility over time
+    start, end = visible_range(df['date'], "vol_range")
+    vol_df = downsample_frame(df, 'date', 'egarch_vol', PLOT_POINTS, start, end)
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df['date'], y=df['egarch_vol'], mode='lines', name='EGARCH Volatility', line=dict(color='purple')))
-    fig.update_layout(title="EGARCH Volatility Over Time", xaxis_title="Date", yaxis_title="Volatility")
+    fig.add_trace(go.Scatter(x=vol_df['date'], y=vol_df['egarch_vol'], mode='lines', name='EGARCH Volatility', line=dict(color='purple')))
+    fig.update_layout(title="EGARCH(1,1) Reference Volatility Over Time", xaxis_title="Date", yaxis_title="Volatility")
     st.plotly_chart(fig, use_container_width=True)
 
     st.subheader("Real-Time Risk Monitoring")
@@ -157,27 +238,38 @@ elif page == "Correlation Insights":
     - Scattered randomly → **no strong relationship**
     """)
 
-    features = ['close', 'volume', 'log_return', 'sentiment_score', 'egarch_vol']
-    
+    # Correlations, rolling correlations and OLS fits for every pair are precomputed and cached,
+    # so switching pairs is a lookup
+    corr_index = dashboard_data.correlation_index(DATA_PATH)
+    features = corr_index.features
+
     col1, col2 = st.columns(2)
     with col1:
         x_feature = st.selectbox("Select X-axis feature", features, index=0)
     with col2:
         y_feature = st.selectbox("Select Y-axis feature", features, index=1)
 
-    filtered_df = df[[x_feature, y_feature]].dropna()
+    df = load_data([x_feature, y_feature] if x_feature != y_feature else [x_feature])
+    fit = corr_index.ols(x_feature, y_feature)
 
-    import plotly.express as px
     scatter_fig = px.scatter(
         df,
         x=x_feature,
         y=y_feature,
         title=f"Scatter Plot: {x_feature} vs {y_feature}",
         opacity=0.7,
-        trendline="ols",
         color_discrete_sequence=["#00cc96"]
     )
     scatter_fig.update_traces(marker=dict(size=7))
+    # OLS trendline from the cached fit
+    x_span = [df[x_feature].min(), df[x_feature].max()]
+    scatter_fig.add_trace(go.Scatter(
+        x=x_span,
+        y=[fit['intercept'] + fit['slope'] * v for v in x_span],
+        mode='lines',
+        name='OLS',
+        line=dict(color="#FFA15A")
+    ))
     scatter_fig.update_layout(
         plot_bgcolor="#111111",
         paper_bgcolor="#111111",
@@ -185,10 +277,24 @@ elif page == "Correlation Insights":
         title_font_size=20,
         legend=dict(font=dict(color="white")),
     )
-    scatter_fig.update_traces(line=dict(color="#FFA15A"))
     scatter_fig.update_layout(height=500)
 
     st.plotly_chart(scatter_fig, use_container_width=True)
+    st.caption(f"OLS: {y_feature} = {fit['slope']:.4g} * {x_feature} + {fit['intercept']:.4g} "
+               f"(r = {fit['corr']:.3f}, R² = {fit['r2']:.3f}, n = {fit['n']})")
+
+    if x_feature != y_feature:
+        st.subheader(f"{corr_index.window}-Day Rolling Correlation")
+        rolling = corr_index.rolling_corr(x_feature, y_feature).rename('corr').rename_axis('date').reset_index()
+        rolling_df = downsample_frame(rolling, 'date', 'corr', PLOT_POINTS)
+        rolling_fig = go.Figure(go.Scatter(x=rolling_df['date'], y=rolling_df['corr'], mode='lines', name='Rolling Correlation'))
+        rolling_fig.update_layout(xaxis_title="Date", yaxis_title="Correlation", yaxis_range=[-1, 1])
+        st.plotly_chart(rolling_fig, use_container_width=True)
+
+    st.subheader("Correlation Matrix")
+    heatmap = px.imshow(corr_index.matrix().round(2), text_auto=True, zmin=-1, zmax=1,
+                        color_continuous_scale="RdBu_r", aspect="auto")
+    st.plotly_chart(heatmap, use_container_width=True)
 
 # ----------- ANOMALY DETECTION PAGE -----------
 elif page == "Anomaly Detection":
@@ -203,36 +309,37 @@ elif page == "Anomaly Detection":
     You can adjust the sensitivity using the settings below.
     """)
 
+    # Z-scores for every window are precomputed and cached, so the sliders only index and mask
+    index = dashboard_data.anomaly_index(DATA_PATH)
+
     # Controls
     col1, col2 = st.columns(2)
     with col1:
-        window = st.slider("Rolling window size (days)", min_value=5, max_value=60, value=20)
+        window = st.slider("Rolling window size (days)", min_value=min(index.windows), max_value=max(index.windows), value=20)
     with col2:
         threshold = st.slider("Z-score threshold", min_value=1.0, max_value=5.0, value=3.0, step=0.1)
 
-    # Calculate rolling stats
-    df['rolling_mean'] = df['log_return'].rolling(window=window).mean()
-    df['rolling_std'] = df['log_return'].rolling(window=window).std()
-    df['z_score'] = (df['log_return'] - df['rolling_mean']) / df['rolling_std']
+    # Rows with a full window, flagged where |z| exceeds the threshold
+    plot_df = index.frame(window, threshold)
 
-    # Flag anomalies
-    df['anomaly'] = df['z_score'].abs() > threshold
-
-    # Drop rows with NaNs from rolling
-    plot_df = df.dropna(subset=['z_score'])
+    # The line is thinned and keeps the largest-|z| anomalies of each stretch (at most half the
+    # point budget); markers are drawn for the anomalies the line kept, so both stay bounded
+    start, end = visible_range(plot_df['date'], "anomaly_range")
+    line_df = downsample_frame(plot_df, 'date', 'log_return', PLOT_POINTS, start, end, keep='anomaly', score='z_score')
+    marker_df = line_df
 
     # Plot
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=plot_df['date'],
-        y=plot_df['log_return'],
+        x=line_df['date'],
+        y=line_df['log_return'],
         mode='lines',
         name='Log Return',
         line=dict(color='lightblue')
     ))
     fig.add_trace(go.Scatter(
-        x=plot_df[plot_df['anomaly']]['date'],
-        y=plot_df[plot_df['anomaly']]['log_return'],
+        x=marker_df[marker_df['anomaly']]['date'],
+        y=marker_df[marker_df['anomaly']]['log_return'],
         mode='markers',
         name='Anomaly',
         marker=dict(color='red', size=8, symbol='x')
@@ -256,13 +363,18 @@ elif page == "Financial Tools":
     st.title("📈 Financial Decision-Making Tools")
 
     try:
-        forecast_df = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'data', 'prophet_forecast.csv'))
-        forecast_df['ds'] = pd.to_datetime(forecast_df['ds'])
-        forecast_price = forecast_df['yhat'].iloc[-1]
+        forecast_df = load_forecast()
+        if 'horizon' in forecast_df.columns:
+            forecast_price = forecast_df.loc[forecast_df['horizon'] == 1, 'yhat'].iloc[0]
+        else:
+            # prophet_forecast also covers the history; the next day is the first row past the last close
+            last_date = load_data(['date'])['date'].iloc[-1]
+            forecast_price = forecast_df.loc[forecast_df['ds'] > last_date, 'yhat'].iloc[0]
     except:
         st.warning("Forecast data not available.")
         forecast_price = None
 
+    df = load_data(['egarch_vol'])
     latest_vol = df['egarch_vol'].iloc[-1]
 
     # Volatility Regime Classification
@@ -280,6 +392,18 @@ elif page == "Financial Tools":
     st.markdown(f"- **Forecasted Price (Next Day)**: ${forecast_price:,.2f}" if forecast_price else "- Forecast unavailable.")
     st.markdown(f"- **Volatility Level**: {vol_level} ({latest_vol:.4f})")
 
+    # Monte Carlo risk from the saved EGARCH parameters and next-day variance
+    engine_path = os.path.join(DATA_DIR, 'egarch_engine.json')
+    if os.path.exists(engine_path):
+        risk = dashboard_data.simulated_risk(engine_path, horizons=(1, 5, 10))
+        st.subheader(" Value at Risk (95%, simulated)")
+        st.table(pd.DataFrame({
+            'Horizon (days)': risk['horizons'],
+            'Volatility': risk['volatility'][:, 0],
+            'VaR': risk['var'][:, 0],
+            'Expected Shortfall': risk['es'][:, 0],
+        }).style.format({'Volatility': '{:.2%}', 'VaR': '{:.2%}', 'Expected Shortfall': '{:.2%}'}))
+
     st.subheader(" Suggested Action")
 
     # Decision Logic without sentiment
@@ -290,3 +414,67 @@ elif page == "Financial Tools":
     else:  # High Volatility
         st.error("High market volatility. Consider waiting or using strong risk management strategies.")
 
+# ----------- DIAGNOSTICS PAGE -----------
+elif page == "Diagnostics":
+    st.title("Diagnostics")
+    st.markdown("Where the time goes: per-stage metrics from the last pipeline runs and per-page render metrics of this dashboard.")
+
+    def metrics_frame(records):
+        df = pd.DataFrame(records)
+        if df.empty:
+            return df
+        df['started'] = pd.to_datetime(df['started_at'], unit='s')
+        df['status'] = df['labels'].map(lambda labels: labels.get('status', ''))
+        df['peak_memory_mb'] = df['peak_memory_bytes'] / 2 ** 20
+        df['mb_read'] = df['bytes_read'] / 2 ** 20
+        df['mb_written'] = df['bytes_written'] / 2 ** 20
+        return df
+
+    columns = ['name', 'status', 'started', 'wall_seconds', 'cpu_seconds', 'peak_memory_mb', 'rows_read',
+               'rows_written', 'mb_read', 'mb_written', 'http_calls', 'http_seconds', 'error']
+
+    st.subheader("Pipeline Stages (latest run)")
+    stages = metrics_frame(instrumentation.read_records(PIPELINE_METRICS_PATH, limit=5000))
+    if stages.empty:
+        st.info("No pipeline metrics yet. Run `python pipeline.py` to record them.")
+    else:
+        latest = stages.groupby('name').tail(1).sort_values('started')
+        st.dataframe(latest[columns], use_container_width=True)
+        fig = go.Figure(go.Bar(x=latest['name'], y=latest['wall_seconds'], name='Wall time'))
+        fig.add_trace(go.Bar(x=latest['name'], y=latest['cpu_seconds'], name='CPU time'))
+        fig.update_layout(title="Stage Time (s)", barmode='group', xaxis_title="Stage", yaxis_title="Seconds")
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Page Renders")
+    pages = metrics_frame(instrumentation.read_records(APP_METRICS_PATH, limit=5000))
+    if pages.empty:
+        st.info("No page renders recorded yet.")
+    else:
+        summary = pages.groupby('name').agg(
+            renders=('wall_seconds', 'size'),
+            median_seconds=('wall_seconds', 'median'),
+            p95_seconds=('wall_seconds', lambda s: s.quantile(0.95)),
+            median_cpu_seconds=('cpu_seconds', 'median'),
+            max_peak_memory_mb=('peak_memory_mb', 'max'),
+            rows_read=('rows_read', 'sum'),
+            http_calls=('http_calls', 'sum'),
+        ).reset_index()
+        st.dataframe(summary, use_container_width=True)
+
+    st.subheader("HTTP (this server process)")
+    http = instrumentation.http_totals()
+    if http:
+        st.dataframe(pd.DataFrame([{'host': host, 'requests': v['count'], 'errors': v['errors'],
+                                    'mean_seconds': v['seconds'] / v['count'] if v['count'] else None}
+                                   for host, v in http.items()]), use_container_width=True)
+    else:
+        st.info("No HTTP calls made by this process yet.")
+
+    with st.expander("Prometheus metrics"):
+        exposition = instrumentation.to_prometheus(
+            instrumentation.read_records(PIPELINE_METRICS_PATH) + instrumentation.read_records(APP_METRICS_PATH))
+        st.code(exposition, language="text")
+        st.download_button("Download metrics.prom", exposition, file_name="metrics.prom")
+
+# ----------- RENDER METRICS -----------
+dashboard_data.page_recorder(APP_METRICS_PATH).record(render.finish())
@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from forecast_service import REGRESSORS, DEFAULT_PROPHET_KWARGS, ForecastService, fingerprint, prepare_training_frame
+
+
+def rolling_origin_cutoffs(ds, initial, period, horizon):
+    """Cutoff dates with at least `initial` training rows before them and a
+    full `horizon` of rows after, one every `period` rows."""
+    ds = pd.Series(ds).reset_index(drop=True)
+    positions = range(initial - 1, len(ds) - horizon, period)
+    return [ds.iloc[i] for i in positions]
+
+
+def _run_fold(task):
+    """Fit Prophet on rows up to the cutoff and score the next `horizon` rows; runs in a worker."""
+    train, test, regressors, prophet_kwargs, measure_memory = task
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    service = ForecastService(None, regressors, prophet_kwargs)
+
+    # Daily future up to the last test date; the test rows may skip days (dropped NaN rows)
+    periods = int((test['ds'].iloc[-1] - train['ds'].iloc[-1]) / pd.Timedelta(days=1))
+
+    # Timed without tracemalloc, which slows the Python side of the fit
+    started = time.perf_counter()
+    model = service.fit(train)
+    forecast = model.predict(service.make_future(model, train, periods))
+    fit_seconds = time.perf_counter() - started
+
+    peak = None
+    if measure_memory:
+        # Separate traced pass for this process's Python allocations (cmdstan runs in a child and is not seen)
+        tracemalloc.start()
+        model = service.fit(train)
+        model.predict(service.make_future(model, train, periods))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    # Matched on date, not position, so a gap in the test rows cannot shift the predictions
+    scored = test[['ds', 'y']].merge(forecast[['ds', 'yhat']], on='ds', how='left')
+    yhat = scored['yhat'].to_numpy()
+    y = scored['y'].to_numpy()
+    return {
+        'cutoff': str(train['ds'].iloc[-1]),
+        'horizon': list(range(1, len(test) + 1)),
+        'ds': [str(d) for d in test['ds']],
+        'y': y.tolist(),
+        'yhat': yhat.tolist(),
+        'fit_seconds': fit_seconds,
+        'peak_python_mb': peak / 2 ** 20 if peak is not None else None,
+        # Process-level high-water marks, not per fold: the pool worker so far, and the
+        # largest cmdstan child it has waited for
+        'worker_max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'children_max_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+class Backtester:
+    """Rolling-origin backtest of the Prophet forecaster.
+
+    Each cutoff is fitted in a process pool with the same regressors and
+    future-regressor filling as ForecastService. A fold's result is cached
+    on disk under a hash of its training and test rows, so extending the
+    history only fits the new folds. Each fold is fitted a second time under
+    tracemalloc for its Python peak; measure_memory=False skips that pass
+    and leaves peak_python_mb empty.
+    """
+
+    def __init__(self, cache_dir, regressors=REGRESSORS, prophet_kwargs=None, workers=None, measure_memory=True):
+        self.cache_dir = cache_dir
+        self.measure_memory = measure_memory
+        self.regressors = list(regressors)
+        self.prophet_kwargs = dict(DEFAULT_PROPHET_KWARGS if prophet_kwargs is None else prophet_kwargs)
+        self.workers = workers or os.cpu_count() or 1
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def run(self, train_df, initial=90, period=7, horizon=14):
+        train_df = train_df.sort_values('ds').reset_index(drop=True)
+        config = {'regressors': self.regressors, 'prophet': self.prophet_kwargs, 'horizon': horizon,
+                  'measure_memory': self.measure_memory}
+
+        folds, pending = [], []
+        for cutoff in rolling_origin_cutoffs(train_df['ds'], initial, period, horizon):
+            end = int(np.searchsorted(train_df['ds'].to_numpy(), np.datetime64(cutoff), side='right'))
+            train, test = train_df.iloc[:end], train_df.iloc[end:end + horizon]
+            key = fingerprint(pd.concat([train, test]), config)
+            path = os.path.join(self.cache_dir, f'fold_{key}.json')
+            if os.path.exists(path):
+                with open(path) as f:
+                    folds.append({**json.load(f), 'cached': True})
+            else:
+                pending.append((path, (train, test, self.regressors, self.prophet_kwargs, self.measure_memory)))
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                for (path, _), result in zip(pending, pool.map(_run_fold, [task for _, task in pending])):
+                    with open(path, 'w') as f:
+                        json.dump(result, f)
+                    folds.append({**result, 'cached': False})
+
+        return self.summarize(folds)
+
+    @staticmethod
+    def summarize(folds):
+        """Return (errors by horizon, per-fold cost) DataFrames."""
+        rows = pd.DataFrame([
+            {'cutoff': fold['cutoff'], 'horizon': h, 'y': y, 'yhat': yhat}
+            for fold in folds for h, y, yhat in zip(fold['horizon'], fold['y'], fold['yhat'])
+        ])
+        rows['abs_error'] = (rows['y'] - rows['yhat']).abs()
+        rows['ape'] = rows['abs_error'] / rows['y'].abs()
+        by_horizon = rows.groupby('horizon').agg(
+            mae=('abs_error', 'mean'), mape=('ape', 'mean'), folds=('cutoff', 'nunique')).reset_index()
+
+        cost = pd.DataFrame([{k: fold.get(k) for k in ('cutoff', 'fit_seconds', 'peak_python_mb', 'worker_max_rss_mb',
+                                                       'children_max_rss_mb', 'cached')}
+                             for fold in folds]).sort_values('cutoff').reset_index(drop=True)
+        return by_horizon, cost
+
+
+if __name__ == '__main__':
+    import storage
+
+    df = prepare_training_frame(storage.read_table('/content/btc_sentimentn'), REGRESSORS)
+    by_horizon, cost = Backtester('/content/prophet_backtest').run(df, initial=60, period=7, horizon=14)
+    print(by_horizon.to_string(index=False))
+    print(cost.to_string(index=False))
+    storage.write_table(by_horizon, '/content/prophet_backtest_errors')
+    storage.write_table(cost, '/content/prophet_backtest_cost')
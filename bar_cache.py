@@ -0,0 +1,142 @@
+import json
+import os
+import re
+
+import pandas as pd
+
+import storage
+
+# Bar length per yfinance interval, used to decide which bars may still be forming
+INTERVALS = {
+    '1m': pd.Timedelta(minutes=1), '2m': pd.Timedelta(minutes=2), '5m': pd.Timedelta(minutes=5),
+    '15m': pd.Timedelta(minutes=15), '30m': pd.Timedelta(minutes=30), '60m': pd.Timedelta(hours=1),
+    '90m': pd.Timedelta(minutes=90), '1h': pd.Timedelta(hours=1), '1d': pd.Timedelta(days=1),
+    '5d': pd.Timedelta(days=5), '1wk': pd.Timedelta(weeks=1), '1mo': pd.Timedelta(days=31),
+    '3mo': pd.Timedelta(days=92),
+}
+
+
+def time_column(df):
+    for col in ('date', 'datetime'):
+        if col in df.columns:
+            return col
+    raise KeyError("Bar data needs a 'date' or 'datetime' column")
+
+
+def _naive_utc(values):
+    values = pd.to_datetime(values)
+    if getattr(values.dt, 'tz', None) is not None:
+        values = values.dt.tz_convert('UTC').dt.tz_localize(None)
+    return values
+
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_ranges(start, end, covered):
+    """Parts of [start, end) not inside any of the covered [start, end) ranges."""
+    gaps = []
+    cursor = start
+    for lo, hi in merge_ranges(covered):
+        if hi <= cursor:
+            continue
+        if lo >= end:
+            break
+        if lo > cursor:
+            gaps.append((cursor, min(lo, end)))
+        cursor = max(cursor, hi)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class BarCache:
+    """On-disk OHLCV cache keyed by (ticker, interval).
+
+    Next to the bars it records which [start, end) ranges have been
+    downloaded (ranges that came back empty are not recorded), so a fetch
+    only asks the downloader for the gaps. The
+    downloader is any callable (ticker, start, end, interval) -> DataFrame,
+    which lets tests swap in a fake instead of hitting Yahoo. A downloader
+    that covers only part of the range (like ChunkedDownloader when a chunk
+    comes back empty) lists the parts it did cover in attrs['covered'].
+    """
+
+    def __init__(self, root, downloader, clock=None):
+        self.root = root
+        self.downloader = downloader
+        self.clock = clock or (lambda: pd.Timestamp.now(tz='UTC'))
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, ticker, interval):
+        name = re.sub(r'[^A-Za-z0-9_.=^-]', '_', f'{ticker}__{interval}')
+        return os.path.join(self.root, name)
+
+    def coverage(self, ticker, interval):
+        try:
+            with open(self._path(ticker, interval) + '.json') as f:
+                return [[pd.Timestamp(lo), pd.Timestamp(hi)] for lo, hi in json.load(f)['covered']]
+        except FileNotFoundError:
+            return []
+
+    def load(self, ticker, interval):
+        if storage.locate(self._path(ticker, interval)) is None:
+            return None
+        return storage.read_table(self._path(ticker, interval))
+
+    def fetch(self, ticker, start, end, interval='1d'):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        covered = self.coverage(ticker, interval)
+        cached = self.load(ticker, interval)
+
+        new_frames = []
+        fetched = []
+        for lo, hi in missing_ranges(start, end, covered):
+            bars = self.downloader(ticker, lo.to_pydatetime(), hi.to_pydatetime(), interval)
+            # An empty answer may be a failed or rate-limited download, so only ranges
+            # that returned bars are marked covered; the rest are asked for again next time
+            if bars is not None and len(bars):
+                covered_here = bars.attrs.pop('covered', [[lo, hi]])
+                new_frames.append(bars)
+                fetched.extend([pd.Timestamp(a), pd.Timestamp(b)] for a, b in covered_here)
+
+        if new_frames:
+            frames = ([cached] if cached is not None else []) + new_frames
+            bars = pd.concat(frames, ignore_index=True)
+            col = time_column(bars)
+            bars[col] = _naive_utc(bars[col])
+            # Later downloads win, so a re-fetched bar replaces the partial one we had
+            bars = bars.drop_duplicates(subset=col, keep='last').sort_values(col).reset_index(drop=True)
+            storage.write_table(bars, self._path(ticker, interval))
+            cached = bars
+
+        if fetched:
+            # Bars that may still be forming are never marked as covered
+            now = pd.Timestamp(self.clock())
+            if now.tzinfo is not None:
+                now = now.tz_convert('UTC').tz_localize(None)
+            length = INTERVALS.get(interval, pd.Timedelta(days=1))
+            settled = now - length
+            if length <= pd.Timedelta(days=1):
+                settled = settled.floor(length)
+            ranges = [[lo, min(hi, settled)] for lo, hi in fetched if min(hi, settled) > lo]
+            self._save_coverage(ticker, interval, merge_ranges(covered + ranges))
+
+        if cached is None:
+            return pd.DataFrame()
+        col = time_column(cached)
+        mask = (cached[col] >= start) & (cached[col] < end)
+        return cached.loc[mask].reset_index(drop=True)
+
+    def _save_coverage(self, ticker, interval, covered):
+        with open(self._path(ticker, interval) + '.json', 'w') as f:
+            json.dump({'covered': [[lo.isoformat(), hi.isoformat()] for lo, hi in covered]}, f)
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Rows per block of window views, bounding the (rows, tickers, window) temporaries
+_BLOCK = 10_000
+
+
+def _windows(x, window):
+    """Yield (lo, hi, view): rows lo:hi of `x` with a full window, and their windows on the last axis."""
+    for lo in range(window - 1, len(x), _BLOCK):
+        hi = min(lo + _BLOCK, len(x))
+        yield lo, hi, sliding_window_view(x[lo - window + 1:hi], window, axis=0)
+
+
+# Rolling mean / sample std down the time axis of a (time x ticker) matrix.
+# Same semantics as pandas .rolling(window): NaN until the window is full and
+# whenever a NaN falls inside the window. Each window is reduced directly (two
+# passes for the std) rather than by differencing running sums, so the rounding
+# does not grow with the length of the history and a flat window is exactly flat.
+def rolling_mean(x, window):
+    mean = np.full(x.shape, np.nan)
+    for lo, hi, view in _windows(x, window):
+        mean[lo:hi] = view.mean(axis=-1)
+    return mean
+
+
+def rolling_mean_std(x, window):
+    mean, std = np.full(x.shape, np.nan), np.full(x.shape, np.nan)
+    for lo, hi, view in _windows(x, window):
+        m = view.mean(axis=-1)
+        mean[lo:hi] = m
+        std[lo:hi] = np.sqrt(np.square(view - m[..., None]).sum(axis=-1) / (window - 1))
+    return mean, std
+
+
+def _shift(x):
+    out = np.empty_like(x)
+    out[0] = np.nan
+    out[1:] = x[:-1]
+    return out
+
+
+# RSI over every column at once, same semantics as feature_engine.compute_rsi
+def compute_rsi_matrix(close, window=14):
+    delta = close - _shift(close)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # A window without gains or losses has means of exactly 0, so a flat one gives 0/0 = NaN
+        rs = rolling_mean(gain, window) / rolling_mean(loss, window)
+        return 100 - (100 / (1 + rs))
+
+
+def compute_batch_features(close, high, low, volume=None):
+    """Compute the preprocess.py feature set for many tickers in one pass.
+
+    Inputs are 2-D arrays shaped (time, ticker). The result is columnar: a
+    dict mapping each feature name to a (time, ticker) float64 array, with the
+    same values compute_features would produce ticker by ticker.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    if close.ndim != 2 or close.shape != high.shape or close.shape != low.shape:
+        raise ValueError("close, high and low must be 2-D arrays of the same (time, ticker) shape")
+
+    out = {'close': close, 'high': high, 'low': low}
+    if volume is not None:
+        out['volume'] = np.asarray(volume, dtype=np.float64)
+
+    prev_close = _shift(close)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Daily returns
+        out['return'] = close / prev_close - 1
+        out['log_return'] = np.log(close / prev_close)
+
+    # Moving averages
+    out['sma_7'] = rolling_mean(close, 7)
+
+    # Bollinger Bands
+    out['sma_21'], out['stddev_21'] = rolling_mean_std(close, 21)
+    out['upper_band'] = out['sma_21'] + (2 * out['stddev_21'])
+    out['lower_band'] = out['sma_21'] - (2 * out['stddev_21'])
+
+    out['rsi_14'] = compute_rsi_matrix(close, 14)
+
+    # ATR (max skips NaN, like DataFrame.max(axis=1))
+    tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    out['atr_14'] = rolling_mean(tr, 14)
+
+    return out
+
+
+# Pivot a long (date, ticker, value...) frame into the (time x ticker) matrices compute_batch_features takes
+def to_matrices(df, columns=('close', 'high', 'low', 'volume'), date_col='date', ticker_col='ticker'):
+    wide = df.pivot(index=date_col, columns=ticker_col, values=list(columns)).sort_index()
+    index = wide.index
+    tickers = wide[columns[0]].columns
+    return index, tickers, {col: wide[col][tickers].to_numpy(dtype=np.float64) for col in columns}
+
+
+# Flatten a batch result back into one long frame, e.g. for writing to disk
+def to_long_frame(result, index, tickers, date_col='date', ticker_col='ticker'):
+    n_time, n_tickers = next(iter(result.values())).shape
+    frame = {
+        date_col: np.repeat(np.asarray(index), n_tickers),
+        ticker_col: np.tile(np.asarray(tickers), n_time),
+    }
+    for name, values in result.items():
+        frame[name] = values.reshape(-1)
+    return pd.DataFrame(frame)
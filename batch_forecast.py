@@ -0,0 +1,92 @@
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import storage
+from forecast_service import REGRESSORS, ForecastService, prepare_training_frame
+from forecast_store import FORECAST_COLUMNS, ForecastStore
+from pipeline import DATA_DIR
+
+# Same data folder as the pipeline and the Streamlit app, which reads STORE_PATH
+DATA_TEMPLATE = os.path.join(DATA_DIR, '{ticker}_sentimentn')
+MODEL_CACHE_DIR = os.path.join(DATA_DIR, 'state', 'prophet_models')
+STORE_PATH = os.path.join(DATA_DIR, 'forecasts.sqlite')
+
+
+def forecast_ticker(task):
+    """Load one ticker's features, fit (or reuse) its Prophet model and return
+    only the future rows with their horizon; runs inside a worker."""
+    ticker, data_path, cache_dir, horizon, regressors = task
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    started = time.perf_counter()
+
+    # Workers read their own data, so the parent never holds every ticker's history
+    df = storage.read_table(data_path, columns=['date', 'close'] + list(regressors))
+    train = prepare_training_frame(df, regressors)
+    service = ForecastService(os.path.join(cache_dir, ticker), regressors)
+    _, forecast = service.forecast(train, periods=horizon)
+
+    future = forecast[forecast['ds'] > train['ds'].iloc[-1]].reset_index(drop=True)
+    future['horizon'] = np.arange(1, len(future) + 1)
+    return ticker, future[FORECAST_COLUMNS], service.last_fit, time.perf_counter() - started
+
+
+def run_batch(tickers, store, run_date=None, horizon=30, data_template=DATA_TEMPLATE,
+              cache_dir=MODEL_CACHE_DIR, regressors=REGRESSORS, workers=None, max_tasks_per_child=4, data_paths=None):
+    """Forecast every ticker across worker processes and write the results
+    into `store` as each one finishes. A ticker's features are read from
+    `data_paths[ticker]` when given, otherwise from `data_template`.
+
+    At most `workers` tickers are in flight at once and each worker process
+    is recycled after `max_tasks_per_child` fits, which keeps memory bounded
+    no matter how long the ticker list is. Returns a per-ticker status frame.
+    """
+    run_date = pd.Timestamp(run_date or pd.Timestamp.today()).normalize()
+    workers = workers or os.cpu_count() or 1
+    data_paths = data_paths or {}
+    tasks = iter([(ticker, data_paths.get(ticker) or data_template.format(ticker=ticker), cache_dir, horizon,
+                   list(regressors)) for ticker in tickers])
+    status = []
+
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=max_tasks_per_child) as pool:
+        in_flight = {}
+
+        def submit_next():
+            task = next(tasks, None)
+            if task is not None:
+                in_flight[pool.submit(forecast_ticker, task)] = task[0]
+
+        for _ in range(workers):
+            submit_next()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                ticker = in_flight.pop(future)
+                try:
+                    _, forecast, fit, seconds = future.result()
+                    store.write(ticker, run_date, forecast)
+                    status.append({'ticker': ticker, 'fit': fit, 'seconds': seconds, 'error': None})
+                except Exception as e:  # one bad ticker should not sink the whole batch
+                    status.append({'ticker': ticker, 'fit': None, 'seconds': None, 'error': str(e)})
+                submit_next()
+
+    return pd.DataFrame(status)
+
+
+# Pipeline stage: one ticker's features -> its forecast in the store the dashboard reads
+def forecast_to_store(src, store_path, ticker='btc', cache_dir=MODEL_CACHE_DIR, horizon=30):
+    status = run_batch([ticker], ForecastStore(store_path), horizon=horizon, cache_dir=cache_dir,
+                       workers=1, data_paths={ticker: src})
+    failed = status[status['error'].notna()]
+    if len(failed):
+        raise RuntimeError(f"Forecast for {ticker} failed: {failed['error'].iloc[0]}")
+    return status
+
+
+if __name__ == '__main__':
+    store = ForecastStore(STORE_PATH)
+    print(run_batch(['btc'], store, horizon=30).to_string(index=False))
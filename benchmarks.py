@@ -0,0 +1,264 @@
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import synthetic
+
+# Problem sizes; matrix cases spread `rows` over `tickers` columns, so cells stay at `rows`
+SIZES = {
+    'small': {'rows': 1_000, 'tickers': 1, 'texts': 1_000},
+    'medium': {'rows': 100_000, 'tickers': 10, 'texts': 20_000},
+    'large': {'rows': 1_000_000, 'tickers': 100, 'texts': 200_000},
+    'xlarge': {'rows': 10_000_000, 'tickers': 1_000, 'texts': 1_000_000},
+}
+
+
+# Each case takes a size dict and a seed and returns (callable, rows it processes).
+# Setup (data generation, imports) happens outside the timed callable.
+# Model fits are capped because their cost is dominated by the optimiser, not the row count.
+# Cases that need files keep a TemporaryDirectory referenced from the callable, so the
+# directory is removed once run_benchmarks drops the callable.
+
+def _features(size, seed):
+    from feature_engine import compute_features
+    df = synthetic.ohlcv_frame(size['rows'], seed)
+    return lambda: compute_features(df), len(df)
+
+
+def _features_chunked(size, seed, chunk_rows=100_000):
+    import preprocess
+    import storage
+    tmp = tempfile.TemporaryDirectory()
+    src = os.path.join(tmp.name, 'bars')
+    storage.write_table(synthetic.ohlcv_frame(size['rows'], seed, freq='min'), src)
+    return lambda: preprocess.preprocess(src, os.path.join(tmp.name, 'features'), chunk_rows=chunk_rows), size['rows']
+
+
+def _rsi(size, seed):
+    from feature_engine import compute_rsi
+    close = synthetic.ohlcv_frame(size['rows'], seed)['close']
+    return lambda: compute_rsi(close, 14), len(close)
+
+
+def _batch_features(size, seed):
+    from batch_features import compute_batch_features
+    tickers = size['tickers']
+    bars = synthetic.ohlcv_matrices(max(size['rows'] // tickers, 30), tickers, seed)
+    return lambda: compute_batch_features(bars['close'], bars['high'], bars['low'], bars['volume']), bars['close'].size
+
+
+def _vol_fit(vol, max_rows=20_000):
+    def case(size, seed):
+        from vol_engine import VolatilityEngine
+        returns = pd.Series(synthetic.market_returns(min(size['rows'], max_rows), 1, seed)[:, 0])
+        return lambda: VolatilityEngine(vol=vol).fit(returns), len(returns)
+    return case
+
+
+def _egarch_filter(size, seed):
+    from risk_engine import filter_variance, stack_params
+    tickers = size['tickers']
+    returns = synthetic.market_returns(max(size['rows'] // tickers, 30), tickers, seed)
+    fitted = {'mu': 0.0, 'omega': 0.05, 'alpha[1]': 0.12, 'gamma[1]': -0.03, 'beta[1]': 0.97}
+    params = stack_params([fitted] * tickers, ['EGARCH'] * tickers)
+    return lambda: filter_variance(returns, params), returns.size
+
+
+def _vader(size, seed):
+    from sentiment_scoring import ScoreCache, SentimentScorer
+    texts = synthetic.text_corpus(size['texts'], seed)
+    tmp = tempfile.TemporaryDirectory()
+
+    # Fresh cache per call, so every run scores from scratch
+    def run():
+        cache = ScoreCache(os.path.join(tmp.name, f'{time.perf_counter_ns()}.sqlite'))
+        try:
+            SentimentScorer(cache).score(texts)
+        finally:
+            cache.close()
+    return run, len(texts)
+
+
+def _sentiment_merge(size, seed):
+    from sentiment_aggregates import SentimentAggregates
+    days = 365
+    reddit_dates, reddit_scores = synthetic.sentiment_scores(size['texts'], days, seed)
+    news_dates, news_scores = synthetic.sentiment_scores(size['texts'] // 4, days, seed + 1)
+
+    # Same steps as sentiment.merge_sentiment: per-source moments, then the pooled daily mean
+    def run():
+        reddit = SentimentAggregates('2025-01-01').add(reddit_dates, reddit_scores, source='reddit')
+        news = SentimentAggregates('2025-01-01').add(news_dates, news_scores, source='news')
+        pooled = reddit.merge(news).daily('bitcoin', sources=['reddit', 'news'])
+        frame = pd.DataFrame({'date': pd.date_range('2025-01-01', periods=days)})
+        return frame.merge(pooled, on='date', how='left')
+    return run, len(reddit_scores) + len(news_scores)
+
+
+def _prophet(size, seed, max_rows=2_000):
+    import logging
+    from forecast_service import ForecastService
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    rows = min(size['rows'], max_rows)
+    bars = synthetic.ohlcv_frame(rows, seed)
+    train = pd.DataFrame({'ds': bars['date'], 'y': bars['close'], 'volume': bars['volume']})
+    service = ForecastService(None, regressors=['volume'])
+    return lambda: service.forecast(train, periods=30), rows
+
+
+def _anomaly(size, seed):
+    from anomaly_index import zscore_cube
+    returns = synthetic.market_returns(size['rows'], 1, seed)[:, 0]
+    return lambda: zscore_cube(returns), len(returns)
+
+
+def _anomaly_pandas(size, seed):
+    # What the Anomaly Detection page used to do on every slider move, for all 56 windows
+    returns = pd.Series(synthetic.market_returns(size['rows'], 1, seed)[:, 0])
+
+    def run():
+        for window in range(5, 61):
+            rolling = returns.rolling(window)
+            (returns - rolling.mean()) / rolling.std()
+    return run, len(returns)
+
+
+def _tick_stream(size, seed):
+    import asyncio
+    from tick_stream import ReplayFeed, TickStream
+    ticks = synthetic.trade_ticks(size['rows'], ('BTCUSDT',), rate=1000, seed=seed)
+
+    # Ticks -> 1-second bars -> features, no websocket and no EGARCH fit (min_fit_bars is out of reach)
+    def run():
+        return asyncio.run(TickStream(ReplayFeed(ticks), interval=1, min_fit_bars=size['rows']).run())
+    return run, len(ticks)
+
+
+CASES = {
+    'features': _features,
+    'features_chunked': _features_chunked,
+    'compute_rsi': _rsi,
+    'batch_features': _batch_features,
+    'garch_fit': _vol_fit('GARCH'),
+    'egarch_fit': _vol_fit('EGARCH'),
+    'egarch_filter': _egarch_filter,
+    'vader': _vader,
+    'sentiment_merge': _sentiment_merge,
+    'prophet': _prophet,
+    'anomaly_zscores': _anomaly,
+    'anomaly_zscores_pandas': _anomaly_pandas,
+    'tick_stream': _tick_stream,
+}
+
+
+def measure(func, repeat=3):
+    """Wall time over `repeat` runs, then one extra run under tracemalloc for the peak.
+
+    Timing runs are not traced, since tracing slows Python-heavy code.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'min_seconds': min(times), 'median_seconds': float(np.median(times)), 'repeat': repeat,
+            'peak_python_mb': peak / 2 ** 20}
+
+
+def run_benchmarks(cases=None, size='small', seed=0, repeat=3):
+    """Run the named cases (all by default) at one size; returns a list of result dicts."""
+    dims = SIZES[size] if isinstance(size, str) else dict(size)
+    results = []
+    for name in cases or CASES:
+        func, rows = CASES[name](dims, seed)
+        result = {'case': name, 'size': size if isinstance(size, str) else 'custom', 'rows': rows,
+                  **measure(func, repeat)}
+        result['rows_per_second'] = rows / result['min_seconds'] if result['min_seconds'] else None
+        result['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{name:>24} {size!s:>7} rows={rows:<10} min={result['min_seconds']:.4f}s "
+              f"peak={result['peak_python_mb']:.1f}MB")
+        results.append(result)
+        del func  # releases the case's temporary files before the next case runs
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def environment():
+    import scipy
+    return {'timestamp': datetime.now(timezone.utc).isoformat(), 'commit': _git_commit(),
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'scipy': scipy.__version__}
+
+
+def save_baseline(results, path):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, results, tolerance=0.10):
+    """Current results against a baseline, matched on (case, size).
+
+    `ratio` is current / baseline min time; rows slower than 1 + tolerance
+    are flagged as regressions (faster than 1 - tolerance as improvements).
+    """
+    base = pd.DataFrame(baseline['results'] if isinstance(baseline, dict) else baseline)
+    current = pd.DataFrame(results)
+    merged = current.merge(base, on=['case', 'size'], how='left', suffixes=('', '_baseline'))
+    merged['ratio'] = merged['min_seconds'] / merged['min_seconds_baseline']
+    merged['memory_ratio'] = merged['peak_python_mb'] / merged['peak_python_mb_baseline']
+    merged['status'] = np.select([merged['ratio'] > 1 + tolerance, merged['ratio'] < 1 - tolerance, merged['ratio'].notna()],
+                                 ['regression', 'improvement', 'same'], 'new')
+    return merged[['case', 'size', 'rows', 'min_seconds', 'min_seconds_baseline', 'ratio',
+                   'peak_python_mb', 'peak_python_mb_baseline', 'memory_ratio', 'status']]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time and memory-profile the project's hot paths")
+    parser.add_argument('cases', nargs='*', help=f"cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument('--size', default='small', choices=list(SIZES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', default='benchmark_results.json', help="where to write this run's results")
+    parser.add_argument('--baseline', help="earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.cases or None, args.size, args.seed, args.repeat)
+    save_baseline(results, args.out)
+    print(f"Results saved to {args.out}")
+    if args.baseline:
+        report = compare(load_baseline(args.baseline), results, args.tolerance)
+        print(report.to_string(index=False))
+        if (report['status'] == 'regression').any():
+            raise SystemExit(1)
@@ -0,0 +1,176 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ['close', 'volume', 'log_return', 'sentiment_score', 'egarch_vol',
+            'garch_vol', 'rsi_14', 'atr_14', 'stddev_21']
+ROLLING_WINDOW = 30
+
+
+def pair_index(k):
+    """Upper-triangle (i, j) column pairs, i < j."""
+    return np.triu_indices(k, 1)
+
+
+def rolling_correlations(x, window, dtype=np.float32):
+    """Rolling Pearson correlation of every column pair of the (time x feature)
+    matrix `x`, shape (time, pairs) in pair_index order.
+
+    Windowed sums come from one cumulative sum per statistic, so every pair
+    and every row is covered in a single vectorized pass. Same NaN semantics
+    as pandas .rolling(window).corr(): NaN until the window is full and
+    whenever either column has a NaN inside it.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n, k = x.shape
+    iu, ju = pair_index(k)
+    out = np.full((n, len(iu)), np.nan, dtype=dtype)
+    if n < window:
+        return out
+
+    nan = np.isnan(x)
+    ref = np.nan_to_num(np.nanmean(x, axis=0)) if (~nan).any() else np.zeros(k)
+    xc = np.where(nan, 0.0, x - ref)  # centering keeps the products well conditioned
+
+    def windowed(a):
+        c = np.cumsum(a, axis=0)
+        c[window:] = c[window:] - c[:-window].copy()
+        return c[window - 1:]
+
+    s1 = windowed(xc)
+    s2 = windowed(xc * xc)
+    sxy = windowed(xc[:, iu] * xc[:, ju])
+    bad = windowed(nan.astype(np.int64))
+
+    cov = sxy - s1[:, iu] * s1[:, ju] / window
+    var_i = s2[:, iu] - s1[:, iu] ** 2 / window
+    var_j = s2[:, ju] - s1[:, ju] ** 2 / window
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.sqrt(np.maximum(var_i, 0.0) * np.maximum(var_j, 0.0))
+    corr[(bad[:, iu] + bad[:, ju]) > 0] = np.nan
+    out[window - 1:] = np.clip(corr, -1.0, 1.0)
+    return out
+
+
+def _update_digest(digest, dates, x):
+    # Hashing is streamed, so feeding rows in chunks gives the same digest as feeding them at once
+    dates_digest, values_digest = digest
+    dates_digest.update(np.ascontiguousarray(pd.DatetimeIndex(dates).asi8).tobytes())
+    values_digest.update(np.ascontiguousarray(x).tobytes())
+
+
+class CorrelationIndex:
+    """Pairwise correlation and OLS fits for a feature set, kept as running sums.
+
+    For every (x, y) pair the index holds the count, sums, sums of squares and
+    cross-products over rows where both are present, so the full correlation
+    matrix and any pair's regression line are O(1) lookups. New rows are
+    folded in with append() without touching the old ones. Rolling-window
+    correlations for every pair are held alongside, extended from a short
+    tail of previous rows.
+    """
+
+    def __init__(self, features, window=ROLLING_WINDOW):
+        self.features = list(features)
+        self.window = window
+        k = len(self.features)
+        self.ref = None
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))   # sx[i, j]: sum of feature i over rows where i and j are present
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+        self.dates = pd.Series([], dtype='datetime64[ns]')
+        self.rolling = np.empty((0, len(pair_index(k)[0])), dtype=np.float32)
+        self._tail = np.empty((0, k))
+        # Running digests of every indexed row, so sync() can tell a rewritten history from an extended one
+        self._digest = (hashlib.blake2b(digest_size=16), hashlib.blake2b(digest_size=16))
+
+    @classmethod
+    def from_frame(cls, df, features=FEATURES, window=ROLLING_WINDOW):
+        index = cls([f for f in features if f in df.columns], window)
+        index.append(df)
+        return index
+
+    def __len__(self):
+        return len(self.dates)
+
+    def append(self, df):
+        """Fold new rows (a frame with 'date' and the feature columns) into the index."""
+        x = df[self.features].to_numpy(dtype=np.float64)
+        if len(x) == 0:
+            return self
+        if self.ref is None:
+            self.ref = np.nan_to_num(np.nanmean(x, axis=0)) if (~np.isnan(x)).any() else np.zeros(len(self.features))
+
+        present = ~np.isnan(x)
+        m = present.astype(np.float64)
+        xc = np.where(present, x - self.ref, 0.0)
+        self.n += m.T @ m
+        self.sx += xc.T @ m
+        self.sxx += (xc * xc).T @ m
+        self.sxy += xc.T @ xc
+
+        # Rolling correlations for the new rows need the previous window - 1 rows as context
+        context = np.vstack([self._tail, x])
+        self.rolling = np.vstack([self.rolling, rolling_correlations(context, self.window)[len(self._tail):]])
+        self._tail = context[-(self.window - 1):] if self.window > 1 else context[:0]
+        self.dates = pd.concat([self.dates, pd.Series(df['date'].to_numpy())], ignore_index=True)
+        _update_digest(self._digest, df['date'], x)
+        return self
+
+    def sync(self, df):
+        """Bring the index up to date with `df`: append the rows past the ones
+        already indexed, or rebuild if the indexed history itself changed.
+
+        The first len(self) rows of `df` are hashed and compared with the
+        digest of the indexed rows, so a rewritten value anywhere in the
+        history (not just a moved last date) triggers the rebuild.
+        """
+        seen = len(self)
+        if seen and len(df) >= seen and set(self.features) <= set(df.columns):
+            prior = df.iloc[:seen]
+            fresh = (hashlib.blake2b(digest_size=16), hashlib.blake2b(digest_size=16))
+            _update_digest(fresh, prior['date'], prior[self.features].to_numpy(dtype=np.float64))
+            if all(a.digest() == b.digest() for a, b in zip(self._digest, fresh)):
+                return self.append(df.iloc[seen:])
+        return type(self).from_frame(df, self.features, self.window)
+
+    def _pair(self, x, y):
+        i, j = self.features.index(x), self.features.index(y)
+        n = self.n[i, j]
+        mean_x, mean_y = self.sx[i, j] / n, self.sx[j, i] / n
+        var_x = self.sxx[i, j] / n - mean_x ** 2
+        var_y = self.sxx[j, i] / n - mean_y ** 2
+        cov = self.sxy[i, j] / n - mean_x * mean_y
+        return n, mean_x + self.ref[i], mean_y + self.ref[j], var_x, var_y, cov
+
+    def corr(self, x, y):
+        _, _, _, var_x, var_y, cov = self._pair(x, y)
+        return float(cov / np.sqrt(var_x * var_y))
+
+    def matrix(self):
+        """Full pairwise-complete Pearson correlation matrix as a DataFrame."""
+        n = self.n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_i, mean_j = self.sx / n, self.sx.T / n
+            cov = self.sxy / n - mean_i * mean_j
+            var_i = self.sxx / n - mean_i ** 2
+            var_j = self.sxx.T / n - mean_j ** 2
+            corr = np.clip(cov / np.sqrt(var_i * var_j), -1.0, 1.0)
+        return pd.DataFrame(corr, index=self.features, columns=self.features)
+
+    def ols(self, x, y):
+        """Least-squares fit of y on x: dict of slope, intercept, r2, corr and n."""
+        n, mean_x, mean_y, var_x, var_y, cov = self._pair(x, y)
+        slope = cov / var_x
+        corr = cov / np.sqrt(var_x * var_y)
+        return {'slope': float(slope), 'intercept': float(mean_y - slope * mean_x),
+                'r2': float(corr ** 2), 'corr': float(corr), 'n': int(n)}
+
+    def rolling_corr(self, x, y):
+        """Rolling correlation of one pair as a Series indexed by date."""
+        i, j = sorted((self.features.index(x), self.features.index(y)))
+        iu, ju = pair_index(len(self.features))
+        col = int(np.flatnonzero((iu == i) & (ju == j))[0])
+        return pd.Series(self.rolling[:, col], index=pd.DatetimeIndex(self.dates), name=f'{x}~{y}')
@@ -0,0 +1,181 @@
+import os
+import threading
+
+import streamlit as st
+
+import instrumentation
+import storage
+from anomaly_index import AnomalyIndex
+from correlation import FEATURES, ROLLING_WINDOW, CorrelationIndex
+from forecast_store import ForecastStore
+from price_poller import PricePoller
+from risk_engine import simulate_risk, stack_params
+from tick_stream import StreamRunner, TickStream, TradeFeed
+from vol_engine import VolatilityEngine
+
+QUOTE_TTL = 60  # seconds between background price polls
+# Binance-compatible trade stream (wss://stream.binance.com:9443, or a local tick_stream.ReplayServer);
+# the live bar panel is off while this is unset
+TICK_FEED_URL = os.environ.get('CRYPTO_TICK_FEED')
+
+
+def file_version(path):
+    """Modification time of whatever backs a table, used to invalidate cached reads."""
+    target = path if os.path.exists(path) else storage.locate(path)
+    if target is None:
+        raise FileNotFoundError(f"No table found at {path}")
+    if os.path.isdir(target):
+        target = os.path.join(target, '_meta.json')
+    return os.path.getmtime(target)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _read_table(path, columns, version):
+    return storage.read_table(path, columns=list(columns) if columns is not None else None)
+
+
+def load_dataset(path, columns=None):
+    """Read a table once per file version; reruns with the same file hit memory.
+
+    `version` is part of the cache key, so rewriting the file (a new
+    pipeline run) invalidates the entry without a manual clear.
+    """
+    key = tuple(columns) if columns is not None else None
+    return _read_table(path, key, file_version(path))
+
+
+# Keyed on the path only, so a rewritten table replaces the old cube instead of sitting next to it
+@st.cache_resource
+def _anomaly_slot(path, column):
+    return {'lock': threading.Lock(), 'version': None, 'index': None}
+
+
+def anomaly_index(path, column='log_return'):
+    """Rolling z-scores for every slider window, rebuilt only when the table changes."""
+    slot = _anomaly_slot(path, column)
+    version = file_version(path)
+    with slot['lock']:
+        if slot['version'] != version:
+            slot['index'] = None  # let the old cube go before the new one is built
+            slot['index'] = AnomalyIndex.from_frame(storage.read_table(path, columns=['date', column]), column)
+            slot['version'] = version
+        return slot['index']
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _table_columns(path, version):
+    return storage.table_columns(path)
+
+
+@st.cache_resource
+def _correlation_slot(path, features, window):
+    return {'lock': threading.Lock(), 'version': None, 'index': None}
+
+
+def correlation_index(path, features=FEATURES, window=ROLLING_WINDOW):
+    """Correlation matrix, rolling correlations and per-pair OLS for the features present in the table.
+
+    The index lives across reruns and sessions; when the file changes only
+    the appended rows are folded in (a rewritten history is rebuilt). The
+    column list is cached per file version like the table reads.
+    """
+    version = file_version(path)
+    columns = _table_columns(path, version)
+    features = tuple(f for f in features if f in columns)
+    slot = _correlation_slot(path, features, window)
+    with slot['lock']:
+        if slot['version'] != version:
+            df = storage.read_table(path, columns=['date'] + list(features))
+            if slot['index'] is None:
+                slot['index'] = CorrelationIndex.from_frame(df, features, window)
+            else:
+                slot['index'] = slot['index'].sync(df)
+            slot['version'] = version
+        return slot['index']
+
+
+@st.cache_resource
+def _forecast_store(path):
+    return ForecastStore(path)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _read_forecast(path, ticker, version):
+    return _forecast_store(path).get(ticker)
+
+
+def forecast_tickers(path):
+    if not os.path.exists(path):
+        return []
+    return _store_tickers(path, file_version(path))
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _store_tickers(path, version):
+    return _forecast_store(path).tickers()
+
+
+def load_store_forecast(path, ticker):
+    return _read_forecast(path, ticker, file_version(path))
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _simulated_risk(engine_path, horizons, version):
+    engine = VolatilityEngine.load_or_create(engine_path, vol='EGARCH')
+    params = stack_params([engine.params], [engine.vol], [engine.dist])
+    return simulate_risk(params, [engine.sigma2], horizons=horizons, n_paths=10000, alpha=0.05, seed=0)
+
+
+def simulated_risk(engine_path, horizons=(1, 5, 10)):
+    """Monte Carlo VaR/ES from a saved volatility engine, recomputed only when the engine file changes."""
+    return _simulated_risk(engine_path, tuple(horizons), file_version(engine_path))
+
+
+@st.cache_resource
+def _price_poller(coin_ids, vs_currencies):
+    # One poller per server process; its thread refreshes quotes off the render path
+    poller = PricePoller(ttl=QUOTE_TTL)
+    poller.start(list(coin_ids), list(vs_currencies), interval=QUOTE_TTL)
+    return poller
+
+
+def live_price(coin_id='bitcoin', vs_currency='usd'):
+    """Latest polled price, or None until the first background poll lands. Never blocks on the network."""
+    quote = _price_poller((coin_id,), (vs_currency,)).snapshot([coin_id], [vs_currency]).get((coin_id, vs_currency))
+    return quote['price'] if quote else None
+
+
+@st.cache_resource
+def _tick_stream(url, symbols, interval):
+    # One stream per server process, running on its own event loop thread
+    runner = StreamRunner(TickStream(TradeFeed(list(symbols), url), interval))
+    runner.start()
+    return runner
+
+
+def _live_runner(symbol, interval):
+    runner = _tick_stream(TICK_FEED_URL, (symbol,), interval)
+    if not runner.running:
+        runner.start()  # the cached runner outlives a failed stream, so bring it back on the next read
+    return runner
+
+
+def live_bars(symbol='BTCUSDT', interval=60):
+    """Recent bars with live features from the trade stream; None when no feed is configured."""
+    if not TICK_FEED_URL:
+        return None
+    return _live_runner(symbol, interval).frame(symbol)
+
+
+def live_stream_error(symbol='BTCUSDT', interval=60):
+    """Why the trade stream last stopped, or None while it is healthy or not configured."""
+    if not TICK_FEED_URL:
+        return None
+    error = _live_runner(symbol, interval).error
+    return repr(error) if error is not None else None
+
+
+@st.cache_resource
+def page_recorder(path):
+    """One recorder per server process, appending every page render to `path`."""
+    return instrumentation.Recorder(path)
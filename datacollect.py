@@ -1,20 +1,14 @@
-# Install dependencies (if not already installed)
-!pip install yfinance --quiet
-
 import yfinance as yf
-import requests
 import pandas as pd
 from datetime import datetime
-import os
 
-# Create directory to store data
-os.makedirs('/content/crypto_forecasting/data/raw', exist_ok=True)
+import storage
+from bar_cache import BarCache
+from intraday import RESOLUTIONS, ChunkedDownloader, resample_ohlcv
+from price_poller import get_poller
 
 # 1. Fetch Historical Data from Yahoo Finance
-def fetch_yfinance_data(ticker='BTC-USD', start='2020-01-01', end=None, interval='1d'):
-    if end is None:
-        end = datetime.today().strftime('%Y-%m-%d')
-
+def download_yfinance_data(ticker, start, end, interval):
     data = yf.download(ticker, start=start, end=end, interval=interval)
 
     data = data.copy()
@@ -24,34 +18,80 @@ def fetch_yfinance_data(ticker='BTC-USD', start='2020-01-01', end=None, interval
 
     return data
 
-btc_df = fetch_yfinance_data(ticker='BTC-USD', start='2025-01-01')
-btc_df.to_csv('/content/btc_yfinancen.csv', index=False)
-print("BTC historical data from Yahoo Finance saved.")
+# Local bar cache: repeat fetches only download the date ranges not seen before.
+# Gaps longer than Yahoo's per-request intraday window are split into chunks and fetched concurrently
+def make_bar_cache(root, workers=4):
+    return BarCache(root, downloader=ChunkedDownloader(download_yfinance_data, workers=workers))
+
+def fetch_yfinance_data(ticker='BTC-USD', start='2020-01-01', end=None, interval='1d', cache=None):
+    if end is None:
+        end = datetime.today().strftime('%Y-%m-%d')
+
+    if cache is None:
+        return download_yfinance_data(ticker, start, end, interval)
+    return cache.fetch(ticker, start, end, interval)
+
+# Pipeline stage: daily history
+def collect_prices(dst, ticker='BTC-USD', start='2025-01-01', end=None, cache_dir=None):
+    cache = make_bar_cache(cache_dir) if cache_dir else None
+    btc_df = fetch_yfinance_data(ticker=ticker, start=start, end=end, cache=cache)
+    storage.write_table(btc_df, dst)
+    print("BTC historical data from Yahoo Finance saved.")
+    return btc_df
+
+# Intraday history: fetch the base bars once and aggregate them to every coarser bar size,
+# so preprocess can run on any of them without refetching
+def fetch_intraday(ticker='BTC-USD', start=None, end=None, interval='1m', resolutions=RESOLUTIONS, cache=None):
+    if start is None:
+        start = (pd.Timestamp.today().normalize() - pd.Timedelta(days=29)).strftime('%Y-%m-%d')
+    if end is None:
+        end = pd.Timestamp.now(tz='UTC').tz_localize(None).floor('min')
+    bars = fetch_yfinance_data(ticker, start, end, interval, cache=cache)
+    if not len(bars):
+        return {}
+    # Every resolution uses the same 'date' column preprocess sorts on
+    bars = bars.rename(columns={'datetime': 'date'})
+    return {interval: bars, **resample_ohlcv(bars, resolutions)}
+
+# Pipeline stage: intraday bars at every resolution; `dsts` maps resolution -> table path.
+# `end` only marks the run day (it keys the stage's cache); bars are fetched up to now
+def collect_intraday(dsts, ticker='BTC-USD', end=None, interval='1m', cache_dir=None):
+    cache = make_bar_cache(cache_dir) if cache_dir else None
+    frames = fetch_intraday(ticker, interval=interval, resolutions=[r for r in dsts if r != interval], cache=cache)
+    for res, bars in frames.items():
+        storage.write_table(bars, dsts[res])
+    print("BTC intraday bars saved at", ", ".join(frames))
+    return frames
 
 # 2. Fetch Real-Time Market Price from CoinGecko
-def get_realtime_price(coin_id='bitcoin', vs_currency='usd'):
-    url = 'https://api.coingecko.com/api/v3/simple/price'
-    params = {
-        'ids': coin_id,
-        'vs_currencies': vs_currency,
-        'include_last_updated_at': 'true'
-    }
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    response = requests.get(url, params=params, headers=headers)
-
-    if response.status_code != 200:
-        raise Exception(f"Error fetching real-time data: {response.status_code}")
-
-    data = response.json()
-    price = data[coin_id][vs_currency]
-    timestamp = datetime.fromtimestamp(data[coin_id]['last_updated_at'])
+# Goes through the shared batched poller (pooled session, retries, TTL quote table)
+def get_realtime_price(coin_id='bitcoin', vs_currency='usd', poller=None):
+    quote = (poller or get_poller()).quote(coin_id, vs_currency)
 
     realtime_df = pd.DataFrame([{
-        'timestamp': timestamp,
-        'price': price
+        'timestamp': datetime.fromtimestamp(quote['last_updated_at']) if quote['last_updated_at'] else None,
+        'price': quote['price']
     }])
     return realtime_df
 
-btc_realtime_df = get_realtime_price('bitcoin')
-btc_realtime_df.to_csv('/content/btc_realtime_pricen.csv', index=False)
-print("Real-time BTC price from CoinGecko saved.")
+def get_realtime_prices(coin_ids, vs_currencies=('usd',), poller=None):
+    quotes = (poller or get_poller()).refresh(coin_ids, vs_currencies)
+    return pd.DataFrame([{
+        'coin_id': coin_id,
+        'vs_currency': vs,
+        'timestamp': datetime.fromtimestamp(q['last_updated_at']) if q['last_updated_at'] else None,
+        'price': q['price']
+    } for (coin_id, vs), q in quotes.items()])
+
+def save_realtime_price(dst, coin_id='bitcoin'):
+    btc_realtime_df = get_realtime_price(coin_id)
+    storage.write_table(btc_realtime_df, dst)
+    print("Real-time BTC price from CoinGecko saved.")
+    return btc_realtime_df
+
+if __name__ == '__main__':
+    import os
+    from pipeline import DATA_DIR, run
+
+    print(run(['prices', 'intraday']).to_string(index=False))
+    save_realtime_price(os.path.join(DATA_DIR, 'btc_realtime_pricen'))
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+DEFAULT_POINTS = 2000  # roughly one point per horizontal pixel of a wide chart
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def _bucket_edges(n, n_out):
+    # First and last points are kept as-is; the interior is split into n_out - 2 buckets
+    return (1 + np.floor(np.arange(n_out - 1) * (n - 2) / (n_out - 2))).astype(np.int64)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: from each bucket keep the point that forms
+    the largest triangle with the previous pick and the next bucket's average."""
+    x, y = _as_float(x), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = _bucket_edges(n, n_out)
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+    avg_x = np.add.reduceat(x, starts) / counts
+    avg_y = np.add.reduceat(y, starts) / counts
+    # The bucket after the last one is just the final point
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i, (lo, hi) in enumerate(zip(starts, ends)):
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def minmax_indices(y, n_out):
+    """Keep the min and max of each of n_out / 2 equal-count buckets, plus both ends."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    buckets = max(n_out // 2, 1)
+    if n_out >= n:
+        return np.arange(n)
+
+    starts = np.floor(np.arange(buckets) * n / buckets).astype(np.int64)
+    ends = np.append(starts[1:], n)
+    # Pad each bucket to the same width so argmin/argmax run over a 2-D view
+    width = int((ends - starts).max())
+    cols = starts[:, None] + np.arange(width)
+    inside = cols < ends[:, None]
+    cols = np.minimum(cols, n - 1)
+    block = y[cols]
+    lo = cols[np.arange(buckets), np.where(inside, block, np.inf).argmin(axis=1)]
+    hi = cols[np.arange(buckets), np.where(inside, block, -np.inf).argmax(axis=1)]
+    return np.unique(np.concatenate([[0, n - 1], lo, hi]))
+
+
+def cap_flags(keep, score, n_out):
+    """Thin the boolean mask `keep` to at most `n_out` rows: the flagged rows
+    are split into `n_out` equal-width position buckets and only the one
+    with the largest |score| in each bucket stays flagged."""
+    keep = np.asarray(keep, dtype=bool)
+    flagged = np.flatnonzero(keep)
+    if len(flagged) <= n_out:
+        return keep
+    bucket = flagged * n_out // len(keep)
+    # Sort by bucket, then by descending |score|, and take the first row of each bucket
+    order = np.lexsort((-np.abs(np.nan_to_num(np.asarray(score, dtype=np.float64)[flagged])), bucket))
+    _, first = np.unique(bucket[order], return_index=True)
+    capped = np.zeros(len(keep), dtype=bool)
+    capped[flagged[order[first]]] = True
+    return capped
+
+
+def downsample_indices(x, y, n_out=DEFAULT_POINTS, method='lttb', keep=None, score=None):
+    """Row positions to plot: about `n_out` points chosen by `method`
+    ('lttb' or 'minmax'), always including the global min and max and
+    the rows flagged in the boolean `keep` (e.g. anomalies). Flagged rows
+    are capped at n_out / 2 by the largest |score| (default |y|) per
+    bucket, so the result stays bounded. NaN values are skipped; the
+    result is sorted."""
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) == 0:
+        return valid
+
+    yv = y[valid]
+    if method == 'lttb':
+        picked = lttb_indices(np.asarray(x)[valid], yv, n_out)
+    elif method == 'minmax':
+        picked = minmax_indices(yv, n_out)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+
+    extras = [valid[picked], valid[[yv.argmin(), yv.argmax()]]]
+    if keep is not None:
+        keep = cap_flags(keep, y if score is None else score, max(n_out // 2, 1))
+        extras.append(np.flatnonzero(keep))
+    return np.unique(np.concatenate(extras))
+
+
+def visible_slice(x, start=None, end=None):
+    """Positional slice of the sorted `x` that falls inside [start, end]."""
+    x = pd.Series(x)
+    lo = 0 if start is None else int(x.searchsorted(pd.Timestamp(start) if x.dtype.kind == 'M' else start, side='left'))
+    hi = len(x) if end is None else int(x.searchsorted(pd.Timestamp(end) if x.dtype.kind == 'M' else end, side='right'))
+    return slice(lo, hi)
+
+
+def downsample_frame(df, x, y, n_out=DEFAULT_POINTS, start=None, end=None, method='lttb', keep=None, score=None):
+    """Rows of `df` to plot for column `y` against `x` within the visible
+    range. Only the visible rows are considered, so zooming in brings back
+    detail at the same point budget. `keep` and `score` may each be a
+    column name or an array aligned with `df`."""
+    visible = visible_slice(df[x], start, end)
+    window = df.iloc[visible]
+
+    def column(v):
+        if isinstance(v, str):
+            return window[v].to_numpy()
+        return None if v is None else np.asarray(v)[visible]
+
+    keep, score = column(keep), column(score)
+    return window.iloc[downsample_indices(window[x].to_numpy(), window[y].to_numpy(), n_out, method, keep, score)]
@@ -0,0 +1,230 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+RAW_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+FEATURE_COLUMNS = ['return', 'log_return', 'sma_7', 'sma_21', 'stddev_21',
+                   'upper_band', 'lower_band', 'rsi_14', 'atr_14']
+
+# Longest lookback any feature needs (sma_21 / stddev_21) plus the previous close
+WARMUP_BARS = 22
+
+# Storage dtypes for the chunked path. Indicators keep ~7 significant digits in float32,
+# well past their meaningful precision; raw prices stay float64 because BTC at ~1e5 would
+# lose its cents and returns/forecasts downstream are computed from them.
+COMPACT_DTYPES = {col: 'float32' for col in FEATURE_COLUMNS}
+
+
+# RSI
+def compute_rsi(series, window=14):
+    delta = series.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+# Bulk mode: the full-history pandas computation (same output as preprocess.py always had)
+def compute_features(df):
+    df = df.copy()
+
+    # Daily returns
+    df['return'] = df['close'].pct_change()
+    df['log_return'] = np.log(df['close'] / df['close'].shift(1))
+
+    # Moving averages
+    df['sma_7'] = df['close'].rolling(window=7).mean()
+    df['sma_21'] = df['close'].rolling(window=21).mean()
+
+    # Bollinger Bands
+    df['stddev_21'] = df['close'].rolling(window=21).std()
+    df['upper_band'] = df['sma_21'] + (2 * df['stddev_21'])
+    df['lower_band'] = df['sma_21'] - (2 * df['stddev_21'])
+
+    df['rsi_14'] = compute_rsi(df['close'], 14)
+
+    # ATR
+    hl = df['high'] - df['low']
+    hc = np.abs(df['high'] - df['close'].shift())
+    lc = np.abs(df['low'] - df['close'].shift())
+    tr = pd.concat([hl, hc, lc], axis=1).max(axis=1)
+    df['atr_14'] = tr.rolling(window=14).mean()
+
+    return df
+
+
+class ChunkedFeatures:
+    """compute_features over a history that arrives in consecutive blocks.
+
+    The last WARMUP_BARS forward-filled raw bars of each block are carried
+    into the next one, which covers every rolling window and the previous
+    close, so each block's rows come out as they would from the full
+    history. Blocks must be in date order; memory stays proportional to the
+    block size.
+    """
+
+    def __init__(self, dtypes=None):
+        self.dtypes = COMPACT_DTYPES if dtypes is None else dtypes
+        self.tail = None
+        self.last_date = None
+
+    def update(self, chunk):
+        chunk = chunk.reset_index(drop=True)
+        if 'date' in chunk.columns and len(chunk):
+            dates = chunk['date']
+            if not dates.is_monotonic_increasing or (self.last_date is not None and dates.iloc[0] < self.last_date):
+                raise ValueError("Chunked features need input sorted by date; use compute_features on the full history")
+            self.last_date = dates.iloc[-1]
+
+        carried = 0 if self.tail is None else len(self.tail)
+        frame = chunk if self.tail is None else pd.concat([self.tail, chunk], ignore_index=True)
+        raw = [col for col in RAW_COLUMNS if col in frame.columns]
+        frame[raw] = frame[raw].ffill()  # the carried bars are already filled, so gaps fill across blocks too
+        self.tail = frame.tail(WARMUP_BARS).reset_index(drop=True)
+
+        out = compute_features(frame).iloc[carried:].reset_index(drop=True)
+        return out.astype({col: dtype for col, dtype in self.dtypes.items() if col in out.columns})
+
+    def run(self, chunks):
+        for chunk in chunks:
+            yield self.update(chunk)
+
+
+class RollingWindow:
+    """Fixed-size window keeping a running mean and sum of squared deviations.
+
+    Adding a value and evicting the oldest one are both O(1), so the mean and
+    sample standard deviation are available after every push without
+    rescanning the window. Nonzero values are counted too, so a window of
+    zeros reports exactly 0 instead of the rounding left by the updates.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._nonzero = 0
+
+    def push(self, x):
+        self.values.append(x)
+        self._nonzero += x != 0
+        n = len(self.values)
+        delta = x - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (x - self._mean)
+
+        if n > self.size:
+            old = self.values.popleft()
+            self._nonzero -= old != 0
+            n -= 1
+            delta = old - self._mean
+            self._mean -= delta / n
+            self._m2 -= delta * (old - self._mean)
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    @property
+    def mean(self):
+        if not self.full:
+            return math.nan
+        return self._mean if self._nonzero else 0.0
+
+    @property
+    def std(self):
+        if not self.full or self.size < 2:
+            return math.nan
+        if not self._nonzero:
+            return 0.0
+        return math.sqrt(max(self._m2, 0.0) / (self.size - 1))
+
+
+class FeatureEngine:
+    """Stateful, per-bar version of compute_features.
+
+    Each call to update() takes one OHLCV bar and returns every feature column
+    for that bar, matching what compute_features gives for the same row of the
+    full history. Only the window buffers are kept, so a new candle costs a
+    handful of arithmetic operations instead of a full recompute.
+    """
+
+    def __init__(self):
+        self.sma_7 = RollingWindow(7)
+        self.close_21 = RollingWindow(21)
+        self.gain_14 = RollingWindow(14)
+        self.loss_14 = RollingWindow(14)
+        self.tr_14 = RollingWindow(14)
+        self.last = {}  # last seen raw values, used to forward-fill gaps
+
+    def update(self, bar):
+        raw = {}
+        for col in RAW_COLUMNS:
+            value = bar.get(col, math.nan)
+            value = math.nan if value is None else float(value)
+            if math.isnan(value):
+                value = self.last.get(col, math.nan)
+            raw[col] = value
+
+        close, high, low = raw['close'], raw['high'], raw['low']
+        prev_close = self.last.get('close', math.nan)
+
+        if prev_close != prev_close:  # first bar
+            ret = log_ret = math.nan
+            delta = math.nan
+        else:
+            ret = close / prev_close - 1
+            log_ret = math.log(close / prev_close) if close > 0 and prev_close > 0 else math.nan
+            delta = close - prev_close
+
+        # Daily returns
+        out = {'return': ret, 'log_return': log_ret}
+
+        # Moving averages
+        self.sma_7.push(close)
+        self.close_21.push(close)
+        out['sma_7'] = self.sma_7.mean
+        out['sma_21'] = self.close_21.mean
+
+        # Bollinger Bands
+        out['stddev_21'] = self.close_21.std
+        out['upper_band'] = out['sma_21'] + 2 * out['stddev_21']
+        out['lower_band'] = out['sma_21'] - 2 * out['stddev_21']
+
+        # RSI (the first bar has no delta and counts as zero gain/loss, like compute_rsi)
+        self.gain_14.push(delta if delta > 0 else 0.0)
+        self.loss_14.push(-delta if delta < 0 else 0.0)
+        out['rsi_14'] = _rsi(self.gain_14.mean, self.loss_14.mean)
+
+        # ATR
+        tr = high - low
+        if prev_close == prev_close:
+            tr = max(tr, abs(high - prev_close), abs(low - prev_close))
+        self.tr_14.push(tr)
+        out['atr_14'] = self.tr_14.mean
+
+        self.last = raw
+        return {**bar, **raw, **out}
+
+    def warm_up(self, df):
+        # Only the trailing window matters for the state, so skip the rest of the history
+        for bar in df.tail(WARMUP_BARS).to_dict('records'):
+            self.update(bar)
+        return self
+
+    def run(self, df):
+        rows = [self.update(bar) for bar in df.to_dict('records')]
+        return pd.DataFrame(rows, columns=list(df.columns) + [c for c in FEATURE_COLUMNS if c not in df.columns])
+
+
+def _rsi(gain, loss):
+    if gain != gain or loss != loss:
+        return math.nan
+    # Both windows hold non-negative values; a negative mean is only update rounding
+    gain, loss = max(gain, 0.0), max(loss, 0.0)
+    if loss == 0:
+        return 100.0 if gain > 0 else math.nan
+    return 100 - (100 / (1 + gain / loss))
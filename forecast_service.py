@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+from prophet.serialize import model_from_json, model_to_json
+
+REGRESSORS = ['sentiment_score', 'volume', 'log_return',
+              'sma_7', 'sma_21', 'upper_band', 'lower_band', 'rsi_14', 'atr_14']
+
+DEFAULT_PROPHET_KWARGS = {'daily_seasonality': True}
+
+
+# Same preparation time_series.py has always done before fitting
+def prepare_training_frame(df, regressors=REGRESSORS):
+    df = df.copy()
+
+    # Fill sentiment NAs (bfill just in case)
+    df['sentiment_score'] = df['sentiment_score'].ffill().bfill()
+
+    # Rename for Prophet
+    df = df.rename(columns={'date': 'ds', 'close': 'y'})
+
+    # Select needed columns
+    return df[['ds', 'y'] + list(regressors)].dropna().reset_index(drop=True)
+
+
+def fingerprint(train, config):
+    h = hashlib.sha256()
+    h.update(json.dumps(config, sort_keys=True).encode())
+    h.update(pd.util.hash_pandas_object(train, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:24]
+
+
+def stan_init(model):
+    """Fitted parameters of `model` in the form Prophet.fit(init=...) accepts."""
+    return {name: (model.params[name][0][0] if name in ('k', 'm', 'sigma_obs') else model.params[name][0])
+            for name in ('k', 'm', 'sigma_obs', 'delta', 'beta')}
+
+
+class ForecastService:
+    """Prophet with a persisted model cache.
+
+    Fitted models are serialized under `cache_dir`, keyed by a hash of the
+    training rows and the model configuration, so an unchanged dataset
+    never refits. When the rows did change, the fit starts from the
+    parameters of the last model with the same configuration. With
+    cache_dir=None every fit is a plain cold fit.
+
+    Every new day is a new fingerprint, so only the `max_models` most
+    recently used models are kept; the warm-start model is never evicted.
+    """
+
+    def __init__(self, cache_dir, regressors=REGRESSORS, prophet_kwargs=None, max_models=4):
+        self.cache_dir = cache_dir
+        self.max_models = max_models
+        self.regressors = list(regressors)
+        self.prophet_kwargs = dict(DEFAULT_PROPHET_KWARGS if prophet_kwargs is None else prophet_kwargs)
+        self.config = {'regressors': self.regressors, 'prophet': self.prophet_kwargs}
+        self.config_key = fingerprint(pd.DataFrame(), self.config)
+        self.last_fit = None  # 'cached', 'warm' or 'cold'
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def _latest_path(self):
+        return os.path.join(self.cache_dir, f'latest_{self.config_key}.txt')
+
+    def _load(self, key):
+        with open(self._path(key)) as f:
+            return model_from_json(f.read())
+
+    def new_model(self):
+        model = Prophet(**self.prophet_kwargs)
+        for reg in self.regressors:
+            model.add_regressor(reg)
+        return model
+
+    def fit(self, train):
+        if not self.cache_dir:
+            model = self.new_model()
+            model.fit(train)
+            self.last_fit = 'cold'
+            return model
+
+        key = fingerprint(train, self.config)
+        if os.path.exists(self._path(key)):
+            self.last_fit = 'cached'
+            os.utime(self._path(key))  # mark as recently used for _prune()
+            return self._load(key)
+
+        init = None
+        try:
+            with open(self._latest_path()) as f:
+                init = stan_init(self._load(f.read().strip()))
+        except (FileNotFoundError, KeyError, IndexError, ValueError):
+            init = None
+
+        model = self.new_model()
+        if init:
+            model.fit(train, init=init)
+        else:
+            model.fit(train)
+        self.last_fit = 'warm' if init else 'cold'
+
+        with open(self._path(key), 'w') as f:
+            f.write(model_to_json(model))
+        with open(self._latest_path(), 'w') as f:
+            f.write(key)
+        self._prune()
+        return model
+
+    def _prune(self):
+        # Least recently used first; models some configuration warm-starts from stay
+        keep = set()
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('latest_') and name.endswith('.txt'):
+                with open(os.path.join(self.cache_dir, name)) as f:
+                    keep.add(f.read().strip() + '.json')
+        models = sorted((name for name in os.listdir(self.cache_dir) if name.endswith('.json')),
+                        key=lambda name: os.path.getmtime(os.path.join(self.cache_dir, name)))
+        excess = len(models) - self.max_models
+        for name in models:
+            if excess <= 0:
+                break
+            if name not in keep:
+                os.remove(os.path.join(self.cache_dir, name))
+                excess -= 1
+
+    def make_future(self, model, train, periods):
+        future = model.make_future_dataframe(periods=periods)
+        # Extend future DataFrame with regressor values
+        # Use the last known value to fill in future steps
+        for reg in self.regressors:
+            future[reg] = np.concatenate([train[reg].to_numpy(), np.repeat(train[reg].iloc[-1], periods)])
+        return future
+
+    def forecast(self, train, periods=30):
+        """Fit (or load) the model and predict once over history plus `periods` days."""
+        model = self.fit(train)
+        forecast = model.predict(self.make_future(model, train, periods))
+        return model, forecast
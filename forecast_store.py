@@ -0,0 +1,69 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+FORECAST_COLUMNS = ['ds', 'horizon', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+class ForecastStore:
+    """SQLite table of forecasts keyed by (ticker, run_date, ds).
+
+    The primary key doubles as the index, so fetching one ticker's latest
+    run is an index range scan rather than a file parse.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS forecasts (
+                ticker TEXT NOT NULL,
+                run_date TEXT NOT NULL,
+                ds TEXT NOT NULL,
+                horizon INTEGER NOT NULL,
+                yhat REAL,
+                yhat_lower REAL,
+                yhat_upper REAL,
+                PRIMARY KEY (ticker, run_date, ds)
+            ) WITHOUT ROWID
+        """)
+
+    def write(self, ticker, run_date, forecast):
+        """Replace the rows for (ticker, run_date) with `forecast`
+        (columns ds, horizon, yhat, yhat_lower, yhat_upper)."""
+        run_date = pd.Timestamp(run_date).strftime('%Y-%m-%d')
+        rows = [(ticker, run_date, pd.Timestamp(ds).strftime('%Y-%m-%d %H:%M:%S'), int(h), float(y), float(lo), float(hi))
+                for ds, h, y, lo, hi in forecast[FORECAST_COLUMNS].itertuples(index=False)]
+        with self.conn:
+            self.conn.execute('DELETE FROM forecasts WHERE ticker = ? AND run_date = ?', (ticker, run_date))
+            self.conn.executemany('INSERT INTO forecasts VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def tickers(self):
+        return [row[0] for row in self.conn.execute('SELECT DISTINCT ticker FROM forecasts ORDER BY ticker')]
+
+    def run_dates(self, ticker):
+        return [row[0] for row in self.conn.execute(
+            'SELECT DISTINCT run_date FROM forecasts WHERE ticker = ? ORDER BY run_date', (ticker,))]
+
+    def get(self, ticker, run_date=None, max_horizon=None):
+        """One run's forecast for `ticker` (the latest run by default), ordered by ds."""
+        if run_date is None:
+            row = self.conn.execute('SELECT MAX(run_date) FROM forecasts WHERE ticker = ?', (ticker,)).fetchone()
+            run_date = row[0]
+            if run_date is None:
+                return pd.DataFrame(columns=FORECAST_COLUMNS)
+        query = 'SELECT ds, horizon, yhat, yhat_lower, yhat_upper FROM forecasts WHERE ticker = ? AND run_date = ?'
+        params = [ticker, pd.Timestamp(run_date).strftime('%Y-%m-%d')]
+        if max_horizon is not None:
+            query += ' AND horizon <= ?'
+            params.append(int(max_horizon))
+        df = pd.read_sql_query(query + ' ORDER BY ds', self.conn, params=params)
+        df['ds'] = pd.to_datetime(df['ds'])
+        return df
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,263 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+_current = contextvars.ContextVar('instrumentation_span', default=None)
+_http_lock = threading.Lock()
+_trace_lock = threading.Lock()
+_trace_users = 0  # spans currently relying on tracemalloc; the last one out stops it
+# Process-wide HTTP totals per host, including calls made outside any span (e.g. the price poller thread)
+_http_totals = defaultdict(lambda: {'count': 0, 'errors': 0, 'seconds': 0.0})
+
+
+class Span:
+    """Metrics for one unit of work: a pipeline stage or a dashboard page render.
+
+    Wall and CPU time are measured around the block; CPU time is the
+    entering thread's own (work pushed to process pools is not included).
+    Peak memory comes from tracemalloc, which is process-wide: spans
+    running concurrently see each other's allocations, and starting a span
+    resets the peak for all of them. Rows, bytes and HTTP calls are added
+    by storage and the HTTP clients while the span is current, including
+    from worker threads started with the span's context.
+    """
+
+    def __init__(self, name, kind='stage', trace_memory=True, **labels):
+        self.name = name
+        self.kind = kind
+        self.labels = labels
+        self.trace_memory = trace_memory
+        self.rows_read = 0
+        self.rows_written = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.http_calls = 0
+        self.http_errors = 0
+        self.http_seconds = 0.0
+        self.error = None
+        self._lock = threading.Lock()
+
+    def add_io(self, rows_read=0, rows_written=0, bytes_read=0, bytes_written=0):
+        with self._lock:
+            self.rows_read += rows_read
+            self.rows_written += rows_written
+            self.bytes_read += bytes_read
+            self.bytes_written += bytes_written
+
+    def add_http(self, seconds, error=False):
+        with self._lock:
+            self.http_calls += 1
+            self.http_errors += int(error)
+            self.http_seconds += seconds
+
+    def start(self):
+        global _trace_users
+        if self.trace_memory:
+            with _trace_lock:
+                if _trace_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                _trace_users += 1
+                tracemalloc.reset_peak()
+        self._token = _current.set(self)
+        self.started_at = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def finish(self, error=None):
+        global _trace_users
+        self.wall_seconds = time.perf_counter() - self._wall
+        self.cpu_seconds = time.thread_time() - self._cpu
+        self.peak_memory_bytes = None
+        if self.trace_memory:
+            with _trace_lock:
+                self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+                _trace_users -= 1
+                if _trace_users == 0:
+                    tracemalloc.stop()
+        _current.reset(self._token)
+        if error is not None:
+            self.error = repr(error)
+        return self
+
+    def to_dict(self):
+        return {
+            'name': self.name, 'kind': self.kind, 'labels': self.labels,
+            'started_at': self.started_at, 'wall_seconds': self.wall_seconds, 'cpu_seconds': self.cpu_seconds,
+            'peak_memory_bytes': self.peak_memory_bytes,
+            'rows_read': self.rows_read, 'rows_written': self.rows_written,
+            'bytes_read': self.bytes_read, 'bytes_written': self.bytes_written,
+            'http_calls': self.http_calls, 'http_errors': self.http_errors, 'http_seconds': self.http_seconds,
+            'error': self.error,
+        }
+
+
+class Recorder:
+    """Collects finished spans and appends each one as a JSON line to `path` (if given)."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.records = []
+        self._lock = threading.Lock()
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def record(self, span):
+        row = span.to_dict()
+        with self._lock:
+            self.records.append(row)
+            if self.path:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(row, default=str) + '\n')
+        return row
+
+    def span(self, name, kind='stage', trace_memory=True, **labels):
+        return span(name, kind, recorder=self, trace_memory=trace_memory, **labels)
+
+
+class span:
+    """Context manager timing a block: `with span('features', recorder=rec) as s: ...`.
+
+    The finished span goes to `recorder`; it is returned either way, and an
+    exception is recorded on the span and re-raised.
+    """
+
+    def __init__(self, name, kind='stage', recorder=None, trace_memory=True, **labels):
+        self.span = Span(name, kind, trace_memory, **labels)
+        self.recorder = recorder
+
+    def __enter__(self):
+        return self.span.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.finish(exc)
+        if self.recorder is not None:
+            self.recorder.record(self.span)
+        return False
+
+
+def instrumented(name=None, kind='stage', recorder=None, trace_memory=True):
+    """Decorator form of span()."""
+    def wrap(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with span(name or func.__name__, kind, recorder, trace_memory):
+                return func(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def current_span():
+    return _current.get()
+
+
+def add_io(rows_read=0, rows_written=0, bytes_read=0, bytes_written=0):
+    """Attribute table I/O to the current span; a no-op outside one."""
+    current = _current.get()
+    if current is not None:
+        current.add_io(rows_read, rows_written, bytes_read, bytes_written)
+
+
+def record_http(url, seconds, error=False):
+    host = urlsplit(url).netloc or url
+    with _http_lock:
+        totals = _http_totals[host]
+        totals['count'] += 1
+        totals['errors'] += int(error)
+        totals['seconds'] += seconds
+    current = _current.get()
+    if current is not None:
+        current.add_http(seconds, error)
+
+
+def http_totals():
+    with _http_lock:
+        return {host: dict(v) for host, v in _http_totals.items()}
+
+
+def instrument_session(session):
+    """Count and time every request a requests.Session makes."""
+    def hook(response, *args, **kwargs):
+        record_http(response.url, response.elapsed.total_seconds(), error=response.status_code >= 400)
+    session.hooks.setdefault('response', []).append(hook)
+    return session
+
+
+def read_records(path, limit=None):
+    """Spans from a JSON lines file, oldest first; the last `limit` only if given."""
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+    if limit:
+        lines = lines[-limit:]
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+_PROM_METRICS = [
+    ('wall_seconds', 'crypto_span_wall_seconds_total', 'counter', "Wall-clock seconds spent in spans"),
+    ('cpu_seconds', 'crypto_span_cpu_seconds_total', 'counter', "Thread CPU seconds spent in spans"),
+    ('rows_read', 'crypto_span_rows_read_total', 'counter', "Table rows read"),
+    ('rows_written', 'crypto_span_rows_written_total', 'counter', "Table rows written"),
+    ('bytes_read', 'crypto_span_bytes_read_total', 'counter', "Table bytes read"),
+    ('bytes_written', 'crypto_span_bytes_written_total', 'counter', "Table bytes written"),
+    ('http_calls', 'crypto_span_http_requests_total', 'counter', "HTTP requests made"),
+    ('http_errors', 'crypto_span_http_errors_total', 'counter', "HTTP responses with status >= 400"),
+    ('http_seconds', 'crypto_span_http_seconds_total', 'counter', "Seconds spent waiting on HTTP"),
+]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus(records, http=None):
+    """Prometheus text exposition of span records (summed per kind/name) and HTTP totals per host."""
+    groups = defaultdict(list)
+    for row in records:
+        groups[(row['kind'], row['name'])].append(row)
+
+    lines = []
+    def emit(metric, kind, help_text, samples):
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for labels, value in samples:
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f'{metric}{{{label_text}}} {value}')
+
+    keys = sorted(groups)
+    emit('crypto_span_runs_total', 'counter', "Completed spans",
+         [({'kind': k, 'name': n}, len(groups[(k, n)])) for k, n in keys])
+    emit('crypto_span_failures_total', 'counter', "Spans that raised",
+         [({'kind': k, 'name': n}, sum(1 for r in groups[(k, n)] if r.get('error'))) for k, n in keys])
+    for field, metric, kind, help_text in _PROM_METRICS:
+        emit(metric, kind, help_text, [({'kind': k, 'name': n}, sum(r[field] or 0 for r in groups[(k, n)])) for k, n in keys])
+    emit('crypto_span_last_wall_seconds', 'gauge', "Wall-clock seconds of the latest span",
+         [({'kind': k, 'name': n}, groups[(k, n)][-1]['wall_seconds']) for k, n in keys])
+    emit('crypto_span_last_peak_memory_bytes', 'gauge', "tracemalloc peak during the latest span",
+         [({'kind': k, 'name': n}, groups[(k, n)][-1]['peak_memory_bytes'])
+          for k, n in keys if groups[(k, n)][-1]['peak_memory_bytes'] is not None])
+
+    http = http_totals() if http is None else http
+    emit('crypto_http_requests_total', 'counter', "HTTP requests per host (whole process)",
+         [({'host': host}, v['count']) for host, v in sorted(http.items())])
+    emit('crypto_http_errors_total', 'counter', "HTTP error responses per host (whole process)",
+         [({'host': host}, v['errors']) for host, v in sorted(http.items())])
+    emit('crypto_http_seconds_total', 'counter', "Seconds waiting on HTTP per host (whole process)",
+         [({'host': host}, v['seconds']) for host, v in sorted(http.items())])
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(records, path, http=None):
+    """Write the exposition atomically, e.g. for node_exporter's textfile collector."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(to_prometheus(records, http))
+    os.replace(tmp, path)
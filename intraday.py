@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import INTERVALS, _naive_utc, time_column
+
+# Longest range Yahoo serves in one request per interval. 1m history also
+# only reaches back ~30 days, which chunking cannot extend.
+MAX_SPAN = {
+    '1m': pd.Timedelta(days=7), '2m': pd.Timedelta(days=60), '5m': pd.Timedelta(days=60),
+    '15m': pd.Timedelta(days=60), '30m': pd.Timedelta(days=60), '60m': pd.Timedelta(days=730),
+    '90m': pd.Timedelta(days=60), '1h': pd.Timedelta(days=730),
+}
+
+RESOLUTIONS = ('5m', '15m', '1h', '1d')
+
+
+def chunk_ranges(start, end, span):
+    """Split [start, end) into consecutive pieces no longer than `span` (None: one piece)."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if end <= start:
+        return []
+    if span is None or end - start <= span:
+        return [(start, end)]
+    edges = list(pd.date_range(start, end, freq=span))
+    if edges[-1] < end:
+        edges.append(end)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+class ChunkedDownloader:
+    """Downloader wrapper that fetches long intraday ranges in allowed chunks.
+
+    Chunks run concurrently on at most `workers` threads, then are stitched
+    into one frame sorted by time with duplicate bars (chunk edges) dropped.
+    It has the same (ticker, start, end, interval) signature as the
+    downloader it wraps, so it can sit under BarCache unchanged. A chunk
+    can come back empty (a failed or throttled request), so the frame's
+    attrs['covered'] lists the [start, end) chunks that returned bars and
+    BarCache marks only those as downloaded.
+    """
+
+    def __init__(self, downloader, workers=4, max_span=None):
+        self.downloader = downloader
+        self.workers = workers
+        self.max_span = dict(MAX_SPAN if max_span is None else max_span)
+
+    def __call__(self, ticker, start, end, interval):
+        chunks = chunk_ranges(start, end, self.max_span.get(interval))
+        if len(chunks) <= 1:
+            return self.downloader(ticker, start, end, interval)
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks))) as pool:
+            frames = list(pool.map(lambda r: self.downloader(ticker, r[0].to_pydatetime(), r[1].to_pydatetime(), interval), chunks))
+        returned = [(chunk, f) for chunk, f in zip(chunks, frames) if f is not None and len(f)]
+        if not returned:
+            return pd.DataFrame()
+
+        bars = pd.concat([f for _, f in returned], ignore_index=True)
+        col = time_column(bars)
+        bars[col] = _naive_utc(bars[col])
+        bars = bars.drop_duplicates(subset=col, keep='last').sort_values(col).reset_index(drop=True)
+        bars.attrs['covered'] = [[lo, hi] for (lo, hi), _ in returned]
+        return bars
+
+
+def _first_valid(x, starts, ends, last=False):
+    # Position of the first (or last) non-NaN value in each bucket; buckets with none give NaN
+    pos = np.arange(len(x))
+    if last:
+        pick = np.maximum.reduceat(np.where(np.isnan(x), -1, pos), starts)
+        found = pick >= starts
+    else:
+        pick = np.minimum.reduceat(np.where(np.isnan(x), len(x), pos), starts)
+        found = pick <= ends
+    return np.where(found, x[np.where(found, pick, 0)], np.nan)
+
+
+def _aggregate(ts, o, h, l, c, v, step):
+    """Aggregate time-sorted bars into buckets of `step` nanoseconds with reduceat.
+
+    NaN values are skipped like pandas' resample().agg: open and close are the
+    first and last non-NaN values, fmax/fmin ignore NaN highs and lows, and
+    volume is a nansum. A bucket with no value for a column gets NaN there.
+    """
+    key = ts // step
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    return (key[starts] * step, _first_valid(o, starts, ends), np.fmax.reduceat(h, starts),
+            np.fmin.reduceat(l, starts), _first_valid(c, starts, ends, last=True),
+            np.add.reduceat(np.nan_to_num(v), starts))
+
+
+def resample_ohlcv(bars, resolutions=RESOLUTIONS):
+    """Aggregate base bars into every resolution in one cascading pass.
+
+    Each resolution is built from the previous (finer) one when it divides
+    evenly, so the full base history is scanned once and every later level
+    only touches the already-reduced bars. Returns {resolution: DataFrame}
+    with 'date' and OHLCV columns; buckets are aligned to UTC (days start
+    at 00:00 UTC).
+    """
+    col = time_column(bars)
+    bars = bars.dropna(subset=['close']).sort_values(col)
+    level = (_naive_utc(bars[col]).to_numpy().astype('datetime64[ns]').astype(np.int64),
+             *(bars[c].to_numpy(dtype=np.float64) for c in ['open', 'high', 'low', 'close']),
+             np.nan_to_num(bars['volume'].to_numpy(dtype=np.float64)) if 'volume' in bars else np.zeros(len(bars)))
+    base, level_step = level, None
+
+    out = {}
+    for res in sorted(resolutions, key=lambda r: INTERVALS[r]):
+        step = INTERVALS[res].value
+        source = level if level_step and step % level_step == 0 else base
+        level = _aggregate(*source, step) if len(source[0]) else source
+        level_step = step
+        ts, o, h, l, c, v = level
+        out[res] = pd.DataFrame({'date': pd.to_datetime(ts), 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v})
+    return out
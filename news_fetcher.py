@@ -0,0 +1,138 @@
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrumentation
+
+NEWSAPI_URL = 'https://newsapi.org/v2'
+
+DEFAULT_RATE = 5.0   # requests per second
+DEFAULT_BURST = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class NewsFetchError(Exception):
+    pass
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` banked."""
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=DEFAULT_BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+class NewsFetcher:
+    """Concurrent NewsAPI /everything client.
+
+    Requests for many date x keyword pairs run on a bounded thread pool,
+    all drawing from one token bucket instead of sleeping after each call.
+    429/5xx responses are retried with jittered exponential backoff, or
+    after at least the server's Retry-After when it sends one.
+    base_url can point at a local fake NewsAPI for offline runs.
+    """
+
+    def __init__(self, api_key, base_url=NEWSAPI_URL, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 workers=8, max_retries=4, backoff=1.0, timeout=15, session=None, sleep=time.sleep):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.bucket = TokenBucket(rate, burst, sleep=sleep)
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.sleep = sleep
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            instrumentation.instrument_session(session)
+        self.session = session
+
+    def fetch(self, date, keyword='bitcoin'):
+        params = {
+            "q": keyword,
+            "from": date,
+            "to": date,
+            "language": "en",
+            "sortBy": "relevancy",
+            "pageSize": 100,
+            "apiKey": self.api_key
+        }
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.session.get(f'{self.base_url}/everything', params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise NewsFetchError(f"Error on {date}: {e}") from e
+                delay = self.backoff * 2 ** attempt
+            except requests.RequestException as e:
+                # Bad URL, too many redirects, ...: retrying won't help, but it's still only this date failing
+                raise NewsFetchError(f"Error on {date}: {e}") from e
+            else:
+                if response.status_code == 200:
+                    try:
+                        data = response.json()
+                    except ValueError as e:
+                        raise NewsFetchError(f"Error on {date}: invalid JSON response ({e})") from e
+                    if not isinstance(data, dict) or "articles" not in data:
+                        message = data.get('message', 'Unknown error') if isinstance(data, dict) else 'Unknown error'
+                        raise NewsFetchError(f"Error on {date}: {message}")
+                    return data["articles"]
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    try:
+                        message = response.json().get('message', 'Unknown error')
+                    except (ValueError, AttributeError):
+                        message = response.status_code
+                    raise NewsFetchError(f"Error on {date}: {message}")
+                retry_after = response.headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    # The server's wait is a minimum, so jitter only lengthens it
+                    self.sleep(float(retry_after) * random.uniform(1.0, 1.5))
+                    continue
+                delay = self.backoff * 2 ** attempt
+
+            self.sleep(delay * random.uniform(0.5, 1.5))
+
+    def iter_results(self, dates, keywords=("bitcoin",)):
+        """Yield (date, keyword, articles, error) as each request finishes.
+
+        Exactly one of articles/error is None, so callers can aggregate
+        results while the remaining requests are still in flight.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # Each request runs in a copy of the caller's context, so its HTTP time lands in the caller's span
+            futures = {pool.submit(contextvars.copy_context().run, self.fetch, date, keyword): (date, keyword)
+                       for date in dates for keyword in keywords}
+            for future in as_completed(futures):
+                date, keyword = futures[future]
+                try:
+                    yield date, keyword, future.result(), None
+                except NewsFetchError as e:
+                    yield date, keyword, None, e
@@ -0,0 +1,369 @@
+import ast
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+import instrumentation
+import storage
+
+# Same folder the Streamlit app reads from
+DATA_DIR = os.environ.get('CRYPTO_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+STATE_FILE = 'pipeline_state.json'
+METRICS_FILE = 'pipeline_metrics.jsonl'
+PROMETHEUS_FILE = 'pipeline_metrics.prom'
+
+
+class Stage:
+    """One step of the pipeline: `func(**inputs, **outputs, **params)`.
+
+    `inputs` and `outputs` map argument names to paths relative to the data
+    directory (a table stem or a plain file); an output may also be a dict
+    of such paths. A stage depends on whichever stages produce its inputs.
+    """
+
+    def __init__(self, name, func, inputs=None, outputs=None, params=None):
+        self.name = name
+        self.func = func
+        self.inputs = dict(inputs or {})
+        self.outputs = dict(outputs or {})
+        self.params = dict(params or {})
+
+    def output_paths(self):
+        for value in self.outputs.values():
+            yield from (value.values() if isinstance(value, dict) else [value])
+
+
+def _resolve(value, data_dir):
+    if isinstance(value, dict):
+        return {k: os.path.join(data_dir, v) for k, v in value.items()}
+    return os.path.join(data_dir, value)
+
+
+def _is_main_block(node):
+    # if __name__ == '__main__':
+    return (isinstance(node, ast.If) and isinstance(node.test, ast.Compare)
+            and isinstance(node.test.left, ast.Name) and node.test.left.id == '__name__')
+
+
+def _files(path):
+    """Files backing a table stem or plain file path, sorted; empty if missing."""
+    target = storage.locate(path) or (path if os.path.exists(path) else None)
+    if target is None:
+        return []
+    if os.path.isdir(target):
+        return sorted(os.path.join(target, name) for name in os.listdir(target))
+    return [target]
+
+
+class Pipeline:
+    """DAG runner for the analysis stages with content-hash caching.
+
+    A stage's cache key hashes its name, parameters, the source of the
+    stage's module and of every repo module it imports (engines, caches,
+    fetchers), and the content of every input. Stages whose key matches the
+    last successful run (and whose outputs are still the files that run
+    wrote) are skipped. Because keys hash content rather than timestamps, a
+    stage that reruns but writes identical output does not invalidate its
+    dependents. Stages whose dependencies are done run concurrently on a
+    thread pool. Every stage's time, memory, rows, bytes and HTTP calls
+    are appended to pipeline_metrics.jsonl and summed into
+    pipeline_metrics.prom after each run.
+    """
+
+    def __init__(self, stages, data_dir=DATA_DIR, workers=4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.data_dir = data_dir
+        self.workers = workers
+        self.state_path = os.path.join(data_dir, STATE_FILE)
+        self.recorder = instrumentation.Recorder(os.path.join(data_dir, METRICS_FILE))
+        os.makedirs(data_dir, exist_ok=True)
+
+        producers = {}
+        for stage in stages:
+            for path in stage.output_paths():
+                producers[path] = stage.name
+        self.deps = {stage.name: sorted({producers[p] for p in stage.inputs.values() if p in producers})
+                     for stage in stages}
+        self.state = self._load_state()
+        self._lock = threading.Lock()  # stages hash files and record results from several threads
+        self._import_memo = {}  # module path -> (mtime_ns, in-package modules it imports)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'stages': {}, 'files': {}}
+
+    def _save_state(self):
+        tmp = self.state_path + '.tmp'
+        with self._lock:
+            with open(tmp, 'w') as f:
+                json.dump(self.state, f, indent=1)
+            os.replace(tmp, self.state_path)
+
+    def file_hash(self, path):
+        """Content hash of a table or file, memoized on (mtime, size) so unchanged files are not reread."""
+        h = hashlib.sha256()
+        files = _files(path)
+        if not files:
+            return None
+        for name in files:
+            st = os.stat(name)
+            with self._lock:
+                memo = self.state['files'].get(name)
+            if memo and memo[0] == st.st_mtime_ns and memo[1] == st.st_size:
+                digest = memo[2]
+            else:
+                fh = hashlib.sha256()
+                with open(name, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        fh.update(block)
+                digest = fh.hexdigest()
+                with self._lock:
+                    self.state['files'][name] = [st.st_mtime_ns, st.st_size, digest]
+            h.update(os.path.basename(name).encode())
+            h.update(digest.encode())
+        return h.hexdigest()
+
+    def stage_sources(self, stage):
+        """The module defining the stage plus every module next to it that it
+        imports, directly or through one another.
+
+        Imports under `if __name__ == '__main__':` are script code, not stage
+        code, and this runner module is skipped: its default_stages() imports
+        every stage, and the wiring it holds is hashed through each stage's
+        name, parameters and inputs.
+        """
+        source = os.path.abspath(inspect.getsourcefile(stage.func))
+        package = os.path.dirname(source)
+        runner = os.path.abspath(__file__)
+        found, stack = set(), [source]
+        while stack:
+            path = stack.pop()
+            if path in found or path == runner:
+                continue
+            found.add(path)
+            stack.extend(self._imports(path, package))
+        return sorted(found)
+
+    def _imports(self, path, package):
+        st = os.stat(path)
+        with self._lock:
+            memo = self._import_memo.get(path)
+        if memo and memo[0] == st.st_mtime_ns:
+            return memo[1]
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), path)
+        body = [node for node in tree.body if not _is_main_block(node)]
+        names = set()
+        for node in ast.walk(ast.Module(body=body, type_ignores=[])):  # function-level imports count too
+            if isinstance(node, ast.Import):
+                names.update(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names.add(node.module.split('.')[0])
+        files = sorted(p for p in (os.path.join(package, n + '.py') for n in names) if os.path.isfile(p))
+        with self._lock:
+            self._import_memo[path] = (st.st_mtime_ns, files)
+        return files
+
+    def code_hash(self, stage):
+        """Hash of the stage's sources (see stage_sources). Editing a module
+        only invalidates the stages that import it; the sources are memoized
+        like any other file, so nothing unchanged is reread."""
+        h = hashlib.sha256()
+        for path in self.stage_sources(stage):
+            h.update(os.path.basename(path).encode())
+            h.update(self.file_hash(path).encode())
+        return h.hexdigest()
+
+    def stage_key(self, stage):
+        code = self.code_hash(stage)
+        inputs = {}
+        for arg, path in sorted(stage.inputs.items()):
+            digest = self.file_hash(os.path.join(self.data_dir, path))
+            if digest is None:
+                raise FileNotFoundError(f"Stage {stage.name}: input {path} does not exist")
+            inputs[arg] = digest
+        payload = {'stage': stage.name, 'func': stage.func.__qualname__, 'code': code,
+                   'params': stage.params, 'inputs': inputs}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _outputs(self, stage):
+        return {path: self.file_hash(os.path.join(self.data_dir, path)) for path in stage.output_paths()}
+
+    def is_current(self, stage, key):
+        last = self.state['stages'].get(stage.name)
+        if not last or last['key'] != key:
+            return False
+        return self._outputs(stage) == last['outputs']
+
+    def _run_stage(self, stage):
+        kwargs = {arg: os.path.join(self.data_dir, path) for arg, path in stage.inputs.items()}
+        kwargs.update({arg: _resolve(value, self.data_dir) for arg, value in stage.outputs.items()})
+        kwargs.update(stage.params)
+        stage.func(**kwargs)
+
+    def _upstream(self, targets):
+        needed, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.deps[name])
+        return needed
+
+    def run(self, targets=None, force=()):
+        """Run `targets` (all stages by default) and everything they depend on.
+
+        Stages named in `force` run even when their cache key matches.
+        Returns one row per stage: status ('ran', 'cached', 'failed' or
+        'blocked' when a dependency failed), seconds and error.
+        """
+        names = self._upstream(targets) if targets else set(self.stages)
+        pending = {name: set(self.deps[name]) & names for name in names}
+        report = {}
+
+        def execute(name):
+            stage = self.stages[name]
+            started = time.perf_counter()
+            with self.recorder.span(name, kind='stage') as span:
+                key = self.stage_key(stage)
+                span.labels['status'] = 'cached'
+                if name not in force and self.is_current(stage, key):
+                    return 'cached', time.perf_counter() - started, key
+                span.labels['status'] = 'ran'
+                self._run_stage(stage)
+            return 'ran', time.perf_counter() - started, key
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            running = {}
+
+            def launch_ready():
+                for name in [n for n, deps in pending.items() if not deps]:
+                    del pending[name]
+                    running[pool.submit(execute, name)] = name
+
+            launch_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        status, seconds, key = future.result()
+                        self.state['stages'][name] = {'key': key, 'outputs': self._outputs(self.stages[name]),
+                                                      'finished': pd.Timestamp.now(tz='UTC').isoformat()}
+                        self._save_state()
+                        report[name] = {'stage': name, 'status': status, 'seconds': seconds, 'error': None}
+                        print(f"[{status}] {name} ({seconds:.1f}s)")
+                    except Exception as e:
+                        report[name] = {'stage': name, 'status': 'failed', 'seconds': None, 'error': repr(e)}
+                        print(f"[failed] {name}: {e!r}")
+                        self._block(name, pending, report)
+                        continue
+                    for deps in pending.values():
+                        deps.discard(name)
+                launch_ready()
+
+        stage_records = [r for r in instrumentation.read_records(self.recorder.path) if r['kind'] == 'stage']
+        instrumentation.write_prometheus(stage_records, os.path.join(self.data_dir, PROMETHEUS_FILE))
+        return pd.DataFrame([report[name] for name in self.order(names)])
+
+    def _block(self, failed, pending, report):
+        for name in [n for n in pending if failed in self._upstream([n]) and n != failed]:
+            del pending[name]
+            report[name] = {'stage': name, 'status': 'blocked', 'seconds': None, 'error': f"{failed} failed"}
+
+    def order(self, names=None):
+        """Stage names in a dependency-respecting order."""
+        names = set(self.stages) if names is None else set(names)
+        ordered, seen = [], set()
+
+        def visit(name):
+            if name not in seen:
+                seen.add(name)
+                for dep in self.deps[name]:
+                    if dep in names:
+                        visit(dep)
+                ordered.append(name)
+
+        for name in self.stages:
+            if name in names:
+                visit(name)
+        return ordered
+
+
+def default_stages(data_dir=DATA_DIR, today=None, ticker='BTC-USD', start='2025-01-01'):
+    """The analysis scripts as one graph. `today` is the only moving parameter:
+    a new day reruns the collectors, and content hashing decides how much of
+    the rest has to follow."""
+    import batch_forecast
+    import datacollect
+    import preprocess
+    import sentiment
+    import time_series
+    import volatility
+
+    today = pd.Timestamp(today or pd.Timestamp.today()).strftime('%Y-%m-%d')
+    state = os.path.join(data_dir, 'state')
+    score_cache = os.path.join(state, 'sentiment_cache.sqlite')
+    news_start = (pd.Timestamp(today) - pd.Timedelta(days=30)).strftime('%Y-%m-%d')
+
+    return [
+        # Prices and features
+        Stage('prices', datacollect.collect_prices, outputs={'dst': 'btc_yfinancen'},
+              params={'ticker': ticker, 'start': start, 'end': today, 'cache_dir': os.path.join(state, 'bars')}),
+        Stage('intraday', datacollect.collect_intraday,
+              outputs={'dsts': {res: f'btc_{res}' for res in ('1m',) + datacollect.RESOLUTIONS}},
+              params={'ticker': ticker, 'end': today, 'cache_dir': os.path.join(state, 'bars')}),
+        Stage('features', preprocess.preprocess, inputs={'src': 'btc_yfinancen'}, outputs={'dst': 'btc_featuresn'}),
+        # Minute history grows without bound, so its features are computed out of core
+        Stage('intraday_features', preprocess.preprocess, inputs={'src': 'btc_1m'}, outputs={'dst': 'btc_1m_features'},
+              params={'chunk_rows': 500_000}),
+        Stage('volatility', volatility.fit_volatility, inputs={'src': 'btc_featuresn'},
+              outputs={'dst': 'btc_vol', 'garch_engine_path': 'garch_engine.json', 'egarch_engine_path': 'egarch_engine.json'}),
+        Stage('vol_selection', volatility.select_volatility_model, inputs={'src': 'btc_featuresn'},
+              outputs={'dst': 'vol_selection.json'}, params={'ticker': ticker}),
+        # Sentiment, independent of the price branch until the final join
+        Stage('reddit', sentiment.collect_reddit_sentiment,
+              outputs={'dst': 'reddit_sentiment', 'aggregates_path': 'reddit_aggregates.npz'},
+              params={'start': start, 'end': today, 'state_dir': os.path.join(state, 'reddit'), 'score_cache': score_cache}),
+        Stage('news', sentiment.collect_news_sentiment,
+              outputs={'dst': 'news_sentiment', 'aggregates_path': 'news_aggregates.npz'},
+              params={'start': news_start, 'end': today, 'score_cache': score_cache}),
+        Stage('merged_sentiment', sentiment.merge_sentiment,
+              inputs={'reddit': 'reddit_sentiment', 'news': 'news_sentiment',
+                      'reddit_aggregates': 'reddit_aggregates.npz', 'news_aggregates': 'news_aggregates.npz'},
+              outputs={'dst': 'merged_sentiment'}, params={'start': start, 'end': today}),
+        Stage('dataset', sentiment.join_sentiment, inputs={'prices': 'btc_vol', 'sentiment': 'merged_sentiment'},
+              outputs={'dst': 'btc_sentimentn'}),
+        # Forecast
+        Stage('forecast', time_series.forecast_prices, inputs={'src': 'btc_sentimentn'},
+              outputs={'dst': 'prophet_forecast'}, params={'model_dir': os.path.join(state, 'prophet_models')}),
+        # The same fit in the indexed forecast store, which the dashboard prefers over prophet_forecast
+        Stage('forecast_store', batch_forecast.forecast_to_store, inputs={'src': 'btc_sentimentn'},
+              outputs={'store_path': 'forecasts.sqlite'},
+              params={'ticker': 'btc', 'cache_dir': os.path.join(state, 'prophet_models')}),
+    ]
+
+
+def run(targets=None, force=(), data_dir=DATA_DIR, today=None, workers=4):
+    return Pipeline(default_stages(data_dir, today), data_dir, workers).run(targets, force)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the crypto analysis pipeline")
+    parser.add_argument('targets', nargs='*', help="stages to bring up to date (default: all)")
+    parser.add_argument('--force', nargs='*', default=(), help="stages to rerun even if cached")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    print(run(args.targets or None, args.force, args.data_dir, workers=args.workers).to_string(index=False))
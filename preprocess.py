@@ -1,54 +1,50 @@
-import pandas as pd
-import numpy as np
+import storage
+from feature_engine import RAW_COLUMNS, ChunkedFeatures, compute_features
 
-# 📥 Load the historical data from Yahoo
-df = pd.read_csv('/content/btc_yfinancen.csv', parse_dates=['date'])
 
-# ✅ 1. Sort by date and reset index
-df.sort_values('date', inplace=True)
-df.reset_index(drop=True, inplace=True)
+# Pipeline stage: raw Yahoo bars -> engineered features (works for any bar size)
+# With chunk_rows set, the history is streamed through in blocks instead (see preprocess_chunked)
+def preprocess(src, dst, chunk_rows=None):
+    if chunk_rows:
+        return preprocess_chunked(src, dst, chunk_rows)
 
-# ✅ 2. Fill missing values in raw data only (open, high, low, close, volume)
-df[['open', 'high', 'low', 'close', 'volume']] = df[['open', 'high', 'low', 'close', 'volume']].fillna(method='ffill')
+    # 📥 Load the historical data from Yahoo
+    df = storage.read_table(src)
 
-# ✅ 3. Feature Engineering
+    # ✅ 1. Sort by date and reset index
+    df.sort_values('date', inplace=True)
+    df.reset_index(drop=True, inplace=True)
 
-# Daily returns
-df['return'] = df['close'].pct_change()
-df['log_return'] = np.log(df['close'] / df['close'].shift(1))
+    # ✅ 2. Fill missing values in raw data only (open, high, low, close, volume)
+    df[RAW_COLUMNS] = df[RAW_COLUMNS].ffill()
 
-# Moving averages
-df['sma_7'] = df['close'].rolling(window=7).mean()
-df['sma_21'] = df['close'].rolling(window=21).mean()
+    # ✅ 3. Feature Engineering
+    # Bulk mode of the feature engine; FeatureEngine.warm_up()/update() extends the same columns one bar at a time
+    df = compute_features(df)
 
-# Bollinger Bands
-df['stddev_21'] = df['close'].rolling(window=21).std()
-df['upper_band'] = df['sma_21'] + (2 * df['stddev_21'])
-df['lower_band'] = df['sma_21'] - (2 * df['stddev_21'])
+    # ✅ Don't drop any rows — keep early rows even if some feature columns have NaNs
+    # You can later fill or interpolate selectively if needed
 
-# RSI
-def compute_rsi(series, window=14):
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
+    # 💾 Save to file
+    storage.write_table(df, dst)
+    print("✅ Feature engineered data saved with full date range from Jan 1st.")
+    return df
 
-df['rsi_14'] = compute_rsi(df['close'], 14)
 
-# ATR
-df['hl'] = df['high'] - df['low']
-df['hc'] = np.abs(df['high'] - df['close'].shift())
-df['lc'] = np.abs(df['low'] - df['close'].shift())
-df['tr'] = df[['hl', 'hc', 'lc']].max(axis=1)
-df['atr_14'] = df['tr'].rolling(window=14).mean()
+# Out-of-core mode for histories that don't fit in RAM (years of minute bars):
+# read `chunk_rows` bars at a time, carry the window state across block boundaries,
+# downcast the indicator columns to float32 and append each finished block to `dst`.
+# Input must already be sorted by date (the collectors write it that way).
+def preprocess_chunked(src, dst, chunk_rows=500_000):
+    features = ChunkedFeatures()
+    with storage.TableWriter(dst) as writer:
+        for block in features.run(storage.iter_table(src, chunk_rows)):
+            writer.write(block)
+    print(f"✅ Feature engineered data saved in blocks of {chunk_rows} rows ({writer.rows} rows).")
+    return writer.target
 
-# Final cleanup
-df.drop(['hl', 'hc', 'lc', 'tr'], axis=1, inplace=True)
 
-# ✅ Don't drop any rows — keep early rows even if some feature columns have NaNs
-# You can later fill or interpolate selectively if needed
+if __name__ == '__main__':
+    from pipeline import run
 
-# 💾 Save to file
-df.to_csv('/content/btc_featuresn.csv', index=False)
-print("✅ Feature engineered data saved with full date range from Jan 1st.")
+    print(run(['features']).to_string(index=False))
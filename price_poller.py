@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrumentation
+
+COINGECKO_URL = 'https://api.coingecko.com/api/v3'
+
+# CoinGecko accepts long id lists, but keep the query string a sane length
+MAX_IDS_PER_CALL = 250
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PriceFetchError(Exception):
+    pass
+
+
+class PricePoller:
+    """Batched CoinGecko /simple/price client with an in-memory quote table.
+
+    One pooled requests.Session is reused for every call, many coin ids and
+    vs_currencies go into a single request, 429/5xx responses are retried
+    with exponential backoff (honouring Retry-After), and the latest quotes
+    are kept for `ttl` seconds so repeated reads do not hit the network.
+    Point base_url at a local stub server to run it offline.
+    """
+
+    def __init__(self, base_url=COINGECKO_URL, ttl=60, timeout=10, max_retries=4,
+                 backoff=1.0, pool_size=10, session=None, sleep=time.sleep, clock=time.time):
+        self.base_url = base_url.rstrip('/')
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.clock = clock
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'User-Agent': 'Mozilla/5.0'})
+            instrumentation.instrument_session(session)
+        self.session = session
+
+        self.quotes = {}  # (coin_id, vs_currency) -> {'price', 'last_updated_at', 'fetched_at'}
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'cache_hits': 0}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _request(self, params):
+        for attempt in range(self.max_retries + 1):
+            self.stats['requests'] += 1
+            try:
+                response = self.session.get(f'{self.base_url}/simple/price', params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise PriceFetchError(f"Error fetching real-time data: {e}") from e
+                delay = self.backoff * 2 ** attempt
+            else:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise PriceFetchError(f"Invalid price response: {e}") from e
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise PriceFetchError(f"Error fetching real-time data: {response.status_code}")
+                retry_after = response.headers.get('Retry-After')
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff * 2 ** attempt
+
+            self.stats['retries'] += 1
+            self.sleep(delay * (1 + 0.1 * random.random()))
+
+    def refresh(self, coin_ids, vs_currencies=('usd',)):
+        coin_ids = list(dict.fromkeys(coin_ids))
+        vs_currencies = list(dict.fromkeys(vs_currencies))
+        for i in range(0, len(coin_ids), MAX_IDS_PER_CALL):
+            batch = coin_ids[i:i + MAX_IDS_PER_CALL]
+            data = self._request({
+                'ids': ','.join(batch),
+                'vs_currencies': ','.join(vs_currencies),
+                'include_last_updated_at': 'true',
+            })
+            now = self.clock()
+            with self.lock:
+                for coin_id, values in data.items():
+                    for vs in vs_currencies:
+                        if vs in values:
+                            self.quotes[(coin_id, vs)] = {
+                                'price': values[vs],
+                                'last_updated_at': values.get('last_updated_at'),
+                                'fetched_at': now,
+                            }
+        return self.snapshot(coin_ids, vs_currencies)
+
+    def snapshot(self, coin_ids=None, vs_currencies=None):
+        with self.lock:
+            return {key: dict(quote) for key, quote in self.quotes.items()
+                    if (coin_ids is None or key[0] in coin_ids)
+                    and (vs_currencies is None or key[1] in vs_currencies)}
+
+    def quote(self, coin_id='bitcoin', vs_currency='usd'):
+        key = (coin_id, vs_currency)
+        with self.lock:
+            cached = self.quotes.get(key)
+        if cached is not None and self.clock() - cached['fetched_at'] < self.ttl:
+            self.stats['cache_hits'] += 1
+            return dict(cached)
+
+        self.refresh([coin_id], [vs_currency])
+        with self.lock:
+            if key not in self.quotes:
+                raise PriceFetchError(f"No price returned for {coin_id}/{vs_currency}")
+            return dict(self.quotes[key])
+
+    def get_price(self, coin_id='bitcoin', vs_currency='usd'):
+        return self.quote(coin_id, vs_currency)['price']
+
+    # Background polling keeps the table warm so readers never wait on the network
+    def start(self, coin_ids, vs_currencies=('usd',), interval=30):
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.refresh(coin_ids, vs_currencies)
+                except PriceFetchError as e:
+                    print(f"Price poll failed: {e}")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=loop, name='price-poller', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_default_poller = None
+_default_lock = threading.Lock()
+
+
+# Shared per-process poller, so the collector and the dashboard read the same quote table
+# (locked: concurrent Streamlit script threads would otherwise each create one)
+def get_poller():
+    global _default_poller
+    with _default_lock:
+        if _default_poller is None:
+            _default_poller = PricePoller()
+        return _default_poller
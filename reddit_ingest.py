@@ -0,0 +1,150 @@
+import json
+import os
+import uuid
+
+import numpy as np
+
+# Re-read this many seconds behind the watermark to pick up posts indexed late
+DEFAULT_OVERLAP = 6 * 3600
+
+
+def submission_key(submission):
+    """Base-36 Reddit id as an int; crossposts map to their parent's id so they count once."""
+    parent = getattr(submission, 'crosspost_parent', None)
+    sid = parent.split('_', 1)[-1] if parent else submission.id
+    return int(sid, 36)
+
+
+class PrawFeed:
+    """Adapter over a praw.Reddit client. Any object with the same search()
+    signature (e.g. a list-backed fake) can be passed to RedditIngestor."""
+
+    def __init__(self, reddit):
+        self.reddit = reddit
+
+    def search(self, subreddit, query, limit):
+        return self.reddit.subreddit(subreddit).search(query, sort='new', time_filter='all', limit=limit)
+
+
+class RedditIngestor:
+    """Incremental Reddit ingestion with a per-subreddit created_utc
+    watermark and a sorted array of already-seen submission ids.
+
+    ingest() returns only submissions newer than the watermark (minus a
+    small overlap) whose id has not been seen before; commit() persists the
+    new watermarks and ids once the caller has processed them.
+
+    When the caller also persists what it derived from the posts, the two
+    writes are made atomic with a journal: prepare() records the pending
+    state under a token, the caller saves its output tagged with that
+    token, then commit(). If the process dies in between, recover() with
+    the token the output actually carries either finishes the commit (the
+    output was saved) or drops it (it was not, so the posts are fetched
+    again), and no post is counted twice.
+    """
+
+    def __init__(self, feed, state_dir, query='bitcoin', limit=1000, overlap=DEFAULT_OVERLAP):
+        self.feed = feed
+        self.state_dir = state_dir
+        self.query = query
+        self.limit = limit
+        self.overlap = overlap
+        os.makedirs(state_dir, exist_ok=True)
+
+        self.watermarks = self._load_watermarks()
+        self.seen = self._load_seen()
+        self._pending_ids = []
+        self._pending_marks = {}
+
+    @property
+    def _watermark_path(self):
+        return os.path.join(self.state_dir, f'{self.query}_watermarks.json')
+
+    @property
+    def _seen_path(self):
+        return os.path.join(self.state_dir, f'{self.query}_seen_ids.npy')
+
+    @property
+    def _journal_path(self):
+        return os.path.join(self.state_dir, f'{self.query}_pending.json')
+
+    def _load_watermarks(self):
+        try:
+            with open(self._watermark_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _load_seen(self):
+        try:
+            return np.load(self._seen_path)
+        except FileNotFoundError:
+            return np.empty(0, dtype=np.int64)
+
+    def is_seen(self, key):
+        i = np.searchsorted(self.seen, key)
+        return i < len(self.seen) and self.seen[i] == key
+
+    def ingest(self, subreddits):
+        new = []
+        batch_keys = set()
+        for sub in subreddits:
+            mark = self.watermarks.get(sub, 0)
+            newest = mark
+            for submission in self.feed.search(sub, self.query, self.limit):
+                created = submission.created_utc
+                if created < mark - self.overlap:
+                    break  # results come newest first, everything after this is older
+                newest = max(newest, created)
+                key = submission_key(submission)
+                if key in batch_keys or self.is_seen(key):
+                    continue
+                batch_keys.add(key)
+                new.append({
+                    'id': submission.id,
+                    'subreddit': sub,
+                    'created_utc': created,
+                    'text': submission.title + " " + submission.selftext,
+                })
+            self._pending_marks[sub] = newest
+        self._pending_ids.extend(batch_keys)
+        return new
+
+    def prepare(self):
+        """Journal the pending ids and watermarks; returns the token to tag the caller's output with."""
+        token = uuid.uuid4().hex
+        journal = {'token': token, 'ids': [int(i) for i in self._pending_ids], 'marks': self._pending_marks}
+        with open(self._journal_path + '.tmp', 'w') as f:
+            json.dump(journal, f)
+        os.replace(self._journal_path + '.tmp', self._journal_path)
+        return token
+
+    def recover(self, committed_token):
+        """Finish or discard a journal left by a run that died between prepare() and commit()."""
+        try:
+            with open(self._journal_path) as f:
+                journal = json.load(f)
+        except FileNotFoundError:
+            return False
+        if journal['token'] != committed_token:
+            os.remove(self._journal_path)
+            return False
+        self._pending_ids = journal['ids']
+        self._pending_marks = journal['marks']
+        self.commit()
+        return True
+
+    def commit(self):
+        if self._pending_ids:
+            self.seen = np.union1d(self.seen, np.asarray(self._pending_ids, dtype=np.int64))
+            with open(self._seen_path + '.tmp', 'wb') as f:
+                np.save(f, self.seen)
+            os.replace(self._seen_path + '.tmp', self._seen_path)
+        self.watermarks.update(self._pending_marks)
+        with open(self._watermark_path + '.tmp', 'w') as f:
+            json.dump(self.watermarks, f)
+        os.replace(self._watermark_path + '.tmp', self._watermark_path)
+        if os.path.exists(self._journal_path):
+            os.remove(self._journal_path)
+        self._pending_ids = []
+        self._pending_marks = {}
@@ -0,0 +1,123 @@
+import numpy as np
+from arch.univariate import SkewStudent
+
+from vol_engine import EGARCH_NORM
+
+def stack_params(fitted, vols, dists=None):
+    """Turn per-asset arch parameter dicts into one array per parameter.
+
+    `fitted` is a list of dicts as arch/VolatilityEngine report them
+    ('mu', 'omega', 'alpha[1]', 'gamma[1]', 'beta[1]', and 'nu' or 'eta'/'lambda'
+    for t / skew-t errors);
+    `vols` names each asset's model ('GARCH', 'GJR' or 'EGARCH').
+    Missing terms default to 0 (no asymmetry, zero mean).
+    """
+    dists = dists or ['normal'] * len(fitted)
+    params = {
+        'mu': np.array([p.get('mu', 0.0) for p in fitted]),
+        'omega': np.array([p['omega'] for p in fitted]),
+        'alpha': np.array([p['alpha[1]'] for p in fitted]),
+        'gamma': np.array([p.get('gamma[1]', 0.0) for p in fitted]),
+        'beta': np.array([p['beta[1]'] for p in fitted]),
+        'nu': np.array([p.get('nu', p.get('eta', np.inf)) for p in fitted]),
+        'lam': np.array([p.get('lambda', 0.0) for p in fitted]),
+        'egarch': np.array([v == 'EGARCH' for v in vols]),
+        'dist': np.array(dists),
+    }
+    return params
+
+
+def _step(params, sigma2, resid):
+    """One variance recursion step for every asset (and path) at once."""
+    garch = (params['omega'] + (params['alpha'] + params['gamma'] * (resid < 0)) * resid * resid
+             + params['beta'] * sigma2)
+    z = resid / np.sqrt(sigma2)
+    log_egarch = (params['omega'] + params['alpha'] * (np.abs(z) - EGARCH_NORM) + params['gamma'] * z
+                  + params['beta'] * np.log(sigma2))
+    return np.where(params['egarch'], np.exp(np.where(params['egarch'], log_egarch, 0.0)), garch)
+
+
+def filter_variance(returns, params, scale=100):
+    """Run the conditional variance recursion over a (time, asset) return
+    matrix for all assets together.
+
+    Returns (sigma, next_sigma2): the in-sample conditional volatility in
+    scaled units, shape (time, asset), and each asset's variance for the
+    next bar. Starts from the same backcast arch uses.
+    """
+    r = np.asarray(returns, dtype=np.float64) * scale
+    resid = r - params['mu']
+    n = min(75, len(resid))
+    weights = 0.94 ** np.arange(n)
+    backcast = (weights / weights.sum()) @ (resid[:n] ** 2)
+
+    sigma2 = np.where(params['egarch'],
+                      np.exp(params['omega'] + params['beta'] * np.log(backcast)),
+                      params['omega'] + (params['alpha'] + 0.5 * params['gamma'] + params['beta']) * backcast)
+    sigma = np.empty_like(r)
+    for t in range(len(r)):
+        sigma[t] = np.sqrt(sigma2)
+        sigma2 = _step(params, sigma2, resid[t])
+    return sigma, sigma2
+
+
+def _innovations(rng, params, shape, cols):
+    """Standardised (unit variance) shocks for the assets in `cols`, shape (paths, horizon, assets)."""
+    z = rng.standard_normal(shape)
+    for j, col in enumerate(cols):
+        dist, nu, lam = params['dist'][col], params['nu'][col], params['lam'][col]
+        if dist == 't':
+            z[:, :, j] = rng.standard_t(nu, shape[:2]) * np.sqrt((nu - 2) / nu)
+        elif dist == 'skewt':
+            u = rng.random(shape[0] * shape[1])
+            z[:, :, j] = SkewStudent().ppf(u, [nu, lam]).reshape(shape[:2])
+    return z
+
+
+def simulate_risk(params, sigma2, horizons=(1, 5, 10), n_paths=10000, alpha=0.05,
+                  scale=100, seed=None, asset_chunk=64):
+    """Monte Carlo volatility forecasts, VaR and expected shortfall for N assets.
+
+    Starting from each asset's next-bar variance `sigma2`, simulates
+    `n_paths` return paths per asset up to max(horizons) bars with the
+    GARCH/EGARCH recursion applied to whole (paths, assets) arrays. Assets
+    are processed `asset_chunk` at a time to bound memory.
+
+    Returns a dict of arrays shaped (len(horizons), N): 'volatility' (the
+    expected per-bar volatility at that horizon), and 'var' / 'es' of the
+    cumulative return over the horizon, as positive losses. All values are
+    in unscaled return units. Rows follow 'horizons', the requested
+    horizons in ascending order; duplicates are rejected.
+    """
+    horizons = sorted(int(h) for h in horizons)
+    if not horizons or horizons[0] < 1 or len(set(horizons)) != len(horizons):
+        raise ValueError(f"Horizons must be distinct positive bar counts, got {horizons}")
+    rng = np.random.default_rng(seed)
+    h_max = horizons[-1]
+    n_assets = len(sigma2)
+    out = {key: np.empty((len(horizons), n_assets)) for key in ('volatility', 'var', 'es')}
+
+    for lo in range(0, n_assets, asset_chunk):
+        cols = np.arange(lo, min(lo + asset_chunk, n_assets))
+        chunk = {k: v[cols] for k, v in params.items()}
+        z = _innovations(rng, params, (n_paths, h_max, len(cols)), cols)
+
+        var_t = np.broadcast_to(np.asarray(sigma2)[cols], (n_paths, len(cols))).copy()
+        cum = np.zeros((n_paths, len(cols)))
+        k = 0
+        for h in range(h_max):
+            resid = np.sqrt(var_t) * z[:, h]
+            cum += chunk['mu'] + resid
+            if h + 1 == horizons[k]:
+                losses = -cum / scale
+                q = np.quantile(losses, 1 - alpha, axis=0)
+                out['var'][k, cols] = q
+                tail = np.where(losses >= q, losses, np.nan)
+                out['es'][k, cols] = np.nanmean(tail, axis=0)
+                out['volatility'][k, cols] = np.sqrt(var_t.mean(axis=0)) / scale
+                k += 1
+                if k == len(horizons):
+                    break
+            var_t = _step(chunk, var_t, resid)
+    out['horizons'] = np.array(horizons)
+    return out
@@ -1,161 +1,200 @@
-# === Install dependencies ===
-!pip install praw vaderSentiment --quiet
-
-#!pip install praw vaderSentiment --quiet
+import os
 
 import praw
 import pandas as pd
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from datetime import datetime, timedelta
+from datetime import datetime
+
+import storage
+from news_fetcher import NewsFetcher, NewsFetchError
+from reddit_ingest import PrawFeed, RedditIngestor
+from sentiment_aggregates import SentimentAggregates
+from sentiment_scoring import ScoreCache, SentimentScorer
+
+# === Subreddits to scan ===
+SUBREDDITS = ['CryptoCurrency', 'Bitcoin', 'CryptoMarkets']
 
-# === VADER Setup ===
-analyzer = SentimentIntensityAnalyzer()
 
 # === Reddit API Setup ===
-reddit = praw.Reddit( #use async praw if you are going to make a lot of requests in a small amount of time. If you are going to use praw as is, then give it at least ten to fifteen minutes before making a request or it will scraping info for you
-    client_id='YOUR_CLIENT_ID', #you can create your own app on Reddit for scraping info, just look it up its easy
-    client_secret='YOUT_CLIENT_SECRET',
-    user_agent='USER_AGENT' #this is optional but recommended to be named 
-)
+def make_reddit():
+    return praw.Reddit( #use async praw if you are going to make a lot of requests in a small amount of time. If you are going to use praw as is, then give it at least ten to fifteen minutes before making a request or it will scraping info for you
+        client_id=os.environ.get('REDDIT_CLIENT_ID', 'YOUR_CLIENT_ID'), #you can create your own app on Reddit for scraping info, just look it up its easy
+        client_secret=os.environ.get('REDDIT_CLIENT_SECRET', 'YOUT_CLIENT_SECRET'),
+        user_agent=os.environ.get('REDDIT_USER_AGENT', 'USER_AGENT') #this is optional but recommended to be named
+    )
 
-# === Date Range Setup ===
-start_date = datetime(2025, 1, 1)
-end_date = datetime.utcnow()
-date_range = pd.date_range(start=start_date, end=end_date)
 
-# === Placeholder for daily sentiment scores ===
-daily_sentiment = {d.date(): [] for d in date_range}
+# === VADER Setup ===
+# Cached, process-parallel scoring: texts scored on an earlier run are never rescored
+def make_scorer(score_cache=None):
+    return SentimentScorer(ScoreCache(score_cache) if score_cache else None)
+
+
+# Pipeline stage: Reddit posts -> daily sentiment, with per-day moments carried in `aggregates_path`
+def collect_reddit_sentiment(dst, aggregates_path, state_dir, score_cache=None, start='2025-01-01', end=None,
+                             subreddits=SUBREDDITS, query='bitcoin', limit=1000, reddit=None):
+    # === Date Range Setup ===
+    last_day = pd.Timestamp(end or datetime.utcnow()).normalize()
+    start_date = pd.Timestamp(start).to_pydatetime()
+    end_date = (last_day + pd.Timedelta(days=1)).to_pydatetime()
+    scorer = make_scorer(score_cache)
+
+    # === Daily sentiment aggregates ===
+    # (sum, sum_sq, count) per coin/source/day, carried across runs instead of raw score lists
+    aggregates = SentimentAggregates.load_or_create(aggregates_path, origin=start)
+
+    print("Scraping Reddit...")
+
+    # Incremental ingestion: only submissions newer than each subreddit's watermark
+    # and not seen on an earlier run (crossposts count once) are fetched and scored
+    ingestor = RedditIngestor(PrawFeed(reddit or make_reddit()), state_dir, query=query, limit=limit)
+    # A run that died after saving the aggregates but before committing the watermarks is finished here
+    ingestor.recover(aggregates.token)
+
+    # Collect texts first, then score them in one batch
+    reddit_dates = []
+    reddit_texts = []
+
+    for sub in subreddits:
+        print(f"Searching r/{sub}")
+        try:
+            for post in ingestor.ingest([sub]):
+                created = datetime.utcfromtimestamp(post['created_utc'])
+                if start_date <= created < end_date:
+                    reddit_dates.append(created)
+                    reddit_texts.append(post['text'])
 
-# === Subreddits to scan ===
-subreddits = ['CryptoCurrency', 'Bitcoin', 'CryptoMarkets']
+        except Exception as e:
+            print(f"Error in r/{sub}: {e}")
 
-print("Scraping Reddit...")
+    aggregates.add(reddit_dates, scorer.score(reddit_texts), source='reddit', coin='bitcoin')
+    print(f"Scored {len(reddit_texts)} new posts: {scorer.throughput()}")
 
-for sub in subreddits:
-    print(f"Searching r/{sub}")
-    try:
-        for submission in reddit.subreddit(sub).search('bitcoin', sort='new', time_filter='all', limit=1000):
-            created = datetime.utcfromtimestamp(submission.created_utc).date()
-            if created in daily_sentiment:
-                text = submission.title + " " + submission.selftext
-                score = analyzer.polarity_scores(text)['compound']
-                daily_sentiment[created].append(score)
-
-    except Exception as e:
-        print(f"Error in r/{sub}: {e}")
-
-# === Average Sentiment Per Day ===  #becuase there were too many values for a single day. doesn't really change the sentiment drastically, the sentiment is mostly positive most of the time anyway, rarely found many negative sentiments 
-sentiment_data = []
-for date, scores in daily_sentiment.items():
-    avg_score = sum(scores) / len(scores) if scores else None
-    sentiment_data.append({'date': date, 'reddit_sentiment': avg_score})
-
-# === Save to CSV ===
-sentiment_df = pd.DataFrame(sentiment_data)
-sentiment_df.to_csv('/content/reddit_sentiment.csv', index=False)
-print("Done! Saved to reddit_sentiment.csv")
-
-import requests
-import pandas as pd
-from datetime import datetime, timedelta
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import time
-
-# Set your NewsAPI key here
-NEWS_API_KEY = "YOUR_KEY" #same thing here its very easy, just log onto news.org
-
-# Initialize VADER
-vader = SentimentIntensityAnalyzer()
-
-def get_articles_for_date(date, keyword="bitcoin"):
-    url = "https://newsapi.org/v2/everything"
-    params = {
-        "q": keyword,
-        "from": date,
-        "to": date,
-        "language": "en",
-        "sortBy": "relevancy",
-        "pageSize": 100,
-        "apiKey": NEWS_API_KEY
-    }
-    response = requests.get(url, params=params)
-    data = response.json()
-
-    if response.status_code != 200 or "articles" not in data:
-        print(f"Error on {date}: {data.get('message', 'Unknown error')}")
-        return []
+    # === Average Sentiment Per Day ===  #becuase there were too many values for a single day. doesn't really change the sentiment drastically, the sentiment is mostly positive most of the time anyway, rarely found many negative sentiments
+    reddit_daily = aggregates.daily('bitcoin', sources=['reddit'], start=start, end=last_day)
+    sentiment_df = reddit_daily.rename(columns={'mean': 'reddit_sentiment', 'count': 'reddit_count'})
+    sentiment_df = sentiment_df[['date', 'reddit_sentiment', 'reddit_count']]
 
-    return data["articles"]
+    # === Save ===
+    storage.write_table(sentiment_df, dst)
+    # Aggregates and seen ids/watermarks go together: journal, save tagged aggregates, commit
+    aggregates.token = ingestor.prepare()
+    aggregates.save(aggregates_path)
+    ingestor.commit()
+    print("Done! Saved reddit_sentiment")
+    return sentiment_df
 
-def extract_sentiment_from_articles(articles):
-    sentiments = []
-    for article in articles:
-        text = f"{article.get('title', '')} {article.get('description', '')}"
-        sentiment = vader.polarity_scores(text)['compound']
-        sentiments.append(sentiment)
-    return sentiments
 
-def scrape_news_sentiment(keyword="bitcoin", start_date="2025-03-21", end_date="2025-04-21"):
-    current_date = pd.to_datetime(start_date)
-    end_date = pd.to_datetime(end_date)
-    all_data = []
+def get_articles_for_date(date, keyword="bitcoin", fetcher=None):
+    try:
+        return (fetcher or make_news_fetcher()).fetch(date, keyword)
+    except NewsFetchError as e:
+        print(e)
+        return []
 
-    while current_date <= end_date:
-        date_str = current_date.strftime("%Y-%m-%d")
-        print(f"Processing {date_str}")
-        try:
-            articles = get_articles_for_date(date_str, keyword)
-            sentiments = extract_sentiment_from_articles(articles)
-            avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else None
-            all_data.append({"date": date_str, "news_sentiment": avg_sentiment})
-            time.sleep(1.2)  #Be gentle with NewsAPI's rate limit
-        except Exception as e:
-            print(f"Error on {date_str}: {e}")
-            all_data.append({"date": date_str, "news_sentiment": None})
-        current_date += timedelta(days=1)
 
-    df = pd.DataFrame(all_data)
-    df['date'] = pd.to_datetime(df['date'])
+def extract_sentiment_from_articles(articles, scorer):
+    texts = [f"{article.get('title', '')} {article.get('description', '')}" for article in articles]
+    return scorer.score(texts)
+
+
+def make_news_fetcher():
+    # Set your NewsAPI key in NEWS_API_KEY, its very easy, just log onto news.org
+    # Concurrent requests share one token bucket instead of sleeping after each call
+    return NewsFetcher(os.environ.get('NEWS_API_KEY', 'YOUR_KEY'), rate=5.0, burst=5, workers=8)
+
+
+def scrape_news_sentiment(keyword="bitcoin", start_date="2025-03-21", end_date="2025-04-21", keywords=None,
+                          fetcher=None, scorer=None, aggregates=None):
+    fetcher = fetcher or make_news_fetcher()
+    scorer = scorer or make_scorer()
+    keywords = keywords or [keyword]
+    dates = [d.strftime("%Y-%m-%d") for d in pd.date_range(start_date, end_date)]
+
+    # Per-run aggregates, fed as each response arrives so no raw scores are held. A date
+    # with any failed keyword is dropped from them at the end, so a partly failed date
+    # never replaces what an earlier run stored for it
+    run = SentimentAggregates(origin=dates[0])
+    failed = set()
+    for date_str, kw, articles, error in fetcher.iter_results(dates, keywords):
+        if error is not None:
+            print(f"Error on {date_str} ({kw}): {error}")
+            failed.add(date_str)
+            continue
+        print(f"Processing {date_str} ({kw})")
+        scores = extract_sentiment_from_articles(articles, scorer)
+        run.add([date_str] * len(scores), scores, source='news', coin='bitcoin')
+    for date_str in failed:
+        run.clear('news', date_str, date_str)
+    recomputed = [date_str for date_str in dates if date_str not in failed]
+
+    # The re-scraped days replace what earlier runs stored for them; failed days keep their old values
+    if aggregates is not None:
+        for date_str in recomputed:
+            aggregates.clear('news', date_str, date_str, coin='bitcoin')
+        aggregates.merge(run)
+
+    df = (aggregates if aggregates is not None else run).daily('bitcoin', sources=['news'], start=dates[0], end=dates[-1])
+    df = df.rename(columns={'mean': 'news_sentiment', 'count': 'news_count'})[['date', 'news_sentiment', 'news_count']]
     print("News sentiment scraping complete!")
     return df
 
-# Run the scraper
-news_sentiment_df = scrape_news_sentiment()
-news_sentiment_df.to_csv("news_sentiment.csv", index=False)
 
-import pandas as pd
+# Pipeline stage: NewsAPI articles -> daily sentiment; `aggregates_path` keeps every range scraped so far
+def collect_news_sentiment(dst, aggregates_path, score_cache=None, start="2025-03-21", end="2025-04-21",
+                           keywords=("bitcoin",), fetcher=None):
+    aggregates = SentimentAggregates.load_or_create(aggregates_path, origin=start)
+    news_sentiment_df = scrape_news_sentiment(start_date=start, end_date=end, keywords=list(keywords),
+                                              fetcher=fetcher, scorer=make_scorer(score_cache), aggregates=aggregates)
+    storage.write_table(news_sentiment_df, dst)
+    aggregates.save(aggregates_path)
+    return news_sentiment_df
 
-# Load your two sentiment CSVs
-reddit_df = pd.read_csv('/content/reddit_sentiment.csv', parse_dates=['date'])
-news_df = pd.read_csv('/content/news_sentiment.csv', parse_dates=['date'])
 
-# Create a date range from Jan 1 to Apr 21
-date_range = pd.date_range(start='2025-01-01', end='2025-04-21')
-merged_df = pd.DataFrame({'date': date_range})
+# Pipeline stage: both sources on one daily calendar
+def merge_sentiment(reddit, news, reddit_aggregates, news_aggregates, dst, start='2025-01-01', end='2025-04-21'):
+    # Load your two sentiment tables
+    reddit_df = storage.read_table(reddit)
+    news_df = storage.read_table(news)
 
-# Merge both sentiment sources
-merged_df = merged_df.merge(reddit_df, on='date', how='left')
-merged_df = merged_df.merge(news_df, on='date', how='left')
+    # Create a date range from start to end
+    date_range = pd.date_range(start=start, end=end)
+    merged_df = pd.DataFrame({'date': date_range})
 
-# Calculate final sentiment score: average if both exist, else keep the one that exists
-merged_df['sentiment_score'] = merged_df[['reddit_sentiment', 'news_sentiment']].mean(axis=1)
+    # Merge both sentiment sources
+    merged_df = merged_df.merge(reddit_df[['date', 'reddit_sentiment']], on='date', how='left')
+    merged_df = merged_df.merge(news_df[['date', 'news_sentiment']], on='date', how='left')
 
-# Optional: drop the individual columns if you want just the final sentiment
-# merged_df = merged_df[['date', 'sentiment_score']]
+    # Calculate final sentiment score: pooled over both sources, so each is weighted by its post/article count
+    aggregates = SentimentAggregates.load(reddit_aggregates).merge(SentimentAggregates.load(news_aggregates))
+    pooled = aggregates.daily('bitcoin', sources=['reddit', 'news'], start=date_range[0], end=date_range[-1])
+    merged_df['sentiment_score'] = pooled['mean'].to_numpy()
+    merged_df['sentiment_count'] = pooled['count'].to_numpy()
 
-# Save the final merged sentiment CSV
-merged_df.to_csv('/content/merged_sentiment.csv', index=False)
-print("Merged sentiment CSV saved at: /content/merged_sentiment.csv")
+    # Optional: drop the individual columns if you want just the final sentiment
+    # merged_df = merged_df[['date', 'sentiment_score']]
 
-import pandas as pd
+    # Save the final merged sentiment
+    storage.write_table(merged_df, dst)
+    print(f"Merged sentiment saved at: {dst}")
+    return merged_df
+
+
+# Pipeline stage: the final modelling dataset
+def join_sentiment(prices, sentiment, dst):
+    # Load your base features and the merged sentiment
+    btc_df = storage.read_table(prices)
+    sentiment_df = storage.read_table(sentiment, columns=['date', 'sentiment_score'])
+
+    # Merge only the sentiment_score column on 'date'
+    btc_df = btc_df.merge(sentiment_df[['date', 'sentiment_score']], on='date', how='left')
+
+    # Save the final merged file
+    storage.write_table(btc_df, dst)
+    print(f"Final dataset saved at: {dst}")
+    return btc_df
 
-# Load your base feature CSV and the merged sentiment CSV
-btc_df = pd.read_csv('/content/btc_vol.csv', parse_dates=['date'])
-sentiment_df = pd.read_csv('/content/merged_sentiment.csv', parse_dates=['date'])
 
-# Merge only the sentiment_score column on 'date'
-btc_df = btc_df.merge(sentiment_df[['date', 'sentiment_score']], on='date', how='left')
+if __name__ == '__main__':
+    from pipeline import run
 
-# Save the final merged file
-btc_df.to_csv('/content/btc_sentimentn.csv', index=False)
-print("Final dataset saved at: /content/btc_sentiment.csv")
+    print(run(['dataset']).to_string(index=False))
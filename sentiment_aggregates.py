@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_ORIGIN = '2020-01-01'
+
+
+class SentimentAggregates:
+    """Mergeable per-day sentiment moments: (sum, sum_sq, count) per coin,
+    source and day, stored in (coin, source, day) NumPy arrays indexed by
+    day offset from `origin`.
+
+    Raw scores are never kept. Two stores (other sources, earlier runs,
+    other workers) combine with merge(), and daily() gives means that are
+    weighted by post/article volume when several sources are pooled.
+    """
+
+    def __init__(self, origin=DEFAULT_ORIGIN):
+        self.origin = np.datetime64(origin, 'D')
+        self.coins = []
+        self.sources = []
+        self.sum = np.zeros((0, 0, 0))
+        self.sum_sq = np.zeros((0, 0, 0))
+        self.count = np.zeros((0, 0, 0), dtype=np.int64)
+        self.token = ''  # id of the last ingest batch folded in, see RedditIngestor.prepare()
+
+    @property
+    def n_days(self):
+        return self.sum.shape[2]
+
+    def _resize(self, n_coins, n_sources, n_days):
+        shape = (n_coins, n_sources, n_days)
+        if shape == self.sum.shape:
+            return
+        c, s, d = self.sum.shape
+        for name in ('sum', 'sum_sq', 'count'):
+            old = getattr(self, name)
+            new = np.zeros(shape, dtype=old.dtype)
+            new[:c, :s, :d] = old
+            setattr(self, name, new)
+
+    def _slot(self, coin, source):
+        if coin not in self.coins:
+            self.coins.append(coin)
+        if source not in self.sources:
+            self.sources.append(source)
+        self._resize(len(self.coins), len(self.sources), self.n_days)
+        return self.coins.index(coin), self.sources.index(source)
+
+    def _offsets(self, dates):
+        days = np.asarray(pd.to_datetime(np.asarray(dates)).values.astype('datetime64[D]'))
+        offsets = (days - self.origin).astype(np.int64)
+        if len(offsets) and offsets.min() < 0:
+            raise ValueError(f"Dates before the store origin {self.origin}")
+        return offsets
+
+    def _accumulate(self, coin, source, offsets, s, ss, c):
+        ci, si = self._slot(coin, source)
+        if len(offsets) and offsets.max() >= self.n_days:
+            # Grow in chunks so daily appends do not reallocate every time
+            self._resize(len(self.coins), len(self.sources), max(int(offsets.max()) + 1, self.n_days + 366))
+        np.add.at(self.sum[ci, si], offsets, s)
+        np.add.at(self.sum_sq[ci, si], offsets, ss)
+        np.add.at(self.count[ci, si], offsets, c)
+
+    def add(self, dates, scores, source, coin='bitcoin'):
+        scores = np.asarray(scores, dtype=np.float64)
+        offsets = self._offsets(dates)
+        self._accumulate(coin, source, offsets, scores, scores * scores, np.ones(len(scores), dtype=np.int64))
+        return self
+
+    def merge(self, other):
+        shift = int((other.origin - self.origin).astype(np.int64))
+        if shift < 0 and other.count[..., :-shift].any():
+            raise ValueError(f"Dates before the store origin {self.origin}")
+        for oc, coin in enumerate(other.coins):
+            for os_, source in enumerate(other.sources):
+                days = np.flatnonzero(other.count[oc, os_])
+                if len(days):
+                    self._accumulate(coin, source, days + shift, other.sum[oc, os_, days],
+                                     other.sum_sq[oc, os_, days], other.count[oc, os_, days])
+        return self
+
+    def clear(self, source, start, end, coin=None):
+        """Zero one source's days in [start, end], e.g. before re-adding a re-scraped range."""
+        if source not in self.sources:
+            return self
+        si = self.sources.index(source)
+        lo = int(self._offsets([start])[0])
+        hi = min(int(self._offsets([end])[0]) + 1, self.n_days)
+        coins = range(len(self.coins)) if coin is None else [self.coins.index(coin)] if coin in self.coins else []
+        for ci in coins:
+            self.sum[ci, si, lo:hi] = 0
+            self.sum_sq[ci, si, lo:hi] = 0
+            self.count[ci, si, lo:hi] = 0
+        return self
+
+    def daily(self, coin='bitcoin', sources=None, start=None, end=None):
+        """Per-day mean, std and count for one coin, pooled over `sources`
+        (all sources by default). Days without data have NaN mean/std."""
+        sources = list(self.sources) if sources is None else list(sources)
+        lo = 0 if start is None else int(self._offsets([start])[0])
+        hi = self.n_days if end is None else int(self._offsets([end])[0]) + 1
+        dates = self.origin + np.arange(lo, hi)
+
+        s = np.zeros(hi - lo)
+        ss = np.zeros(hi - lo)
+        c = np.zeros(hi - lo, dtype=np.int64)
+        if coin in self.coins:
+            ci = self.coins.index(coin)
+            avail = min(hi, self.n_days)
+            for source in sources:
+                if source in self.sources and avail > lo:
+                    si = self.sources.index(source)
+                    s[:avail - lo] += self.sum[ci, si, lo:avail]
+                    ss[:avail - lo] += self.sum_sq[ci, si, lo:avail]
+                    c[:avail - lo] += self.count[ci, si, lo:avail]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(c > 0, s / c, np.nan)
+            var = np.where(c > 1, (ss - c * mean * mean) / (c - 1), np.nan)
+        return pd.DataFrame({
+            'date': pd.to_datetime(dates),
+            'mean': mean,
+            'std': np.sqrt(np.maximum(var, 0.0)),
+            'count': c,
+        })
+
+    def save(self, path):
+        # Written aside and renamed, so a crash never leaves a half-written store
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, origin=str(self.origin), coins=np.array(self.coins, dtype=str),
+                     sources=np.array(self.sources, dtype=str), sum=self.sum, sum_sq=self.sum_sq, count=self.count,
+                     token=str(self.token))
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        store = cls(origin=str(data['origin']))
+        store.coins = [str(c) for c in data['coins']]
+        store.sources = [str(s) for s in data['sources']]
+        store.sum = data['sum']
+        store.sum_sq = data['sum_sq']
+        store.count = data['count']
+        store.token = str(data['token']) if 'token' in data.files else ''
+        return store
+
+    @classmethod
+    def load_or_create(cls, path, origin=DEFAULT_ORIGIN):
+        try:
+            return cls.load(path)
+        except FileNotFoundError:
+            return cls(origin=origin)
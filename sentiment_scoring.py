@@ -0,0 +1,122 @@
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+DEFAULT_CACHE_PATH = '/content/sentiment_cache.sqlite'
+BUSY_TIMEOUT = 60  # seconds a connection waits for another writer before raising 'database is locked'
+
+# Below this many uncached texts a process pool costs more than it saves
+MIN_PARALLEL_TEXTS = 2000
+
+_worker_analyzer = None
+
+
+def _init_worker():
+    global _worker_analyzer
+    _worker_analyzer = SentimentIntensityAnalyzer()
+
+
+def _score_chunk(texts):
+    return [_worker_analyzer.polarity_scores(text)['compound'] for text in texts]
+
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class ScoreCache:
+    """Persistent content-hash -> VADER compound score table (SQLite)."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # The reddit and news stages run concurrently with their own connections to one file:
+        # WAL lets reads go on during a write, and the timeout waits out the other stage's write
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS scores (hash BLOB PRIMARY KEY, compound REAL NOT NULL)')
+
+    def get_many(self, hashes):
+        found = {}
+        hashes = list(hashes)
+        for i in range(0, len(hashes), 500):  # stay under SQLite's bound-parameter limit
+            batch = hashes[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT hash, compound FROM scores WHERE hash IN ({','.join('?' * len(batch))})", batch)
+            found.update(rows)
+        return found
+
+    def put_many(self, items):
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO scores VALUES (?, ?)', items)
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class SentimentScorer:
+    """VADER scoring stage: cached texts are looked up, the rest are scored
+    in chunks across a process pool and written back to the cache.
+
+    `stats` accumulates over every call: texts seen, cache hits, texts
+    actually scored and seconds spent, from which throughput() derives
+    texts/sec and the cache hit rate.
+    """
+
+    def __init__(self, cache=None, workers=None, chunk_size=500, min_parallel=MIN_PARALLEL_TEXTS):
+        self.cache = cache if cache is not None else ScoreCache()
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.min_parallel = min_parallel
+        self.analyzer = None
+        self.stats = {'texts': 0, 'cache_hits': 0, 'scored': 0, 'seconds': 0.0}
+
+    def _score(self, texts):
+        if self.workers > 1 and len(texts) >= self.min_parallel:
+            chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+                return [score for chunk in pool.map(_score_chunk, chunks) for score in chunk]
+
+        if self.analyzer is None:
+            self.analyzer = SentimentIntensityAnalyzer()
+        return [self.analyzer.polarity_scores(text)['compound'] for text in texts]
+
+    def score(self, texts):
+        started = time.perf_counter()
+        texts = list(texts)
+        hashes = [text_hash(text) for text in texts]
+        known = self.cache.get_many(set(hashes))
+
+        # Score each distinct uncached text once
+        todo = {}
+        for h, text in zip(hashes, texts):
+            if h not in known and h not in todo:
+                todo[h] = text
+        if todo:
+            scores = self._score(list(todo.values()))
+            new = dict(zip(todo.keys(), scores))
+            self.cache.put_many(new.items())
+            known.update(new)
+
+        self.stats['texts'] += len(texts)
+        self.stats['cache_hits'] += sum(1 for h in hashes if h not in todo)
+        self.stats['scored'] += len(todo)
+        self.stats['seconds'] += time.perf_counter() - started
+        return [known[h] for h in hashes]
+
+    def throughput(self):
+        seconds = self.stats['seconds']
+        texts = self.stats['texts']
+        return {
+            **self.stats,
+            'texts_per_sec': texts / seconds if seconds else 0.0,
+            'cache_hit_rate': self.stats['cache_hits'] / texts if texts else 0.0,
+        }
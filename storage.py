@@ -0,0 +1,380 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # fall back to memory-mapped .npy columns
+    pa = pq = None
+
+# Columns parsed as datetimes when a legacy CSV is read
+DATE_COLUMNS = ('date', 'ds', 'timestamp')
+
+_EXTENSIONS = ('.parquet', '.cols', '.csv')
+_META = '_meta.json'
+
+
+def _stem(path):
+    path = os.fspath(path)
+    for ext in _EXTENSIONS:
+        if path.endswith(ext):
+            return path[:-len(ext)]
+    return path
+
+
+def default_backend():
+    return 'parquet' if pq is not None else 'npy'
+
+
+def locate(path):
+    """Return the on-disk file backing a table, or None if it was never written.
+
+    Tables are addressed by stem ('/content/btc_featuresn'); a trailing
+    .csv/.parquet is ignored so the old CSV paths keep working. Binary copies
+    win over a CSV with the same stem.
+    """
+    stem = _stem(path)
+    for ext in _EXTENSIONS:
+        if os.path.exists(stem + ext):
+            return stem + ext
+    return None
+
+
+def write_table(df, path, backend=None):
+    backend = backend or default_backend()
+    stem = _stem(path)
+    directory = os.path.dirname(stem)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Written next to the target and swapped in: frames read earlier may still map the old files,
+    # and overwriting those in place would crash their readers with SIGBUS
+    if backend == 'parquet':
+        if pq is None:
+            raise ImportError("pyarrow is required for the parquet backend")
+        target = stem + '.parquet'
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), target + '.tmp')
+    elif backend == 'npy':
+        target = stem + '.cols'
+        _write_columns(df, target + '.tmp')
+    elif backend == 'csv':
+        target = stem + '.csv'
+        df.to_csv(target + '.tmp', index=False)
+    else:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    _swap(target + '.tmp', target, stem)
+    instrumentation.add_io(rows_written=len(df), bytes_written=_size(target))
+    return target
+
+
+def read_table(path, columns=None):
+    """Load a table, optionally projecting to a subset of columns.
+
+    Parquet files are memory-mapped and .cols directories are opened with
+    np.load(mmap_mode='r'), so numeric columns are not copied on read.
+    """
+    target = locate(path)
+    if target is None:
+        raise FileNotFoundError(f"No table found at {_stem(path)} (.parquet/.cols/.csv)")
+    columns = list(columns) if columns is not None else None
+
+    if target.endswith('.parquet'):
+        table = pq.read_table(target, columns=columns, memory_map=True)
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+    elif target.endswith('.cols'):
+        df = _read_columns(target, columns)
+    else:
+        df = pd.read_csv(target, usecols=columns)
+        for col in DATE_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col])
+        df = df[columns] if columns is not None else df
+    instrumentation.add_io(rows_read=len(df), bytes_read=_bytes_read(target, columns))
+    return df
+
+
+def iter_table(path, chunk_rows, columns=None):
+    """Yield a table as consecutive DataFrames of at most `chunk_rows` rows.
+
+    Only one chunk is materialised at a time: parquet is read batch by batch,
+    .cols slices the memory-mapped columns and CSV is parsed in chunks.
+    """
+    target = locate(path)
+    if target is None:
+        raise FileNotFoundError(f"No table found at {_stem(path)} (.parquet/.cols/.csv)")
+    columns = list(columns) if columns is not None else None
+
+    if target.endswith('.parquet'):
+        parquet = pq.ParquetFile(target, memory_map=True)
+        chunks = (pa.Table.from_batches([batch]).to_pandas()
+                  for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns))
+    elif target.endswith('.cols'):
+        full = _read_columns(target, columns)
+        chunks = (full.iloc[i:i + chunk_rows].reset_index(drop=True) for i in range(0, len(full), chunk_rows))
+    else:
+        chunks = _iter_csv(target, chunk_rows, columns)
+
+    for chunk in chunks:
+        instrumentation.add_io(rows_read=len(chunk))
+        yield chunk
+    instrumentation.add_io(bytes_read=_bytes_read(target, columns))
+
+
+def _iter_csv(target, chunk_rows, columns):
+    for chunk in pd.read_csv(target, usecols=columns, chunksize=chunk_rows):
+        for col in DATE_COLUMNS:
+            if col in chunk.columns:
+                chunk[col] = pd.to_datetime(chunk[col])
+        yield chunk[columns] if columns is not None else chunk
+
+
+class TableWriter:
+    """Write a table one chunk at a time; close() finishes it like write_table would.
+
+    Parquet gets one row group per chunk and CSV is appended to, so neither
+    holds more than the current chunk. The .cols backend needs the final row
+    count for each .npy header, so chunks are appended to raw column files
+    and copied into place on close. Every chunk must have the same columns
+    and dtypes as the first, except that string columns widen to the
+    longest value seen.
+    """
+
+    def __init__(self, path, backend=None):
+        self.backend = backend or default_backend()
+        self.stem = _stem(path)
+        self.rows = 0
+        self.columns = None
+        self._writer = None
+        self._parts = None
+        directory = os.path.dirname(self.stem)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.backend == 'parquet':
+            if pq is None:
+                raise ImportError("pyarrow is required for the parquet backend")
+            self.target = self.stem + '.parquet'
+        elif self.backend == 'npy':
+            self.target = self.stem + '.cols'
+        elif self.backend == 'csv':
+            self.target = self.stem + '.csv'
+        else:
+            raise ValueError(f"Unknown storage backend: {self.backend}")
+        self._tmp = self.target + '.tmp'
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        elif list(df.columns) != self.columns:
+            raise ValueError(f"Chunk columns {list(df.columns)} differ from the first chunk's {self.columns}")
+
+        if self.backend == 'parquet':
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._tmp, table.schema)
+            self._writer.write_table(table)
+        elif self.backend == 'npy':
+            self._write_parts(df)
+        else:
+            df.to_csv(self._tmp, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        self.rows += len(df)
+        return self
+
+    def _write_parts(self, df):
+        if self._parts is None:
+            os.makedirs(self._tmp, exist_ok=True)
+            self._parts = []
+        for i, name in enumerate(df.columns):
+            values = _column_values(df[name])
+            raw = os.path.join(self._tmp, f'{i}.raw')
+            if i == len(self._parts):
+                self._parts.append({'name': str(name), 'file': f'{i}.npy', 'dtype': values.dtype,
+                                    'tz': _column_tz(df[name])})
+            elif values.dtype != self._parts[i]['dtype']:
+                stored = self._parts[i]['dtype']
+                if values.dtype.kind != 'U' or stored.kind != 'U':
+                    raise ValueError(f"Column {name!r} changed dtype from {stored} to {values.dtype}")
+                # String widths follow the longest value in each chunk: pad this chunk to the
+                # stored width, or widen the rows written so far when this chunk is wider
+                if values.dtype.itemsize < stored.itemsize:
+                    values = values.astype(stored)
+                else:
+                    _widen_raw(raw, stored, values.dtype)
+                    self._parts[i]['dtype'] = values.dtype
+            with open(raw, 'ab') as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+
+    def _finish_parts(self):
+        meta = {'rows': self.rows, 'columns': []}
+        for part in self._parts or []:
+            raw = os.path.join(self._tmp, part['file'][:-4] + '.raw')
+            out = np.lib.format.open_memmap(os.path.join(self._tmp, part['file']), mode='w+',
+                                            dtype=part['dtype'], shape=(self.rows,))
+            source = np.memmap(raw, dtype=part['dtype'], mode='r', shape=(self.rows,)) if self.rows else out
+            step = 1 << 20
+            for i in range(0, self.rows, step):
+                out[i:i + step] = source[i:i + step]
+            out.flush()
+            del out, source
+            os.remove(raw)
+            meta['columns'].append({'name': part['name'], 'file': part['file'], 'dtype': str(part['dtype']),
+                                    'tz': part['tz']})
+        os.makedirs(self._tmp, exist_ok=True)
+        with open(os.path.join(self._tmp, _META), 'w') as f:
+            json.dump(meta, f)
+
+    def close(self):
+        if self.backend == 'parquet':
+            if self._writer is None:
+                raise ValueError("No chunks were written")
+            self._writer.close()
+        elif self.backend == 'npy':
+            self._finish_parts()
+        elif self.columns is None:
+            raise ValueError("No chunks were written")
+
+        # Only a finished table replaces the old one
+        _swap(self._tmp, self.target, self.stem)
+        instrumentation.add_io(rows_written=self.rows, bytes_written=_size(self.target))
+        return self.target
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            if self._writer is not None:
+                self._writer.close()
+            if os.path.exists(self._tmp):
+                _remove(self._tmp)
+        return False
+
+
+def table_columns(path):
+    target = locate(path)
+    if target is None:
+        raise FileNotFoundError(f"No table found at {_stem(path)} (.parquet/.cols/.csv)")
+    if target.endswith('.parquet'):
+        return list(pq.read_schema(target).names)
+    if target.endswith('.cols'):
+        with open(os.path.join(target, _META)) as f:
+            return [c['name'] for c in json.load(f)['columns']]
+    return list(pd.read_csv(target, nrows=0).columns)
+
+
+def _swap(tmp, target, stem):
+    # Renames never touch the old files' contents, so existing memory maps stay valid;
+    # a directory can't be renamed over a non-empty one, hence the detour for .cols
+    if os.path.isdir(target):
+        old = target + '.old'
+        if os.path.exists(old):
+            _remove(old)
+        os.replace(target, old)
+        os.replace(tmp, target)
+        _remove(old)
+    else:
+        os.replace(tmp, target)
+    # Drop stale copies in other formats so readers never pick up old data
+    for ext in _EXTENSIONS:
+        other = stem + ext
+        if other != target and os.path.exists(other):
+            _remove(other)
+
+
+def _write_columns(df, target):
+    if os.path.exists(target):
+        _remove(target)
+    os.makedirs(target)
+    meta = {'rows': len(df), 'columns': []}
+    for i, name in enumerate(df.columns):
+        values = _column_values(df[name])
+        file = f'{i}.npy'
+        np.save(os.path.join(target, file), values, allow_pickle=False)
+        meta['columns'].append({'name': str(name), 'file': file, 'dtype': str(values.dtype), 'tz': _column_tz(df[name])})
+    with open(os.path.join(target, _META), 'w') as f:
+        json.dump(meta, f)
+
+
+def _column_values(series):
+    # tz-aware datetimes come out of to_numpy() as objects, so check the pandas dtype first
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return series.dt.tz_convert(None).to_numpy()
+    values = series.to_numpy()
+    if values.dtype == object and pd.api.types.infer_dtype(values) == 'date':
+        values = pd.to_datetime(values).to_numpy()
+    elif values.dtype == object:
+        values = values.astype(str)  # fixed-width unicode keeps the file mmap-able
+    return values
+
+
+def _widen_raw(raw, dtype, wider):
+    # Rewrite a raw column file with a wider string dtype, a block at a time
+    rows = os.path.getsize(raw) // dtype.itemsize
+    tmp = raw + '.tmp'
+    with open(tmp, 'wb') as out:
+        if rows:
+            source = np.memmap(raw, dtype=dtype, mode='r', shape=(rows,))
+            step = 1 << 20
+            for i in range(0, rows, step):
+                out.write(np.ascontiguousarray(source[i:i + step].astype(wider)).tobytes())
+            del source
+    os.replace(tmp, raw)
+
+
+def _column_tz(series):
+    # Stored as naive UTC; the zone goes in the metadata so reads restore it
+    return str(series.dtype.tz) if isinstance(series.dtype, pd.DatetimeTZDtype) else None
+
+
+def _read_columns(target, columns):
+    with open(os.path.join(target, _META)) as f:
+        meta = json.load(f)
+    available = {c['name']: c for c in meta['columns']}
+    names = columns if columns is not None else [c['name'] for c in meta['columns']]
+    missing = [c for c in names if c not in available]
+    if missing:
+        raise KeyError(f"Columns not in {target}: {missing}")
+
+    data = {name: np.load(os.path.join(target, available[name]['file']), mmap_mode='r') for name in names}
+    df = pd.DataFrame(data, copy=False)
+    for name in names:
+        tz = available[name].get('tz')
+        if tz:
+            df[name] = df[name].dt.tz_localize('UTC').dt.tz_convert(tz)
+    return df
+
+
+def _size(target):
+    if os.path.isdir(target):
+        return sum(os.path.getsize(os.path.join(target, name)) for name in os.listdir(target))
+    return os.path.getsize(target)
+
+
+# Bytes a read touches: only the projected columns' chunks/files where the format allows it
+def _bytes_read(target, columns):
+    if columns is None or target.endswith('.csv'):
+        return _size(target)
+    if target.endswith('.parquet'):
+        meta = pq.read_metadata(target)
+        names = set(columns)
+        return sum(rg.column(i).total_compressed_size
+                   for rg in (meta.row_group(r) for r in range(meta.num_row_groups))
+                   for i in range(rg.num_columns) if rg.column(i).path_in_schema in names)
+    with open(os.path.join(target, _META)) as f:
+        files = {c['name']: c['file'] for c in json.load(f)['columns']}
+    return sum(os.path.getsize(os.path.join(target, files[c])) for c in columns)
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+        os.rmdir(path)
+    else:
+        os.remove(path)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+# Words VADER scores, mixed with neutral filler so compound scores spread over [-1, 1]
+_POSITIVE = ['great', 'bullish', 'moon', 'gains', 'love', 'strong', 'win', 'amazing', 'happy', 'up']
+_NEGATIVE = ['crash', 'bearish', 'dump', 'losses', 'hate', 'weak', 'scam', 'terrible', 'fear', 'down']
+_NEUTRAL = ['bitcoin', 'btc', 'price', 'market', 'today', 'chart', 'exchange', 'wallet', 'block',
+            'halving', 'etf', 'miners', 'volume', 'order', 'trade', 'crypto', 'hodl', 'news']
+
+
+def market_returns(rows, tickers=1, seed=0, daily_vol=0.03, persistence=0.98, vol_of_vol=0.15):
+    """Stochastic-volatility returns, shape (rows, tickers).
+
+    Log volatility follows an AR(1), so calm and turbulent stretches cluster
+    like real crypto returns and the GARCH/EGARCH fits and anomaly z-scores
+    see realistic input. The recursion runs through lfilter, so 10M rows
+    cost about as much as drawing the random numbers.
+    """
+    rng = np.random.default_rng(seed)
+    shocks = rng.normal(0, vol_of_vol, (rows, tickers))
+    log_vol = lfilter([1.0], [1.0, -persistence], shocks, axis=0)
+    return daily_vol * np.exp(log_vol - log_vol.var(axis=0) / 2) * rng.standard_normal((rows, tickers))
+
+
+def ohlcv_matrices(rows, tickers=1, seed=0, start_price=30000.0):
+    """(time x ticker) open/high/low/close/volume arrays built on market_returns."""
+    rng = np.random.default_rng(seed + 1)
+    returns = market_returns(rows, tickers, seed)
+    close = start_price * np.exp(np.cumsum(returns, axis=0))
+    open_ = np.vstack([close[:1], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.005, (rows, tickers))) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.lognormal(20, 0.5, (rows, tickers))
+    return {'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
+
+
+def ohlcv_frame(rows, seed=0, freq='D', start='2020-01-01'):
+    """One ticker of OHLCV bars with a 'date' column, shaped like the Yahoo download."""
+    bars = ohlcv_matrices(rows, 1, seed)
+    df = pd.DataFrame({name: values[:, 0] for name, values in bars.items()})
+    df.insert(0, 'date', pd.date_range(start, periods=rows, freq=freq))
+    return df
+
+
+def text_corpus(n, seed=0, min_words=5, max_words=30):
+    """Reddit/news-like snippets; about 10% are exact repeats, as crossposts and syndicated headlines are."""
+    rng = np.random.default_rng(seed)
+    vocab = np.array(_POSITIVE + _NEGATIVE + _NEUTRAL)
+    weights = np.r_[np.full(len(_POSITIVE), 1.0), np.full(len(_NEGATIVE), 1.0), np.full(len(_NEUTRAL), 4.0)]
+    weights /= weights.sum()
+    lengths = rng.integers(min_words, max_words + 1, n)
+    words = rng.choice(vocab, size=int(lengths.sum()), p=weights)
+    texts = [' '.join(chunk) for chunk in np.split(words, np.cumsum(lengths)[:-1])]
+    repeats = rng.random(n) < 0.1
+    sources = rng.integers(0, n, n)
+    return [texts[s] if r else t for t, r, s in zip(texts, repeats, sources)]
+
+
+def sentiment_scores(n, days, seed=0, start='2025-01-01'):
+    """Timestamps spread over `days` days and compound-like scores in [-1, 1]."""
+    rng = np.random.default_rng(seed)
+    offsets = rng.integers(0, days * 86400, n)
+    dates = pd.Timestamp(start) + pd.to_timedelta(np.sort(offsets), unit='s')
+    return dates, np.tanh(rng.normal(0.2, 0.6, n))
+
+
+def trade_ticks(n, symbols=('BTCUSDT',), rate=1000.0, seed=0, start='2025-01-01', start_price=30000.0, daily_vol=0.03):
+    """`n` trade prints per symbol at about `rate` per second, shaped like an exchange trade stream.
+
+    Columns are symbol, time (epoch milliseconds), price and qty, ordered by
+    time. Per-trade volatility is scaled so a day of prints has `daily_vol`.
+    """
+    rng = np.random.default_rng(seed)
+    origin = pd.Timestamp(start).value // 1_000_000
+    tick_vol = daily_vol / np.sqrt(86400 * rate)
+    frames = []
+    for i, symbol in enumerate(symbols):
+        gaps = rng.exponential(1000 / rate, n)
+        returns = market_returns(n, 1, seed + i, daily_vol=tick_vol, persistence=0.9999, vol_of_vol=0.01)[:, 0]
+        frames.append(pd.DataFrame({
+            'symbol': symbol,
+            'time': origin + np.cumsum(gaps).astype(np.int64),
+            'price': start_price / (i + 1) * np.exp(np.cumsum(returns)),
+            'qty': rng.lognormal(-3, 1, n),
+        }))
+    return pd.concat(frames, ignore_index=True).sort_values('time', kind='stable', ignore_index=True)
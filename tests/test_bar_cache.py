@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+from bar_cache import BarCache, missing_ranges
+from intraday import ChunkedDownloader
+
+T = pd.Timestamp
+
+
+class FakeDownloader:
+    """Hourly bars for any range, except the ranges starting at a date in `empty`."""
+
+    def __init__(self, empty=()):
+        self.empty = {T(d) for d in empty}
+        self.calls = []
+
+    def __call__(self, ticker, start, end, interval):
+        self.calls.append((T(start), T(end)))
+        if T(start) in self.empty:
+            return pd.DataFrame()
+        dates = pd.date_range(start, end, freq='h', inclusive='left')
+        return pd.DataFrame({'date': dates, 'close': range(len(dates))})
+
+
+@pytest.fixture
+def clock():
+    return lambda: T('2025-01-01')
+
+
+def test_missing_ranges():
+    covered = [[T('2024-01-03'), T('2024-01-05')], [T('2024-01-04'), T('2024-01-07')], [T('2024-01-09'), T('2024-01-10')]]
+    assert missing_ranges(T('2024-01-01'), T('2024-01-12'), covered) == [
+        (T('2024-01-01'), T('2024-01-03')), (T('2024-01-07'), T('2024-01-09')), (T('2024-01-10'), T('2024-01-12'))]
+    assert missing_ranges(T('2024-01-03'), T('2024-01-06'), covered) == []
+    assert missing_ranges(T('2024-01-01'), T('2024-01-02'), []) == [(T('2024-01-01'), T('2024-01-02'))]
+
+
+def test_fetch_only_downloads_gaps(tmp_path, clock):
+    fake = FakeDownloader()
+    cache = BarCache(str(tmp_path), fake, clock=clock)
+    first = cache.fetch('BTC-USD', '2024-01-01', '2024-01-03', '1h')
+    assert len(first) == 48
+
+    fake.calls.clear()
+    bars = cache.fetch('BTC-USD', '2024-01-02', '2024-01-05', '1h')
+    assert fake.calls == [(T('2024-01-03'), T('2024-01-05'))]
+    assert len(bars) == 72 and bars['date'].is_monotonic_increasing
+    assert cache.coverage('BTC-USD', '1h') == [[T('2024-01-01'), T('2024-01-05')]]
+
+
+def test_empty_download_is_not_covered(tmp_path, clock):
+    fake = FakeDownloader(empty=['2024-01-01'])
+    cache = BarCache(str(tmp_path), fake, clock=clock)
+    assert cache.fetch('BTC-USD', '2024-01-01', '2024-01-02', '1h').empty
+    assert cache.coverage('BTC-USD', '1h') == []
+
+    fake.empty.clear()
+    assert len(cache.fetch('BTC-USD', '2024-01-01', '2024-01-02', '1h')) == 24
+    assert len(fake.calls) == 2
+
+
+def test_forming_bars_are_not_covered(tmp_path):
+    cache = BarCache(str(tmp_path), FakeDownloader(), clock=lambda: T('2024-01-02 10:30'))
+    cache.fetch('BTC-USD', '2024-01-02', '2024-01-03', '1h')
+    assert cache.coverage('BTC-USD', '1h') == [[T('2024-01-02'), T('2024-01-02 09:00')]]
+
+
+def test_chunked_download_covers_only_chunks_with_bars(tmp_path, clock):
+    fake = FakeDownloader(empty=['2024-01-08'])
+    chunked = ChunkedDownloader(fake, workers=2, max_span={'1h': pd.Timedelta(days=7)})
+    cache = BarCache(str(tmp_path), chunked, clock=clock)
+
+    bars = cache.fetch('BTC-USD', '2024-01-01', '2024-01-22', '1h')
+    assert len(bars) == 14 * 24
+    assert cache.coverage('BTC-USD', '1h') == [[T('2024-01-01'), T('2024-01-08')], [T('2024-01-15'), T('2024-01-22')]]
+
+    # The empty chunk is asked for again, and once it returns bars the range is whole
+    fake.empty.clear()
+    fake.calls.clear()
+    bars = cache.fetch('BTC-USD', '2024-01-01', '2024-01-22', '1h')
+    assert fake.calls == [(T('2024-01-08'), T('2024-01-15'))]
+    assert len(bars) == 21 * 24 and not bars['date'].duplicated().any()
+    assert cache.coverage('BTC-USD', '1h') == [[T('2024-01-01'), T('2024-01-22')]]
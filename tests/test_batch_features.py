@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from batch_features import compute_rsi_matrix, rolling_mean_std
+
+
+def test_rolling_std_long_trending_series():
+    # A trend from 100 to 1e5 over 2M rows: a single prefix sum drifted by >10% here
+    n, window = 2_000_000, 21
+    x = np.linspace(100, 100_000, n) + np.random.default_rng(0).normal(0, 1, n)
+    mean, std = rolling_mean_std(x[:, None], window)
+
+    rolling = pd.Series(x).rolling(window)
+    # pandas' online algorithm drifts a little itself, so it gets a looser bound than the exact two-pass values
+    np.testing.assert_allclose(std[:, 0], rolling.std().to_numpy(), rtol=1e-3)
+    np.testing.assert_allclose(mean[:, 0], rolling.mean().to_numpy(), rtol=1e-9)
+    exact = sliding_window_view(x, window).std(axis=1, ddof=1)
+    np.testing.assert_allclose(std[window - 1:, 0], exact, rtol=1e-6)
+
+
+def test_rolling_nan_and_flat_windows_match_pandas():
+    x = np.r_[np.full(15_000, np.nan), np.ones(100), np.arange(30_000.0), [np.nan], np.zeros(50)]
+    mean, std = rolling_mean_std(np.column_stack([x, x[::-1]]), 21)
+    for col, series in enumerate([x, x[::-1]]):
+        rolling = pd.Series(series).rolling(21)
+        np.testing.assert_allclose(mean[:, col], rolling.mean().to_numpy(), atol=1e-9)
+        np.testing.assert_allclose(std[:, col], rolling.std().to_numpy(), atol=1e-3)
+    assert std[15_099, 0] == 0.0
+
+
+def test_rsi_flat_window_is_nan():
+    close = np.r_[np.linspace(100, 120, 30), np.full(30, 120.0)][:, None]
+    rsi = compute_rsi_matrix(close, 14)
+    assert np.isnan(rsi[-1, 0])
+    assert 0 <= np.nanmin(rsi) and np.nanmax(rsi) <= 100
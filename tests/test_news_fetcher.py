@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+import requests
+
+from news_fetcher import NewsFetchError, NewsFetcher, TokenBucket
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+class FakeTransport:
+    """requests.Session stand-in answering by (date, keyword); a list answer is played back in order."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        key = (params['from'], params['q'])
+        with self.lock:
+            self.calls.append(key)
+            answer = self.answers[key]
+            if isinstance(answer, list):
+                answer = answer.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+class FakeTime:
+    """A clock that only moves when something sleeps on it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self.lock = threading.Lock()
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+
+def articles(*titles):
+    return FakeResponse(200, {'status': 'ok', 'articles': [{'title': t} for t in titles]})
+
+
+def make_fetcher(answers, **kwargs):
+    fake = FakeTime()
+    # The fetcher's bucket runs on the real clock, so give it room for every request here;
+    # pacing is tested on a bucket with the fake clock
+    kwargs = {'rate': 1e6, 'burst': 1000, **kwargs}
+    fetcher = NewsFetcher('key', session=FakeTransport(answers), sleep=fake.sleep, **kwargs)
+    return fetcher, fake
+
+
+def test_token_bucket_paces_after_the_burst():
+    fake = FakeTime()
+    # A power-of-two rate keeps the fake clock's arithmetic exact
+    bucket = TokenBucket(rate=4.0, capacity=4, clock=fake.clock, sleep=fake.sleep)
+    for _ in range(12):
+        bucket.acquire()
+    # Four go out at once, the next eight wait for tokens at 4 per second
+    assert fake.now == 2.0
+    assert fake.sleeps == [0.25] * 8
+
+
+def test_retries_then_returns_articles():
+    fetcher, fake = make_fetcher({('2025-01-01', 'bitcoin'): [FakeResponse(503), requests.Timeout('slow'),
+                                                               articles('a', 'b')]})
+    assert [a['title'] for a in fetcher.fetch('2025-01-01')] == ['a', 'b']
+    assert len(fetcher.session.calls) == 3
+    assert 0.5 <= fake.sleeps[0] <= 1.5 and 1.0 <= fake.sleeps[1] <= 3.0
+
+
+def test_retry_after_is_a_minimum():
+    fetcher, fake = make_fetcher({})
+    for _ in range(20):
+        fetcher.session.answers[('2025-01-01', 'bitcoin')] = [FakeResponse(429, headers={'Retry-After': '10'}), articles('a')]
+        fetcher.fetch('2025-01-01')
+    assert min(fake.sleeps) >= 10
+
+
+@pytest.mark.parametrize('answer, message', [
+    (FakeResponse(401, {'status': 'error', 'message': 'bad key'}), 'bad key'),
+    (FakeResponse(500, ValueError('html')), '500'),
+    (FakeResponse(200, ValueError('not json')), 'invalid JSON'),
+    (FakeResponse(200, ['not', 'a', 'dict']), 'Unknown error'),
+    (FakeResponse(200, {'status': 'error', 'message': 'rate limited'}), 'rate limited'),
+    (requests.TooManyRedirects('loop'), 'loop'),
+    (requests.ConnectionError('down'), 'down'),
+])
+def test_failures_raise_news_fetch_error(answer, message):
+    fetcher, _ = make_fetcher({('2025-01-01', 'bitcoin'): [answer] * 3}, max_retries=2)
+    with pytest.raises(NewsFetchError, match=message):
+        fetcher.fetch('2025-01-01')
+
+
+def test_iter_results_yields_articles_and_errors():
+    answers = {('2025-01-01', 'bitcoin'): articles('a'), ('2025-01-01', 'crypto'): articles('b', 'c'),
+               ('2025-01-02', 'bitcoin'): FakeResponse(401, {'message': 'bad key'}),
+               ('2025-01-02', 'crypto'): articles()}
+    fetcher, _ = make_fetcher(answers, workers=3)
+    results = {(date, keyword): (found, error)
+               for date, keyword, found, error in fetcher.iter_results(['2025-01-01', '2025-01-02'], ['bitcoin', 'crypto'])}
+
+    assert set(results) == set(answers)
+    for found, error in results.values():
+        assert (found is None) != (error is None)
+    assert len(results[('2025-01-01', 'crypto')][0]) == 2
+    assert results[('2025-01-02', 'crypto')] == ([], None)
+    assert isinstance(results[('2025-01-02', 'bitcoin')][1], NewsFetchError)
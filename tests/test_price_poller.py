@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+import requests
+
+import price_poller
+from price_poller import PriceFetchError, PricePoller
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+class FakeSession:
+    """Plays back canned responses (or raises exceptions) in order and records the params."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append(params)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def quote(price, updated=1_700_000_000):
+    return {'bitcoin': {'usd': price, 'last_updated_at': updated}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_poller(session, **kwargs):
+    sleeps = []
+    poller = PricePoller(session=session, sleep=sleeps.append, backoff=1.0, **kwargs)
+    return poller, sleeps
+
+
+def test_retries_with_backoff_then_succeeds():
+    session = FakeSession(FakeResponse(503), requests.ConnectionError('reset'), FakeResponse(200, quote(50_000)))
+    poller, sleeps = make_poller(session)
+    assert poller.get_price() == 50_000
+    assert poller.stats['retries'] == 2
+    # Exponential backoff with up to 10% jitter
+    assert 1.0 <= sleeps[0] <= 1.1 and 2.0 <= sleeps[1] <= 2.2
+
+
+def test_retry_after_is_honoured():
+    session = FakeSession(FakeResponse(429, headers={'Retry-After': '7'}), FakeResponse(200, quote(1)))
+    poller, sleeps = make_poller(session)
+    poller.get_price()
+    assert 7.0 <= sleeps[0] <= 7.7
+
+
+def test_gives_up_after_max_retries():
+    session = FakeSession(*[FakeResponse(500)] * 3)
+    poller, sleeps = make_poller(session, max_retries=2)
+    with pytest.raises(PriceFetchError):
+        poller.get_price()
+    assert len(session.calls) == 3 and len(sleeps) == 2
+
+
+def test_errors_are_wrapped():
+    poller, _ = make_poller(FakeSession(FakeResponse(404)))
+    with pytest.raises(PriceFetchError):
+        poller.get_price()
+    poller, _ = make_poller(FakeSession(FakeResponse(200, ValueError('not json'))))
+    with pytest.raises(PriceFetchError):
+        poller.get_price()
+    poller, _ = make_poller(FakeSession(FakeResponse(200, {})))
+    with pytest.raises(PriceFetchError, match='No price'):
+        poller.get_price()
+
+
+def test_quotes_are_cached_for_ttl():
+    clock = Clock()
+    session = FakeSession(FakeResponse(200, quote(1)), FakeResponse(200, quote(2)))
+    poller, _ = make_poller(session, ttl=60, clock=clock)
+    assert poller.get_price() == 1
+    clock.now += 59
+    assert poller.get_price() == 1
+    assert poller.stats['cache_hits'] == 1 and len(session.calls) == 1
+    clock.now += 2
+    assert poller.get_price() == 2
+    assert len(session.calls) == 2
+
+
+def test_refresh_batches_ids():
+    ids = [f'coin{i}' for i in range(price_poller.MAX_IDS_PER_CALL + 10)]
+    session = FakeSession(FakeResponse(200, {ids[0]: {'usd': 1}}), FakeResponse(200, {ids[-1]: {'usd': 2, 'eur': 3}}))
+    poller, _ = make_poller(session)
+    quotes = poller.refresh(ids + ids[:5], ['usd', 'eur'])
+    assert len(session.calls) == 2
+    assert session.calls[0]['ids'].count(',') == price_poller.MAX_IDS_PER_CALL - 1
+    assert session.calls[0]['vs_currencies'] == 'usd,eur'
+    assert set(quotes) == {(ids[0], 'usd'), (ids[-1], 'usd'), (ids[-1], 'eur')}
+    assert quotes[(ids[0], 'usd')]['last_updated_at'] is None
+
+
+def test_get_poller_is_shared_across_threads(monkeypatch):
+    monkeypatch.setattr(price_poller, '_default_poller', None)
+    created = []
+    original = PricePoller.__init__
+
+    def counting_init(self, *args, **kwargs):
+        created.append(self)
+        original(self, *args, session=FakeSession(), **kwargs)
+
+    monkeypatch.setattr(PricePoller, '__init__', counting_init)
+    barrier = threading.Barrier(8)
+    seen = []
+
+    def grab():
+        barrier.wait()
+        seen.append(price_poller.get_poller())
+
+    threads = [threading.Thread(target=grab) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1 and all(p is created[0] for p in seen)
@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from reddit_ingest import RedditIngestor, submission_key
+from sentiment_aggregates import SentimentAggregates
+
+DAY = 86400
+T0 = 1_735_689_600  # 2025-01-01 00:00 UTC
+
+
+def post(sid, created, parent=None, title='btc'):
+    return SimpleNamespace(id=sid, created_utc=created, title=title, selftext='',
+                           crosspost_parent=f't3_{parent}' if parent else None)
+
+
+class FakeFeed:
+    """List-backed stand-in for PrawFeed: posts per subreddit, served newest first."""
+
+    def __init__(self, posts=None):
+        self.posts = posts or {}
+        self.searched = []
+
+    def search(self, subreddit, query, limit):
+        self.searched.append(subreddit)
+        return sorted(self.posts.get(subreddit, []), key=lambda p: -p.created_utc)[:limit]
+
+
+def test_watermark_advances_and_skips_old_posts(tmp_path):
+    feed = FakeFeed({'Bitcoin': [post('a1', T0), post('a2', T0 + DAY)]})
+    ingestor = RedditIngestor(feed, str(tmp_path), overlap=3600)
+    assert [p['id'] for p in ingestor.ingest(['Bitcoin'])] == ['a2', 'a1']
+    ingestor.commit()
+    assert ingestor.watermarks == {'Bitcoin': T0 + DAY}
+
+    # A fresh ingestor reloads the state; only the new post comes back, and posts
+    # older than watermark - overlap are not even walked past
+    feed.posts['Bitcoin'].append(post('a3', T0 + 2 * DAY))
+    feed.posts['Bitcoin'].append(post('a0', T0 - DAY))
+    ingestor = RedditIngestor(feed, str(tmp_path), overlap=3600)
+    assert [p['id'] for p in ingestor.ingest(['Bitcoin'])] == ['a3']
+    ingestor.commit()
+    assert ingestor.watermarks == {'Bitcoin': T0 + 2 * DAY}
+
+
+def test_uncommitted_ingest_is_fetched_again(tmp_path):
+    feed = FakeFeed({'Bitcoin': [post('a1', T0)]})
+    assert len(RedditIngestor(feed, str(tmp_path)).ingest(['Bitcoin'])) == 1
+    assert len(RedditIngestor(feed, str(tmp_path)).ingest(['Bitcoin'])) == 1
+
+
+def test_crossposts_count_once(tmp_path):
+    feed = FakeFeed({
+        'Bitcoin': [post('b1', T0), post('b2', T0 + 60)],
+        'CryptoCurrency': [post('c1', T0 + 120, parent='b1'), post('c2', T0 + 180)],
+    })
+    ingestor = RedditIngestor(feed, str(tmp_path))
+    assert submission_key(feed.posts['CryptoCurrency'][0]) == int('b1', 36)
+    assert sorted(p['id'] for p in ingestor.ingest(['Bitcoin', 'CryptoCurrency'])) == ['b1', 'b2', 'c2']
+    ingestor.commit()
+
+    # A later crosspost of an already-seen post is skipped across runs too
+    feed.posts['Bitcoin'].append(post('b3', T0 + 240, parent='c2'))
+    ingestor = RedditIngestor(feed, str(tmp_path))
+    assert ingestor.ingest(['Bitcoin', 'CryptoCurrency']) == []
+
+
+def _run(feed, state_dir, aggregates_path, crash=None):
+    """The reddit stage's write sequence; `crash` stops it before 'save' or before 'commit'."""
+    aggregates = SentimentAggregates.load_or_create(aggregates_path, origin='2025-01-01')
+    ingestor = RedditIngestor(feed, state_dir)
+    ingestor.recover(aggregates.token)
+    posts = ingestor.ingest(['Bitcoin'])
+    aggregates.add([np.datetime64(p['created_utc'], 's') for p in posts], [0.5] * len(posts), source='reddit')
+    aggregates.token = ingestor.prepare()
+    if crash == 'save':
+        return
+    aggregates.save(aggregates_path)
+    if crash == 'commit':
+        return
+    ingestor.commit()
+
+
+def _total(aggregates_path):
+    return int(SentimentAggregates.load(aggregates_path).daily(sources=['reddit'])['count'].sum())
+
+
+def test_crash_between_save_and_commit_is_recovered(tmp_path):
+    state, path = str(tmp_path / 'state'), str(tmp_path / 'aggregates.npz')
+    feed = FakeFeed({'Bitcoin': [post(f'p{i}', T0 + i * 3600) for i in range(10)]})
+    _run(feed, state, path, crash='commit')
+    assert _total(path) == 10
+
+    # The aggregates carry the journal's token, so the next run finishes the commit
+    # instead of fetching (and counting) the same ten posts again
+    feed.posts['Bitcoin'].append(post('p10', T0 + 10 * 3600))
+    _run(feed, state, path)
+    assert _total(path) == 11
+    assert not (tmp_path / 'state' / 'bitcoin_pending.json').exists()
+
+
+def test_crash_before_save_drops_the_journal(tmp_path):
+    state, path = str(tmp_path / 'state'), str(tmp_path / 'aggregates.npz')
+    feed = FakeFeed({'Bitcoin': [post(f'p{i}', T0 + i * 3600) for i in range(10)]})
+    _run(feed, state, path)
+    feed.posts['Bitcoin'].append(post('p10', T0 + 10 * 3600))
+    _run(feed, state, path, crash='save')
+    assert _total(path) == 10
+
+    # Nothing was saved for p10, so the journal is discarded and p10 is fetched again
+    _run(feed, state, path)
+    assert _total(path) == 11
@@ -0,0 +1,199 @@
+import asyncio
+import http
+import math
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic
+import tick_stream
+from tick_stream import ReplayFeed, ReplayServer, StreamRunner, TickStream, TradeFeed, bar_scale
+
+pytest.importorskip('websockets')
+from websockets.asyncio.server import serve  # noqa: E402
+
+SYMBOLS = ('BTCUSDT', 'ETHUSDT')
+
+
+@pytest.fixture(scope='module')
+def ticks():
+    return synthetic.trade_ticks(3000, SYMBOLS, rate=50, seed=1)
+
+
+def expected_bars(ticks, interval):
+    """OHLCV per symbol and interval, the way pandas would build them from the whole tape."""
+    start = ticks['time'] - ticks['time'] % int(interval * 1000)
+    grouped = ticks.assign(start=start).groupby(['symbol', 'start'], sort=True)
+    bars = grouped.agg(open=('price', 'first'), high=('price', 'max'), low=('price', 'min'),
+                       close=('price', 'last'), volume=('qty', 'sum'), trades=('price', 'size')).reset_index()
+    bars['date'] = pd.to_datetime(bars.pop('start'), unit='ms')
+    return bars
+
+
+async def collect(stream):
+    queue = stream.subscribe(maxsize=100_000)
+    stats = await stream.run()
+    rows = []
+    while not queue.empty():
+        rows.append(queue.get_nowait())
+    return stats, pd.DataFrame(rows)
+
+
+def check_bars(rows, ticks, interval):
+    expected = expected_bars(ticks, interval)
+    got = rows.sort_values(['symbol', 'date'], ignore_index=True)
+    assert len(got) == len(expected)
+    for col in ['symbol', 'date', 'trades']:
+        assert (got[col] == expected[col]).all(), col
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        np.testing.assert_allclose(got[col], expected[col], rtol=1e-12, err_msg=col)
+
+
+def test_bar_scale():
+    assert bar_scale(86400) == 100
+    assert math.isclose(bar_scale(60), 100 * math.sqrt(1440))
+    assert bar_scale(1) > bar_scale(60) > bar_scale(3600)
+
+
+def test_replay_feed_builds_bars_and_features(ticks):
+    stream = TickStream(ReplayFeed(ticks, batch_size=250), interval=5, min_fit_bars=10**6)
+    stats, rows = asyncio.run(collect(stream))
+    assert stats['ticks'] == len(ticks) and stats['bars'] == len(rows)
+    check_bars(rows, ticks, 5)
+
+    btc = rows[rows['symbol'] == 'BTCUSDT'].reset_index(drop=True)
+    np.testing.assert_allclose(btc['return'].iloc[1:], btc['close'].pct_change().iloc[1:], rtol=1e-9)
+    assert btc['rsi_14'].iloc[20:].between(0, 100).all()
+    assert all(engine.scale == bar_scale(5) for engine in stream.vol_engines.values())
+
+
+def test_trade_feed_over_replay_server_matches_replay_feed(ticks):
+    async def main():
+        async with ReplayServer(ticks) as server:
+            feed = TradeFeed(SYMBOLS, server.url, reconnect=False)
+            return await collect(TickStream(feed, interval=5, min_fit_bars=10**6))
+
+    stats, rows = asyncio.run(main())
+    assert stats['ticks'] == len(ticks)
+    check_bars(rows, ticks, 5)
+
+
+def test_replay_server_serves_only_the_requested_symbols(ticks):
+    async def main():
+        async with ReplayServer(ticks) as server:
+            return await collect(TickStream(TradeFeed(['ethusdt'], server.url, reconnect=False), interval=5))
+
+    stats, rows = asyncio.run(main())
+    assert set(rows['symbol']) == {'ETHUSDT'}
+    assert stats['ticks'] == (ticks['symbol'] == 'ETHUSDT').sum()
+
+
+def test_trade_feed_reconnects_after_the_server_closes(ticks):
+    one = ticks[ticks['symbol'] == 'BTCUSDT'].head(200)
+
+    async def main():
+        async with ReplayServer(one) as server:
+            got = []
+            async for batch in TradeFeed(['BTCUSDT'], server.url, backoff=0.01).ticks():
+                got.extend(batch)
+                if len(got) >= 3 * len(one):
+                    return got
+
+    got = asyncio.run(asyncio.wait_for(main(), 10))
+    # Each connection replays the tape from the start
+    assert [t[1] for t in got[:len(one)]] == [t[1] for t in got[len(one):2 * len(one)]]
+
+
+def test_trade_feed_retries_rejected_handshakes(ticks):
+    one = ticks[ticks['symbol'] == 'BTCUSDT'].head(50)
+    attempts = []
+
+    def reject_twice(connection, request):
+        attempts.append(request.path)
+        if len(attempts) <= 2:
+            return connection.respond(http.HTTPStatus.SERVICE_UNAVAILABLE, "busy\n")
+        return None
+
+    async def main():
+        replay = ReplayServer(one)
+        async with serve(replay._serve, '127.0.0.1', 0, process_request=reject_twice) as server:
+            url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            async for batch in TradeFeed(['BTCUSDT'], url, backoff=0.01).ticks():
+                return batch
+
+    assert asyncio.run(asyncio.wait_for(main(), 10))[0][0] == 'BTCUSDT'
+    assert len(attempts) == 3
+
+
+def test_trade_feed_without_reconnect_raises(ticks):
+    async def main():
+        async with serve(None, '127.0.0.1', 0,
+                         process_request=lambda c, r: c.respond(http.HTTPStatus.FORBIDDEN, "no\n")) as server:
+            url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            async for _ in TradeFeed(['BTCUSDT'], url, reconnect=False).ticks():
+                pass
+
+    with pytest.raises(tick_stream.WebSocketException):
+        asyncio.run(main())
+
+
+def test_failed_fits_back_off(ticks, monkeypatch):
+    attempts = []
+
+    def failing_fit(self, returns):
+        attempts.append(len(returns))
+        raise RuntimeError("no convergence")
+
+    monkeypatch.setattr(tick_stream.VolatilityEngine, 'fit', failing_fit)
+    one = ticks[ticks['symbol'] == 'BTCUSDT']
+    stream = TickStream(ReplayFeed(one, rate=20_000, batch_size=20), interval=0.5, min_fit_bars=20)
+    stats, rows = asyncio.run(collect(stream))
+
+    returns = rows['return'].notna().sum()
+    assert returns > 100 and stats['fits'] == 0
+    # One attempt at min_fit_bars, then one per min_fit_bars further returns, not one per bar
+    assert 1 <= len(attempts) <= returns // 20
+    assert rows['egarch_vol'].isna().all()
+
+
+class FailOnceFeed:
+    """Raises on the first run, replays the tape on later ones."""
+
+    def __init__(self, ticks):
+        self.ticks_ = ticks
+        self.runs = 0
+
+    async def ticks(self):
+        self.runs += 1
+        if self.runs == 1:
+            raise RuntimeError("feed died")
+        async for batch in ReplayFeed(self.ticks_, rate=20_000).ticks():
+            yield batch
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_stream_runner_restarts_after_a_failure(ticks):
+    one = ticks[ticks['symbol'] == 'BTCUSDT']
+    stream = TickStream(FailOnceFeed(one), interval=1, min_fit_bars=10**6)
+    runner = StreamRunner(stream)
+
+    runner.start()
+    assert wait_for(lambda: not runner.running)
+    assert isinstance(runner.error, RuntimeError) and stream.subscribers == []
+
+    runner.start()
+    assert wait_for(lambda: not runner.running)
+    assert runner.error is None
+    assert len(runner.frame('BTCUSDT')) == min(len(expected_bars(one, 1)), runner.history)
+    assert runner.latest('BTCUSDT')['close'] == one['price'].iloc[-1]
+    assert stream.subscribers == []
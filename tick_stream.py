@@ -0,0 +1,522 @@
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from feature_engine import FeatureEngine
+from vol_engine import VolatilityEngine
+
+try:
+    from websockets.asyncio.client import connect as ws_connect
+    from websockets.asyncio.server import serve as ws_serve
+    from websockets.exceptions import ConnectionClosed, WebSocketException
+except ImportError:  # only the in-process ReplayFeed works without it
+    ws_connect = ws_serve = None
+    ConnectionClosed = WebSocketException = OSError
+
+BINANCE_WS = 'wss://stream.binance.com:9443'
+
+
+# A tick is a plain (symbol, time_ms, price, qty) tuple: thousands a second per symbol
+# go through the hot loop, so no per-tick objects beyond the tuple itself
+
+
+def parse_trade(message):
+    """Tick from a Binance trade message (raw or combined-stream envelope); None for anything else."""
+    data = json.loads(message)
+    data = data.get('data', data)
+    if data.get('e') != 'trade':
+        return None
+    return data['s'], data['T'], float(data['p']), float(data['q'])
+
+
+def trade_message(symbol, time_ms, price, qty, trade_id=0):
+    """The combined-stream message Binance sends for one trade."""
+    return json.dumps({'stream': f'{symbol.lower()}@trade', 'data': {
+        'e': 'trade', 'E': time_ms, 's': symbol, 't': trade_id,
+        'p': repr(price), 'q': repr(qty), 'T': time_ms, 'm': False}})
+
+
+def _ticks_from(ticks):
+    if isinstance(ticks, pd.DataFrame):
+        return list(ticks[['symbol', 'time', 'price', 'qty']].itertuples(index=False, name=None))
+    return list(ticks)
+
+
+class TradeFeed:
+    """Trades from a Binance-compatible websocket trade stream.
+
+    Point `url` at a ReplayServer to run offline. Dropped connections and
+    failed handshakes (a rejected status, a proxy error) are retried with
+    exponential backoff; with reconnect=False the feed ends when the server
+    closes the stream.
+    """
+
+    def __init__(self, symbols, url=BINANCE_WS, reconnect=True, backoff=1.0, max_backoff=30.0):
+        if ws_connect is None:
+            raise ImportError("websockets is required for TradeFeed")
+        self.symbols = [s.upper() for s in symbols]
+        self.url = url.rstrip('/')
+        self.reconnect = reconnect
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    @property
+    def stream_url(self):
+        return f"{self.url}/stream?streams=" + '/'.join(f'{s.lower()}@trade' for s in self.symbols)
+
+    async def ticks(self):
+        delay = self.backoff
+        while True:
+            try:
+                async with ws_connect(self.stream_url, max_queue=None) as ws:
+                    delay = self.backoff
+                    async for message in ws:
+                        tick = parse_trade(message)
+                        if tick is not None:
+                            yield [tick]
+            except (OSError, WebSocketException) as e:  # ConnectionClosed, InvalidStatus, InvalidHandshake...
+                if not self.reconnect:
+                    raise
+                print(f"Trade feed disconnected ({e}), reconnecting in {delay:.0f}s")
+            else:
+                if not self.reconnect:
+                    return
+            await asyncio.sleep(delay * (1 + 0.1 * random.random()))
+            delay = min(delay * 2, self.max_backoff)
+
+
+class ReplayFeed:
+    """In-process feed over recorded or synthetic ticks, in batches.
+
+    `rate` paces the replay in ticks per second (None replays as fast as the
+    consumer keeps up); the loop is yielded to between batches either way.
+    """
+
+    def __init__(self, ticks, rate=None, batch_size=500):
+        self.recorded = _ticks_from(ticks)
+        self.rate = rate
+        self.batch_size = batch_size
+
+    async def ticks(self):
+        started = time.perf_counter()
+        for i in range(0, len(self.recorded), self.batch_size):
+            if self.rate:
+                ahead = i / self.rate - (time.perf_counter() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+            yield self.recorded[i:i + self.batch_size]
+            await asyncio.sleep(0)
+
+
+class ReplayServer:
+    """Local stand-in for the exchange: replays ticks as Binance trade messages.
+
+    Each connection gets the ticks for the symbols named in its
+    `/stream?streams=btcusdt@trade/...` path, paced at `rate` ticks per
+    second (as fast as possible if None), and is closed when they run out.
+
+        async with ReplayServer(ticks, rate=2000) as server:
+            stream = TickStream(TradeFeed(['BTCUSDT'], server.url, reconnect=False))
+    """
+
+    def __init__(self, ticks, host='127.0.0.1', port=0, rate=None):
+        if ws_serve is None:
+            raise ImportError("websockets is required for ReplayServer")
+        self.recorded = _ticks_from(ticks)
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.server = None
+
+    @property
+    def url(self):
+        return f'ws://{self.host}:{self.port}'
+
+    async def start(self):
+        self.server = await ws_serve(self._serve, self.host, self.port, max_queue=None)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+        return False
+
+    async def _serve(self, ws):
+        streams = parse_qs(urlsplit(ws.request.path).query).get('streams', [''])[0]
+        wanted = {s.split('@')[0].upper() for s in streams.split('/') if s}
+        ticks = [t for t in self.recorded if not wanted or t[0] in wanted]
+        started = time.perf_counter()
+        try:
+            for i, (symbol, time_ms, price, qty) in enumerate(ticks):
+                if self.rate and i % 100 == 0:
+                    ahead = i / self.rate - (time.perf_counter() - started)
+                    if ahead > 0:
+                        await asyncio.sleep(ahead)
+                await ws.send(trade_message(symbol, time_ms, price, qty, i))
+        except ConnectionClosed:
+            return  # the client went away mid-replay
+        await ws.close()
+
+
+class BarBuilder:
+    """Aggregates one symbol's trades into fixed-interval OHLCV bars.
+
+    add() is the per-tick hot path: it updates the open bar in place and
+    returns the previous bar once a trade lands in a later interval.
+    Trades for an interval that was already closed are counted in `late`
+    and dropped. Intervals without trades produce no bar.
+    """
+
+    def __init__(self, symbol, interval=60):
+        self.symbol = symbol
+        self.interval_ms = int(interval * 1000)
+        self.bar = None  # [start_ms, open, high, low, close, volume, trades]
+        self.closed_start = None
+        self.late = 0
+
+    def add(self, time_ms, price, qty):
+        start = time_ms - time_ms % self.interval_ms
+        bar = self.bar
+        if bar is not None and start == bar[0]:
+            if price > bar[2]:
+                bar[2] = price
+            elif price < bar[3]:
+                bar[3] = price
+            bar[4] = price
+            bar[5] += qty
+            bar[6] += 1
+            return None
+        if (bar is not None and start < bar[0]) or (self.closed_start is not None and start <= self.closed_start):
+            self.late += 1
+            return None
+        closed = self.close()
+        self.bar = [start, price, price, price, price, qty, 1]
+        return closed
+
+    def due(self, now_ms, grace_ms=0):
+        """Close the open bar if its interval (plus `grace_ms` for stragglers) is over by `now_ms`."""
+        if self.bar is not None and now_ms >= self.bar[0] + self.interval_ms + grace_ms:
+            return self.close()
+        return None
+
+    def close(self):
+        bar, self.bar = self.bar, None
+        if bar is None:
+            return None
+        self.closed_start = bar[0]
+        return {'symbol': self.symbol, 'date': pd.Timestamp(bar[0], unit='ms'), 'open': bar[1], 'high': bar[2],
+                'low': bar[3], 'close': bar[4], 'volume': bar[5], 'trades': bar[6]}
+
+
+def bar_scale(interval):
+    """Return scale for `interval`-second bars: x100 for daily bars, and by
+    sqrt(time) for shorter ones, so minute and second returns are not too
+    small for arch's optimiser (its DataScaleWarning)."""
+    return 100 * math.sqrt(86400 / interval)
+
+
+class TickStream:
+    """Ticks in, closed bars with live features out.
+
+    Each symbol gets a BarBuilder, a FeatureEngine and an EGARCH
+    VolatilityEngine. When a bar closes its returns and indicators come
+    from FeatureEngine.update() and its conditional volatility from one
+    VolatilityEngine.update() step. Returns are scaled by bar_scale(interval),
+    so the optimiser sees daily-sized numbers and the volatility reads as
+    daily-equivalent percent, like the egarch_vol column.
+    The result is put on every subscriber's asyncio.Queue.
+
+    A symbol without a fitted engine collects `min_fit_bars` returns first.
+    Fits (that one and one every `refit_every` bars after it) run on a copy
+    of the engine in a worker thread. Returns that close meanwhile are
+    replayed into the copy before it replaces the live engine, so the event
+    loop never waits on the optimiser. After a failed fit the symbol waits
+    another `min_fit_bars` returns (`refit_every` once it has a fitted
+    engine) before the next attempt.
+
+    Bars close when a later trade arrives, or once feed time (the latest
+    trade time, advanced by the wall clock while the feed is quiet) passes
+    the end of the interval by `grace` seconds.
+    """
+
+    def __init__(self, feed, interval=60, vol_engines=None, min_fit_bars=500, refit_every=None,
+                 grace=2.0, history=1000, clock=time.time):
+        self.feed = feed
+        self.interval = interval
+        self.vol_engines = dict(vol_engines or {})
+        self.min_fit_bars = min_fit_bars
+        self.refit_every = refit_every
+        self.grace_ms = int(grace * 1000)
+        self.history = history
+        self.clock = clock
+
+        self.builders = {}
+        self.features = {}
+        self.returns = {}  # recent returns per symbol, the sample for (re)fits
+        self._pending = {}  # returns closed while a fit for the symbol is running
+        self._fits = set()
+        self._fit_wait = {}  # returns to skip before retrying a failed fit
+        self.subscribers = []
+        self.stats = {'ticks': 0, 'bars': 0, 'dropped': 0, 'fits': 0}
+        self._last_tick_ms = None
+        self._last_tick_wall = None
+
+    def subscribe(self, maxsize=1000):
+        """Queue receiving every published bar. A full queue drops its oldest bar, so a slow reader lags, never blocks."""
+        queue = asyncio.Queue(maxsize)
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.remove(queue)
+
+    def publish(self, row):
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.stats['dropped'] += 1
+            queue.put_nowait(row)
+
+    def _builder(self, symbol):
+        self.builders[symbol] = builder = BarBuilder(symbol, self.interval)
+        self.features[symbol] = FeatureEngine()
+        self.returns[symbol] = deque(maxlen=max(self.history, self.min_fit_bars))
+        self.vol_engines.setdefault(symbol, VolatilityEngine(vol='EGARCH', p=1, q=1, dist='normal',
+                                                             scale=bar_scale(self.interval)))
+        return builder
+
+    async def run(self):
+        """Consume the feed until it ends (replays) or the task is cancelled; open bars are closed at the end."""
+        builders = self.builders
+        closer = asyncio.create_task(self._close_due())
+        try:
+            async for batch in self.feed.ticks():
+                for symbol, time_ms, price, qty in batch:
+                    builder = builders.get(symbol) or self._builder(symbol)
+                    bar = builder.add(time_ms, price, qty)
+                    if bar is not None:
+                        self.on_bar(bar)
+                self.stats['ticks'] += len(batch)
+                self._last_tick_ms = batch[-1][1]
+                self._last_tick_wall = self.clock()
+            for builder in list(builders.values()):
+                bar = builder.close()
+                if bar is not None:
+                    self.on_bar(bar)
+        finally:
+            closer.cancel()
+        return self.stats
+
+    def feed_time_ms(self):
+        if self._last_tick_ms is None:
+            return None
+        return self._last_tick_ms + int((self.clock() - self._last_tick_wall) * 1000)
+
+    async def _close_due(self, every=0.25):
+        while True:
+            await asyncio.sleep(every)
+            now = self.feed_time_ms()
+            if now is None:
+                continue
+            for builder in list(self.builders.values()):
+                bar = builder.due(now, self.grace_ms)
+                if bar is not None:
+                    self.on_bar(bar)
+
+    def on_bar(self, bar):
+        symbol = bar['symbol']
+        row = self.features[symbol].update(bar)
+        ret = row['return']
+        engine = self.vol_engines[symbol]
+
+        row['egarch_vol'] = row['next_egarch_vol'] = math.nan
+        if ret == ret:
+            self.returns[symbol].append(ret)
+            if symbol in self._fits:
+                self._pending[symbol].append(ret)
+            if engine.params is not None:
+                row['egarch_vol'] = engine.update(ret)
+                row['next_egarch_vol'] = engine.next_volatility
+            self._maybe_fit(symbol)
+
+        self.stats['bars'] += 1
+        self.publish(row)
+        return row
+
+    def _maybe_fit(self, symbol):
+        if symbol in self._fits:
+            return
+        if self._fit_wait.get(symbol):
+            self._fit_wait[symbol] -= 1
+            return
+        engine = self.vol_engines[symbol]
+        if engine.params is None:
+            due = len(self.returns[symbol]) >= self.min_fit_bars
+        else:
+            due = bool(self.refit_every) and engine.since_refit >= self.refit_every
+        if due:
+            self._fits.add(symbol)
+            self._pending[symbol] = []
+            asyncio.get_running_loop().create_task(self._fit(symbol, list(self.returns[symbol])))
+
+    async def _fit(self, symbol, returns):
+        candidate = VolatilityEngine.from_dict(self.vol_engines[symbol].to_dict())
+        try:
+            await asyncio.to_thread(candidate.fit, pd.Series(returns))
+            # Unconverged EGARCH parameters can drive the variance recursion to zero, so keep the live engine
+            if candidate.result.convergence_flag:
+                raise RuntimeError(f"optimizer did not converge: {candidate.result.optimization_result.message}")
+            # Bring the copy up to date with the bars that closed during the fit
+            for ret in self._pending[symbol]:
+                candidate.update(ret)
+        except Exception as e:
+            print(f"EGARCH fit for {symbol} failed: {e}")
+            fitted = self.vol_engines[symbol].params is not None
+            self._fit_wait[symbol] = self.refit_every if fitted else self.min_fit_bars
+        else:
+            self.vol_engines[symbol] = candidate
+            self.stats['fits'] += 1
+        finally:
+            self._fits.discard(symbol)
+            self._pending.pop(symbol, None)
+
+
+class StreamRunner:
+    """Runs a TickStream on its own event loop in a background thread.
+
+    For synchronous readers like the Streamlit app: the latest `history`
+    bars per symbol are kept in a locked table that frame() and latest()
+    copy from, so a page render never touches the event loop. If the
+    stream dies, `error` holds the exception and start() runs it again;
+    the error is cleared once a bar arrives after the restart.
+    """
+
+    def __init__(self, stream, history=500):
+        self.stream = stream
+        self.bars = {}
+        self.history = history
+        self.lock = threading.Lock()
+        self.error = None
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return self._thread
+        self._thread = threading.Thread(target=self._run, name='tick-stream', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._main())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.error = e
+            print(f"Tick stream stopped: {e}")
+        finally:
+            self._loop.close()
+
+    async def _main(self):
+        queue = self.stream.subscribe()
+        try:
+            self._task = asyncio.create_task(self.stream.run())
+            while not self._task.done() or not queue.empty():
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, self._task}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                row = getter.result()
+                with self.lock:
+                    self.bars.setdefault(row['symbol'], deque(maxlen=self.history)).append(row)
+                self.error = None
+            await self._task
+        finally:
+            self.stream.unsubscribe(queue)  # a restart subscribes a fresh queue
+
+    def stop(self):
+        if self._task is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def frame(self, symbol):
+        with self.lock:
+            rows = list(self.bars.get(symbol, ()))
+        return pd.DataFrame(rows)
+
+    def latest(self, symbol):
+        with self.lock:
+            bars = self.bars.get(symbol)
+            return dict(bars[-1]) if bars else None
+
+
+async def _replay_demo(ticks, interval, rate):
+    async with ReplayServer(ticks, rate=rate) as server:
+        symbols = sorted(set(t[0] for t in _ticks_from(ticks)))
+        stream = TickStream(TradeFeed(symbols, server.url, reconnect=False), interval, min_fit_bars=100)
+        queue = stream.subscribe()
+        printer = asyncio.create_task(_print_bars(queue))
+        started = time.perf_counter()
+        stats = await stream.run()
+        await asyncio.sleep(0)
+        printer.cancel()
+        elapsed = time.perf_counter() - started
+        print(f"{stats['ticks']} ticks -> {stats['bars']} bars in {elapsed:.1f}s "
+              f"({stats['ticks'] / elapsed:,.0f} ticks/s, {stats['fits']} EGARCH fits)")
+
+
+async def _print_bars(queue):
+    while True:
+        row = await queue.get()
+        print(f"{row['symbol']} {row['date']} close={row['close']:.2f} trades={row['trades']} "
+              f"rsi_14={row['rsi_14']:.1f} egarch_vol={row['egarch_vol']:.4f}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build live bars and features from a trade stream")
+    parser.add_argument('symbols', nargs='*', default=['BTCUSDT'])
+    parser.add_argument('--url', default=BINANCE_WS, help="Binance-compatible websocket endpoint")
+    parser.add_argument('--interval', type=float, default=60, help="bar length in seconds")
+    parser.add_argument('--replay', type=int, metavar='TICKS',
+                        help="serve this many synthetic ticks per symbol from a local replay server instead")
+    parser.add_argument('--rate', type=float, help="replay pace in ticks per second (default: as fast as possible)")
+    args = parser.parse_args()
+
+    if args.replay:
+        import synthetic
+        asyncio.run(_replay_demo(synthetic.trade_ticks(args.replay, args.symbols), args.interval, args.rate))
+    else:
+        async def main():
+            stream = TickStream(TradeFeed(args.symbols, args.url), args.interval)
+            printer = asyncio.create_task(_print_bars(stream.subscribe()))
+            try:
+                await stream.run()
+            finally:
+                printer.cancel()
+        asyncio.run(main())
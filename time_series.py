@@ -1,58 +1,43 @@
-
-
-!pip install prophet
-
-import pandas as pd
-from prophet import Prophet
 import matplotlib.pyplot as plt
+import storage
+from forecast_service import ForecastService, REGRESSORS, prepare_training_frame
 
-# Load the dataset
-df = pd.read_csv('/content/btc_sentimentn.csv', parse_dates=['date'])
-
-# Fill sentiment NAs (bfill just in case)
-df['sentiment_score'] = df['sentiment_score'].ffill().bfill()
-
-# Rename for Prophet
-df.rename(columns={'date': 'ds', 'close': 'y'}, inplace=True)
-
-# Select needed columns
-cols = ['ds', 'y', 'sentiment_score', 'volume', 'log_return',
-        'sma_7', 'sma_21', 'upper_band', 'lower_band', 'rsi_14', 'atr_14']
-df = df[cols].dropna()
 
-# Initialize Prophet with regressors
-model = Prophet(daily_seasonality=True)
+def plot_forecast(model, forecast):
+    # Plot forecast
+    fig1 = model.plot(forecast)
+    plt.title("Prophet Long-Term Forecast (30 Days)")
+    plt.xlabel("Date")
+    plt.ylabel("Close Price")
+    plt.grid(True)
+    plt.show()
 
-# Add regressors
-regressors = cols[2:]  # Everything except ds, y
-for reg in regressors:
-    model.add_regressor(reg)
+    # plot components (trend, seasonality)
+    fig2 = model.plot_components(forecast)
+    plt.show()
 
-# Fit model
-model.fit(df)
 
-# Make future dataframe
-future = model.make_future_dataframe(periods=30)
+# Pipeline stage: fit (or load the cached fit for unchanged data) and forecast `periods` days once
+def forecast_prices(src, dst, model_dir, periods=30):
+    # Load the dataset
+    df = storage.read_table(src)
 
-# Extend future DataFrame with regressor values
-# Use the last known value to fill in future steps
-for reg in regressors:
-    future[reg] = list(df[reg]) + [df[reg].iloc[-1]] * 30
+    service = ForecastService(model_dir, regressors=REGRESSORS)
+    df = prepare_training_frame(df, REGRESSORS)
+    model, forecast = service.forecast(df, periods=periods)
+    print(f"Prophet model: {service.last_fit}")
 
-# Forecast
-forecast = model.predict(future)
+    storage.write_table(forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']], dst)
+    return model, forecast
 
-# Plot forecast
-fig1 = model.plot(forecast)
-plt.title("Prophet Long-Term Forecast (30 Days)")
-plt.xlabel("Date")
-plt.ylabel("Close Price")
-plt.grid(True)
-plt.show()
 
-# plot components (trend, seasonality)
-fig2 = model.plot_components(forecast)
-plt.show()
+if __name__ == '__main__':
+    import os
+    from pipeline import DATA_DIR, run
 
-forecast = model.predict(future)
-forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].to_csv('prophet_forecast.csv', index=False)
+    print(run(['forecast']).to_string(index=False))
+    # The stage just stored this fit, so the service loads it instead of refitting
+    service = ForecastService(os.path.join(DATA_DIR, 'state', 'prophet_models'), regressors=REGRESSORS)
+    train = prepare_training_frame(storage.read_table(os.path.join(DATA_DIR, 'btc_sentimentn')), REGRESSORS)
+    model, forecast = service.forecast(train, periods=30)
+    plot_forecast(model, forecast)
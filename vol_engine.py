@@ -0,0 +1,168 @@
+import json
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from arch import arch_model
+
+# E|z| for a standard normal, the centring constant arch uses in EGARCH
+EGARCH_NORM = math.sqrt(2 / math.pi)
+
+
+def variance_step(vol, params, sigma2, resid):
+    """Next conditional variance from the current one and the latest residual.
+
+    Covers the (1, o, 1) models volatility.py uses: GARCH (GJR when
+    gamma[1] is present) and EGARCH, with parameter names as arch reports
+    them.
+    """
+    omega = params['omega']
+    alpha = params['alpha[1]']
+    beta = params['beta[1]']
+    gamma = params.get('gamma[1]', 0.0)
+
+    if vol == 'GARCH':
+        return omega + (alpha + (gamma if resid < 0 else 0.0)) * resid * resid + beta * sigma2
+    if vol == 'EGARCH':
+        z = resid / math.sqrt(sigma2)
+        return math.exp(omega + alpha * (abs(z) - EGARCH_NORM) + gamma * z + beta * math.log(sigma2))
+    raise ValueError(f"Unsupported volatility model: {vol}")
+
+
+def _parameter_names(model):
+    # arch_model returns the mean model; its parameter_names() covers only the mean terms
+    return (list(model.parameter_names()) + list(model.volatility.parameter_names())
+            + list(model.distribution.parameter_names()))
+
+
+class VolatilityEngine:
+    """GARCH/EGARCH(1,1) volatility that refits on a schedule and advances
+    the conditional variance one bar at a time in between.
+
+    fit() starts the optimiser from the previous parameters when there are
+    any, over a rolling (`window` returns) or expanding (window=None)
+    sample. update() takes one new return and costs a single recursion
+    step; every `refit_every` updates it refits on the retained window.
+    Returns are multiplied by `scale` before modelling, as in volatility.py.
+    """
+
+    def __init__(self, vol='GARCH', p=1, o=0, q=1, dist='normal', window=None, refit_every=None, scale=100):
+        if p != 1 or q != 1 or o not in (0, 1):
+            raise ValueError("Only (1, o, 1) models with o in {0, 1} support one-step updates")
+        self.vol = vol
+        self.p, self.o, self.q = p, o, q
+        self.dist = dist
+        self.window = window
+        self.refit_every = refit_every
+        self.scale = scale
+
+        self.params = None
+        self.result = None  # arch result of the latest fit, for summaries
+        self.sigma2 = None  # conditional variance for the next bar
+        self.history = deque(maxlen=window)
+        self.since_refit = 0
+        self.warm_started = False  # whether the latest fit started from the previous parameters
+
+    def _model(self, returns):
+        return arch_model(returns, vol=self.vol, p=self.p, o=self.o, q=self.q, dist=self.dist)
+
+    def fit(self, returns):
+        """Fit on `returns` (unscaled, NaNs dropped) and return the in-sample
+        conditional volatility. Warm-starts from the current parameters."""
+        returns = pd.Series(returns).dropna() * self.scale
+        self.history = deque(returns.to_numpy(), maxlen=self.window)
+        sample = returns.iloc[-self.window:] if self.window else returns
+
+        model = self._model(sample)
+        starting = None
+        if self.params is not None and list(self.params) == _parameter_names(model):
+            starting = np.array(list(self.params.values()))
+        res = model.fit(disp='off', starting_values=starting)
+
+        self.result = res
+        self.warm_started = starting is not None
+        self.params = {name: float(value) for name, value in res.params.items()}
+        last_sigma = float(res.conditional_volatility.iloc[-1])
+        last_resid = float(res.resid.iloc[-1])
+        self.sigma2 = variance_step(self.vol, self.params, last_sigma ** 2, last_resid)
+        self.since_refit = 0
+
+        if self.window and len(returns) > len(sample):
+            # Older bars are outside the fit window; filter them with the new parameters
+            return self.filter(returns / self.scale)
+        return res.conditional_volatility
+
+    def filter(self, returns):
+        """Conditional volatility over `returns` using the current parameters, no optimisation."""
+        returns = pd.Series(returns).dropna() * self.scale
+        mu = self.params.get('mu', 0.0)
+        resid = returns.to_numpy() - mu
+        # Same exponentially weighted backcast and first step arch uses to start the recursion
+        weights = 0.94 ** np.arange(min(75, len(resid)))
+        backcast = float(np.sum(weights / weights.sum() * resid[:len(weights)] ** 2))
+        p = self.params
+        if self.vol == 'EGARCH':
+            sigma2 = math.exp(p['omega'] + p['beta[1]'] * math.log(backcast))
+        else:
+            sigma2 = p['omega'] + (p['alpha[1]'] + 0.5 * p.get('gamma[1]', 0.0) + p['beta[1]']) * backcast
+        out = np.empty(len(returns))
+        for i, r in enumerate(returns.to_numpy()):
+            out[i] = math.sqrt(sigma2)
+            sigma2 = variance_step(self.vol, self.params, sigma2, r - mu)
+        return pd.Series(out, index=returns.index)
+
+    def update(self, ret):
+        """Consume one new (unscaled) return and return its conditional
+        volatility, i.e. the value the fitted column would have for this bar."""
+        if self.params is None:
+            raise RuntimeError("Call fit() before update()")
+        r = ret * self.scale
+        sigma = math.sqrt(self.sigma2)
+        self.history.append(r)
+        self.sigma2 = variance_step(self.vol, self.params, self.sigma2, r - self.params.get('mu', 0.0))
+
+        self.since_refit += 1
+        if self.refit_every and self.since_refit >= self.refit_every:
+            self.fit(pd.Series(self.history) / self.scale)
+        return sigma
+
+    @property
+    def next_volatility(self):
+        return math.sqrt(self.sigma2) if self.sigma2 is not None else None
+
+    def to_dict(self):
+        return {
+            'vol': self.vol, 'p': self.p, 'o': self.o, 'q': self.q, 'dist': self.dist,
+            'window': self.window, 'refit_every': self.refit_every, 'scale': self.scale,
+            'params': self.params, 'sigma2': self.sigma2, 'since_refit': self.since_refit,
+            'history': list(self.history),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        engine = cls(state['vol'], state['p'], state['o'], state['q'], state['dist'],
+                     state['window'], state['refit_every'], state['scale'])
+        engine.params = state['params']
+        engine.sigma2 = state['sigma2']
+        engine.since_refit = state['since_refit']
+        engine.history = deque(state['history'], maxlen=engine.window)
+        return engine
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load_or_create(cls, path, **kwargs):
+        """Restore a saved engine, or build a fresh one if there is none or its spec differs."""
+        fresh = cls(**kwargs)
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return fresh
+        spec = ('vol', 'p', 'o', 'q', 'dist')
+        if any(state[k] != getattr(fresh, k) for k in spec):
+            return fresh
+        return cls.from_dict(state)
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from arch import arch_model
+
+VOLS = ('GARCH', 'EGARCH', 'GJR')
+ORDERS = (1, 2)
+DISTS = ('normal', 't', 'skewt')
+
+
+def spec_grid(vols=VOLS, orders=ORDERS, dists=DISTS):
+    """Every (vol, p, o, q, dist) combination to try. GJR is arch's GARCH
+    with an asymmetric term (o=1); EGARCH is tried with and without it."""
+    specs = []
+    for vol in vols:
+        o_values = {'GARCH': (0,), 'GJR': (1,), 'EGARCH': (0, 1)}[vol]
+        for p in orders:
+            for q in orders:
+                for o in o_values:
+                    for dist in dists:
+                        specs.append({'vol': vol, 'p': p, 'o': o, 'q': q, 'dist': dist})
+    return specs
+
+
+def arch_vol(vol):
+    return 'GARCH' if vol == 'GJR' else vol
+
+
+def fit_spec(task):
+    """Fit one spec on one ticker's returns; runs inside a worker process."""
+    ticker, returns, spec, scale = task
+    started = time.perf_counter()
+    row = {'ticker': ticker, **spec}
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # convergence warnings are captured in the row instead
+            model = arch_model(returns * scale, vol=arch_vol(spec['vol']), p=spec['p'], o=spec['o'],
+                               q=spec['q'], dist=spec['dist'])
+            res = model.fit(disp='off')
+        row.update({
+            'aic': float(res.aic),
+            'bic': float(res.bic),
+            'loglikelihood': float(res.loglikelihood),
+            'converged': res.convergence_flag == 0,
+            'params': {name: float(value) for name, value in res.params.items()},
+            'error': None,
+        })
+    except Exception as e:  # a spec that cannot be fitted just drops out of the ranking
+        row.update({'aic': np.nan, 'bic': np.nan, 'loglikelihood': np.nan,
+                    'converged': False, 'params': None, 'error': str(e)})
+    row['fit_seconds'] = time.perf_counter() - started
+    return row
+
+
+def select_models(returns_by_ticker, grid=None, criterion='bic', workers=None, scale=100):
+    """Fit the spec grid for every ticker across a process pool.
+
+    `returns_by_ticker` maps ticker -> return Series (unscaled). Returns
+    (results, best): a DataFrame with one row per (ticker, spec) including
+    AIC/BIC and fit time, and a dict ticker -> winning row by `criterion`
+    among converged fits.
+    """
+    if criterion not in ('aic', 'bic'):
+        raise ValueError("criterion must be 'aic' or 'bic'")
+    grid = grid or spec_grid()
+    tasks = [(ticker, pd.Series(returns).dropna().to_numpy(), spec, scale)
+             for ticker, returns in returns_by_ticker.items() for spec in grid]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        rows = [fit_spec(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(fit_spec, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    results = pd.DataFrame(rows)
+    best = {}
+    for ticker, group in results[results['converged']].groupby('ticker'):
+        best[ticker] = group.loc[group[criterion].idxmin()].to_dict()
+    return results, best
+
+
+def save_selection(best, path):
+    clean = {ticker: {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+             for ticker, row in best.items()}
+    with open(path, 'w') as f:
+        json.dump(clean, f, indent=2, default=lambda v: v.item() if hasattr(v, 'item') else str(v))
+
+
+def load_selection(path):
+    with open(path) as f:
+        return json.load(f)
@@ -1,113 +1,95 @@
-
-
-import pandas as pd
-
-df = pd.read_csv('/content/btc_featuresn.csv', parse_dates=['date'])
-df.set_index('date', inplace=True)
-
-print(df.columns)
-df[['return', 'atr_14']].dropna().head()
-print(df.tail())
-
-import matplotlib.pyplot as plt
-
-plt.figure(figsize=(14, 6))
-
-# Plot ATR (Absolute volatility)
-plt.plot(df.index, df['atr_14'], label='ATR (14)', color='orange')
-
-# Calculate 7-Day Rolling StdDev and scale it for visibility
-rolling_std_7 = df['return'].rolling(window=7).std()
-scaled_rolling_std_7 = rolling_std_7 * 10000  # Scale to match ATR range
-
-# Plot Scaled Daily Return StdDev
-plt.plot(df.index, scaled_rolling_std_7, label='7-Day Rolling StdDev of Returns (x10,000)', color='purple')
-
-plt.title('Volatility Indicators: ATR & Scaled Rolling Return StdDev')
-plt.xlabel('Date')
-plt.ylabel('Volatility')
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.show()
-
-!pip install arch --quiet
-
-from arch import arch_model
-import pandas as pd
-import matplotlib.pyplot as plt
-
-# Load your processed dataset (if not already)
-df = pd.read_csv('/content/btc_featuresn.csv', parse_dates=['date'], index_col='date')
-
-# Drop NaNs and scale returns
-returns = df['return'].dropna() * 100  # Scaling for GARCH stability
-
-# GARCH(1,1) with normal distribution
-model = arch_model(returns, vol='GARCH', p=1, q=1, dist='normal')
-res = model.fit(disp='off')
-
-# Print summary
-print(res.summary())
-
-plt.figure(figsize=(14, 6))
-plt.plot(res.conditional_volatility, color='darkred', label='GARCH(1,1) Volatility')
-plt.title('GARCH(1,1) Conditional Volatility')
-plt.xlabel('Date')
-plt.ylabel('Volatility')
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.show()
-
-from arch import arch_model
 import matplotlib.pyplot as plt
 
-# Drop NaNs from your return series just to be safe
-returns = df['return'].dropna() * 100  # Scaling returns for better model fit
-
-# Fit EGARCH(1,1)
-egarch_model = arch_model(returns, vol='EGARCH', p=1, o=1, q=1, dist='normal')
-egarch_result = egarch_model.fit(disp='off')
-
-# Get conditional volatility
-egarch_vol = egarch_result.conditional_volatility
-
-# Plot EGARCH conditional volatility
-plt.figure(figsize=(14, 6))
-plt.plot(egarch_vol.index, egarch_vol, color='darkgreen', label='EGARCH(1,1) Volatility')
-plt.title('EGARCH(1,1) Conditional Volatility')
-plt.xlabel('Date')
-plt.ylabel('Volatility')
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.show()
-
-import pandas as pd
-from arch import arch_model
-
-# Load your existing features
-features_df = pd.read_csv('/content/btc_featuresn.csv', parse_dates=['date'])
-features_df.set_index('date', inplace=True)
-
-# Prepare returns for modeling (in percentage form)
-returns = features_df['return'].dropna() * 100
-
-# Basic GARCH(1,1)
-garch_model = arch_model(returns, vol='GARCH', p=1, q=1)
-garch_res = garch_model.fit(disp='off')
-features_df['garch_vol'] = garch_res.conditional_volatility
-
-# EGARCH(1,1)
-egarch_model = arch_model(returns, vol='EGARCH', p=1, q=1)
-egarch_res = egarch_model.fit(disp='off')
-features_df['egarch_vol'] = egarch_res.conditional_volatility
-
-# Save the final feature set
-features_df.reset_index(inplace=True)
-features_df.to_csv('/content/btc_vol.csv', index=False)
-print("Both GARCH and EGARCH volatility scores saved.")
-
-df=pd.read_csv('/content/btc_vol.csv')
-df.info()
+import storage
+from vol_engine import VolatilityEngine
+from vol_selection import save_selection, select_models
+
+
+def plot_volatility_indicators(df):
+    plt.figure(figsize=(14, 6))
+
+    # Plot ATR (Absolute volatility)
+    plt.plot(df.index, df['atr_14'], label='ATR (14)', color='orange')
+
+    # Calculate 7-Day Rolling StdDev and scale it for visibility
+    rolling_std_7 = df['return'].rolling(window=7).std()
+    scaled_rolling_std_7 = rolling_std_7 * 10000  # Scale to match ATR range
+
+    # Plot Scaled Daily Return StdDev
+    plt.plot(df.index, scaled_rolling_std_7, label='7-Day Rolling StdDev of Returns (x10,000)', color='purple')
+
+    plt.title('Volatility Indicators: ATR & Scaled Rolling Return StdDev')
+    plt.xlabel('Date')
+    plt.ylabel('Volatility')
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    plt.show()
+
+
+def plot_conditional_volatility(vol, label, color):
+    plt.figure(figsize=(14, 6))
+    plt.plot(vol.index, vol, color=color, label=f'{label} Volatility')
+    plt.title(f'{label} Conditional Volatility')
+    plt.xlabel('Date')
+    plt.ylabel('Volatility')
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    plt.show()
+
+
+# Pipeline stage: GARCH(1,1) and EGARCH(1,1) conditional volatility added to the features
+def fit_volatility(src, dst, garch_engine_path, egarch_engine_path):
+    # Load your existing features
+    features_df = storage.read_table(src)
+    features_df.set_index('date', inplace=True)
+
+    # GARCH(1,1) with normal distribution
+    # The engine keeps its parameters between runs, so each fit warm-starts from yesterday's
+    # (returns are scaled x100 inside the engine for GARCH stability)
+    garch_engine = VolatilityEngine.load_or_create(garch_engine_path, vol='GARCH', p=1, q=1, dist='normal')
+    garch_vol = garch_engine.fit(features_df['return'])
+    print(garch_engine.result.summary())
+
+    # Fit EGARCH(1,1), the same specification that is saved to btc_vol
+    egarch_engine = VolatilityEngine.load_or_create(egarch_engine_path, vol='EGARCH', p=1, q=1, dist='normal')
+    egarch_vol = egarch_engine.fit(features_df['return'])
+
+    features_df['garch_vol'] = garch_vol
+    features_df['egarch_vol'] = egarch_vol
+
+    # Persist parameters and the next-bar variance: the next run warm-starts from them,
+    # and VolatilityEngine.update() can advance either series one bar without refitting
+    garch_engine.save(garch_engine_path)
+    egarch_engine.save(egarch_engine_path)
+
+    # Save the final feature set
+    features_df.reset_index(inplace=True)
+    storage.write_table(features_df, dst)
+    print("Both GARCH and EGARCH volatility scores saved.")
+    return features_df
+
+
+# Pipeline stage: model selection, fit GARCH/EGARCH/GJR x orders x error distributions in parallel
+# and keep the best by BIC (pass more tickers' returns in the dict to run the same grid across the universe)
+def select_volatility_model(src, dst, ticker='BTC-USD', criterion='bic'):
+    df = storage.read_table(src, columns=['date', 'return'])
+    selection_results, best_models = select_models({ticker: df['return']}, criterion=criterion)
+    print(selection_results[['vol', 'p', 'o', 'q', 'dist', 'aic', 'bic', 'fit_seconds']].sort_values('bic').head(10))
+    save_selection(best_models, dst)
+    print("Best volatility model:", {k: (v['vol'], v['p'], v['o'], v['q'], v['dist']) for k, v in best_models.items()})
+    return best_models
+
+
+if __name__ == '__main__':
+    import os
+    from pipeline import DATA_DIR, run
+
+    print(run(['volatility', 'vol_selection']).to_string(index=False))
+
+    df = storage.read_table(os.path.join(DATA_DIR, 'btc_vol')).set_index('date')
+    df.info()
+    plot_volatility_indicators(df)
+    plot_conditional_volatility(df['garch_vol'], 'GARCH(1,1)', 'darkred')
+    plot_conditional_volatility(df['egarch_vol'], 'EGARCH(1,1)', 'darkgreen')